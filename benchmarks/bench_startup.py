@@ -0,0 +1,132 @@
+"""
+启动耗时基准: 在全新的子进程中按 run.py 的真实入口测量
+  1. import run (含 deploy_tool.main) 的耗时，并检查重量级模块 (paramiko / cryptography / QtCharts / multiprocessing)
+     是否被提前导入 (它们应在窗口显示后或首次使用时才加载)；
+  2. 从进程启动到主窗口第一次绘制 (first paint) 的耗时，以及后台加载配置完成的耗时
+     (经 run.main() 启动，入口中的导入与初始化都计入)。
+
+不需要服务器。子进程在临时目录中运行，不会读写当前目录的 app_config.json。
+可作为回归检查: 超过预算或重量级模块被提前导入时退出码为 1。
+
+用法:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --import-budget-ms 600 --paint-budget-ms 1500
+    python benchmarks/bench_startup.py --offscreen        # 无显示环境 (CI / SSH 会话)
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 这些模块不应在显示窗口之前导入
+DEFERRED_MODULES = ["paramiko", "cryptography", "PySide6.QtCharts", "multiprocessing"]
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import run
+elapsed = time.perf_counter() - start
+print(json.dumps({"import_ms": elapsed * 1000,
+                  "loaded": [m for m in %(deferred)r if m in sys.modules]}))
+"""
+
+PAINT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import run
+from PySide6.QtCore import QObject, QEvent, QTimer
+
+result = {}
+windows = []
+
+class PaintWatcher(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and "first_paint_ms" not in result:
+            result["first_paint_ms"] = (time.perf_counter() - start) * 1000
+            result["loaded_at_paint"] = [m for m in %(deferred)r if m in sys.modules]
+        return False
+
+watcher = PaintWatcher()
+
+def before_show(app, window):
+    windows.append(window)
+    window.installEventFilter(watcher)
+    loaded = window.on_startup_loaded
+
+    def on_loaded(success, config):
+        loaded(success, config)
+        result["startup_loaded_ms"] = (time.perf_counter() - start) * 1000
+        QTimer.singleShot(0, app.quit)
+
+    window.on_startup_loaded = on_loaded
+    QTimer.singleShot(10000, app.quit)
+
+run.main(before_show=before_show)
+windows[0].task_manager.shutdown()
+print(json.dumps(result))
+"""
+
+
+def run_probe(code, offscreen):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    if offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as cwd:
+        proc = subprocess.run([sys.executable, "-c", code % {"deferred": DEFERRED_MODULES}],
+                              cwd=cwd, env=env, capture_output=True, text=True, timeout=60)
+    if proc.returncode != 0:
+        sys.exit(f"子进程失败:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def report(label, values, budget):
+    median = statistics.median(values)
+    status = ""
+    if budget:
+        status = "OK" if median <= budget else f"超出预算 {budget:.0f} ms"
+    print(f"{label:<24} 中位数 {median:8.1f} ms  最小 {min(values):8.1f} ms  最大 {max(values):8.1f} ms  {status}")
+    return not budget or median <= budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=0, help="import run 的预算 (0 表示不检查)")
+    parser.add_argument("--paint-budget-ms", type=float, default=0, help="首次绘制的预算 (0 表示不检查)")
+    parser.add_argument("--offscreen", action="store_true", help="使用 Qt offscreen 平台")
+    args = parser.parse_args()
+
+    imports, paints, loads = [], [], []
+    early = set()
+    for _ in range(args.runs):
+        probe = run_probe(IMPORT_PROBE, args.offscreen)
+        imports.append(probe["import_ms"])
+        early.update(probe["loaded"])
+
+        probe = run_probe(PAINT_PROBE, args.offscreen)
+        if "first_paint_ms" not in probe:
+            sys.exit("窗口没有绘制 (无显示环境时请加 --offscreen)")
+        paints.append(probe["first_paint_ms"])
+        early.update(probe["loaded_at_paint"])
+        if "startup_loaded_ms" in probe:
+            loads.append(probe["startup_loaded_ms"])
+
+    print(f"Python {sys.version.split()[0]}, {args.runs} 次")
+    ok = report("import run", imports, args.import_budget_ms)
+    ok = report("首次绘制", paints, args.paint_budget_ms) and ok
+    if loads:
+        report("后台加载配置完成", loads, 0)
+    if early:
+        print(f"以下模块在窗口显示前被导入: {', '.join(sorted(early))}")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+条带化上传基准: 对比当前 upload_dir 的单流 sftp.put 与多条带并发写入的吞吐。
+
+需要一台可登录的测试服务器，通过环境变量提供连接信息:
+    DEPLOY_BENCH_HOST, DEPLOY_BENCH_PORT (默认 22), DEPLOY_BENCH_USER, DEPLOY_BENCH_PASSWORD
+
+用法:
+    python benchmarks/bench_striped_upload.py --size-mb 512 --stripes 1 2 4 8
+    python benchmarks/bench_striped_upload.py --size-mb 512 --new-transport > bench_output.txt
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deploy_tool.backend import SSHManager  # noqa: E402
+from deploy_tool import transfer  # noqa: E402
+
+
+def make_test_file(size_mb):
+    fd, path = tempfile.mkstemp(suffix=".bin")
+    block = os.urandom(1024 * 1024)  # 随机数据，避免 SSH 压缩影响结果
+    with os.fdopen(fd, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+def timed(label, size, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    mbps = size / elapsed / 1024 / 1024
+    print(f"{label:<32} {elapsed:8.2f}s {mbps:8.1f} MB/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--stripes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-mb", type=int, default=8)
+    parser.add_argument("--new-transport", action="store_true", help="每个条带使用独立 SSH 连接")
+    parser.add_argument("--remote-dir", default="/tmp")
+    args = parser.parse_args()
+
+    host = os.environ.get("DEPLOY_BENCH_HOST")
+    if not host:
+        parser.error("请设置 DEPLOY_BENCH_HOST / DEPLOY_BENCH_USER / DEPLOY_BENCH_PASSWORD")
+
+    ssh = SSHManager()
+    ok, msg = ssh.connect(host, os.environ.get("DEPLOY_BENCH_PORT", "22"),
+                          os.environ.get("DEPLOY_BENCH_USER", "root"), os.environ.get("DEPLOY_BENCH_PASSWORD", ""))
+    if not ok:
+        sys.exit(f"连接失败: {msg}")
+
+    local_file = make_test_file(args.size_mb)
+    size = os.path.getsize(local_file)
+    remote_file = f"{args.remote_dir.rstrip('/')}/bench_stripe_{os.getpid()}.bin"
+    journal_dir = tempfile.mkdtemp(prefix="bench_journal_")
+    print(f"文件大小: {args.size_mb} MB, 分块: {args.chunk_mb} MB, 独立连接: {args.new_transport}")
+
+    digest = transfer.sha256_file(local_file)  # 本地哈希不计入计时
+
+    try:
+        baseline = timed("单流 sftp.put (upload_dir)", size, lambda: ssh.sftp.put(local_file, remote_file))
+        for stripes in args.stripes:
+            elapsed = timed(f"条带 x{stripes}", size, lambda: transfer.upload_file_resumable(
+                ssh, local_file, remote_file, journal_dir, chunk_size=args.chunk_mb * 1024 * 1024,
+                stripes=stripes, new_transport=args.new_transport, local_sha256=digest))
+            print(f"{'':<32} 相对单流加速 {baseline / elapsed:5.2f}x (含远程 sha256 校验)")
+    finally:
+        ssh.run_command(f"rm -f '{remote_file}' '{remote_file}.part'")
+        ssh.close()
+        os.remove(local_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,204 @@
 import os
 import posixpath
-import paramiko
 import time
 import logging
+import select
+import re
+import codecs
+import shlex
+import tempfile
+import threading
 from stat import S_ISDIR
+from .cancel import OperationCancelled
+from . import transfer
+from . import tuning as link_tuning
+from . import packaging
+
+
+def _new_client():
+    """创建 SSHClient (paramiko 及其依赖的加密库较重，首次使用时才导入，不拖慢界面启动)"""
+    import paramiko
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    return client
+
 
 class SSHManager:
     def __init__(self):
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.sftp = None
+        self._client = None
+        # 每个线程独占的 SFTP 会话 {线程: (transport, 代数, SFTPClient)}，见 sftp 属性
+        self._sftp_sessions = {}
+        self._sftp_lock = threading.Lock()
+        self._sftp_generation = 0
+        self.host_label = ""
         self.logger = logging.getLogger("DeployTool")
+        # 断线重连所需的连接参数
+        self._conn_params = None
+        # 当前使用的传输参数 (窗口/包大小/加密算法/压缩)，None 表示 paramiko 默认值
+        self.tuning = None
+        self._reconnect_lock = threading.Lock()
+        # 超过该大小的文件使用分块续传上传，续传日志保存在 journal_dir
+        self.resumable_threshold = 64 * 1024 * 1024
+        # 超过 stripe_threshold 的文件再按 stripe_count 条 SFTP 会话并发写入
+        self.stripe_threshold = 256 * 1024 * 1024
+        self.stripe_count = 4
+        self.stripe_new_transport = False
+        self.journal_dir = os.path.join(tempfile.gettempdir(), "deploy_tool_journal")
+        # 小文件按类型打成两条 tar 流上传 (文本 gzip 压缩，已压缩格式原样存储)，False 时逐个 SFTP 上传
+        self.packed_upload = True
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _new_client()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    @property
+    def sftp(self):
+        """
+        当前线程专用的 SFTP 会话 (未连接时为 None)。
+        paramiko 的 SFTPClient 读取响应时不加锁，多个任务共用一个会话会互相抢走响应或卡住，
+        因此每个线程在同一条 SSH 连接上按需打开自己的 SFTP 通道；连接被替换或参数变化后自动重新打开。
+        """
+        transport = self._client.get_transport() if self._client else None
+        if not (transport and transport.is_active()):
+            return None
+        thread = threading.current_thread()
+        with self._sftp_lock:
+            entry = self._sftp_sessions.get(thread)
+            if entry and entry[0] is transport and entry[1] == self._sftp_generation and not entry[2].sock.closed:
+                return entry[2]
+            # 顺便关闭已结束的线程 (流水线阶段、条带线程等) 留下的会话
+            finished = [t for t in self._sftp_sessions if not t.is_alive()]
+            stale = [self._sftp_sessions.pop(t)[2] for t in finished]
+            generation = self._sftp_generation
+        for session in stale:
+            self._close_quietly(session)
+
+        sftp = self._client.open_sftp()
+        with self._sftp_lock:
+            old = self._sftp_sessions.get(thread)
+            self._sftp_sessions[thread] = (transport, generation, sftp)
+        if old:
+            self._close_quietly(old[2])
+        return sftp
+
+    def _drop_thread_sftp(self):
+        """丢弃当前线程的 SFTP 会话 (下次访问 sftp 时重新打开)"""
+        with self._sftp_lock:
+            entry = self._sftp_sessions.pop(threading.current_thread(), None)
+        if entry:
+            self._close_quietly(entry[2])
+
+    @staticmethod
+    def _close_quietly(sftp):
+        try:
+            sftp.close()
+        except Exception:
+            pass
 
-    def connect(self, hostname, port, username, password):
+    def connect(self, hostname, port, username, password, tuning=None):
         try:
-            self.client.connect(hostname, port=int(port), username=username, password=password, timeout=10)
-            self.sftp = self.client.open_sftp()
+            self._connect_client(self.client, hostname, port, username, password, tuning)
+            # 确认 SFTP 子系统可用 (同时作为当前线程的会话)
+            if self.sftp is None:
+                raise ConnectionError("SFTP 会话打开失败")
+            self.host_label = f"{username}@{hostname}:{port}"
+            # 清理长期未完成 (已放弃) 的续传日志
+            transfer.prune_journals(self.journal_dir)
+            self._conn_params = (hostname, port, username, password)
+            self.tuning = tuning
             return True, "连接成功"
         except Exception as e:
             return False, str(e)
 
+    def _connect_client(self, client, hostname, port, username, password, tuning=None):
+        kwargs = {}
+        if tuning:
+            kwargs["transport_factory"] = link_tuning.make_transport_factory(tuning)
+            kwargs["compress"] = bool(tuning.get("compress"))
+        client.connect(hostname, port=int(port), username=username, password=password, timeout=10, **kwargs)
+
+    def apply_tuning(self, tuning):
+        """
+        立即应用窗口与包大小 (重新打开 SFTP 会话使其生效)。
+        加密算法与压缩需在握手前协商，将在下次连接时生效。
+        """
+        transport = self.client.get_transport()
+        transport.default_window_size = tuning["window_size"]
+        transport.default_max_packet_size = tuning["max_packet_size"]
+        # 各线程的 SFTP 会话在下次使用时按新参数重新打开
+        with self._sftp_lock:
+            self._sftp_generation += 1
+        self.tuning = tuning
+
+    def calibrate_link(self):
+        """探测 RTT 与吞吐并立即应用推荐参数，返回推荐的 tuning 字典"""
+        tuning = link_tuning.calibrate(self)
+        self.apply_tuning(tuning)
+        return tuning
+
+    def is_connected(self):
+        transport = self._client.get_transport() if self._client else None
+        return bool(transport and transport.is_active() and self._conn_params)
+
+    def reconnect(self):
+        """
+        出错后恢复连接 (多个任务同时触发时只重连一次):
+        先丢弃调用线程自己的 SFTP 会话；SSH 连接仍然可用时到此为止，其他任务的会话不受影响。
+        只有连接本身已断开 (所有任务的通道都已不可用) 时才用上次的参数重建连接，其他线程的会话随后自动重新打开。
+        """
+        if not self._conn_params:
+            raise RuntimeError("尚未连接，无法重连")
+        self._drop_thread_sftp()
+        with self._reconnect_lock:
+            if self.is_connected():
+                return
+            self.logger.warning(f"正在重新连接 {self.host_label}...")
+            try:
+                self.close()
+            except Exception:
+                pass
+            self.client = _new_client()
+            ok, msg = self.connect(*self._conn_params, tuning=self.tuning)
+            if not ok:
+                raise ConnectionError(f"重连失败: {msg}")
+
+    def open_sftp_session(self, new_transport=False):
+        """
+        额外打开一个 SFTP 会话，返回 (sftp, close)。
+        new_transport=False: 复用当前 SSH 连接 (独立通道与流控窗口)
+        new_transport=True: 新建 SSH 连接 (独立 TCP 拥塞窗口，高延迟链路上收益更大)
+        """
+        if not new_transport:
+            sftp = self.client.open_sftp()
+            return sftp, sftp.close
+        hostname, port, username, password = self._conn_params
+        client = _new_client()
+        self._connect_client(client, hostname, port, username, password, self.tuning)
+        sftp = client.open_sftp()
+
+        def close():
+            sftp.close()
+            client.close()
+        return sftp, close
+
+    def ensure_connected(self):
+        if not self.is_connected():
+            self.reconnect()
+
     def close(self):
-        if self.sftp:
-            self.sftp.close()
-        if self.client:
-            self.client.close()
+        with self._sftp_lock:
+            sessions = [entry[2] for entry in self._sftp_sessions.values()]
+            self._sftp_sessions.clear()
+        for session in sessions:
+            self._close_quietly(session)
+        if self._client:
+            self._client.close()
 
     def run_command(self, command):
         """运行命令并返回标准输出/标准错误"""
@@ -38,6 +212,137 @@ class SSHManager:
             self.logger.error(f"STDERR: {err}")
         return out, err
 
+    def run_command_input(self, command, data):
+        """运行命令并把 data (bytes) 写入其标准输入，返回 (exit_status, err)"""
+        self.logger.info(f"Executing (stdin {len(data)} bytes): {command}")
+        channel = self.client.get_transport().open_session()
+        try:
+            channel.exec_command(command)
+            channel.sendall(data)
+            channel.shutdown_write()
+            status = channel.recv_exit_status()
+            err = channel.makefile_stderr("rb").read().decode("utf-8", "replace").strip()
+            if err:
+                self.logger.error(f"STDERR: {err}")
+            return status, err
+        finally:
+            channel.close()
+
+    def iter_command_output(self, command, timeout=None, cancel_token=None, chunk_size=32768):
+        """
+        流式执行命令，按行产出 (stream, line)，stream 为 'stdout' 或 'stderr'。
+        命令结束后最后产出 ('exit', exit_status)。
+        timeout 为整体超时秒数，超时抛出 TimeoutError；cancel_token 被取消时抛出 OperationCancelled。
+        """
+        self.logger.info(f"Executing (stream): {command}")
+        chan = self.client.get_transport().open_session()
+        chan.exec_command(command)
+        deadline = time.monotonic() + timeout if timeout else None
+
+        decoders = {
+            'stdout': codecs.getincrementaldecoder('utf-8')(errors='replace'),
+            'stderr': codecs.getincrementaldecoder('utf-8')(errors='replace'),
+        }
+        buffers = {'stdout': '', 'stderr': ''}
+
+        def feed(name, data, final=False):
+            buffers[name] += decoders[name].decode(data, final)
+            *lines, buffers[name] = buffers[name].split('\n')
+            if final and buffers[name]:
+                lines.append(buffers[name])
+                buffers[name] = ''
+            return [(name, line.rstrip('\r')) for line in lines]
+
+        try:
+            while True:
+                if cancel_token and cancel_token.is_set():
+                    raise OperationCancelled(f"命令已取消: {command}")
+                if deadline and time.monotonic() > deadline:
+                    raise TimeoutError(f"命令执行超时 ({timeout}s): {command}")
+
+                got_data = False
+                if chan.recv_ready():
+                    got_data = True
+                    yield from feed('stdout', chan.recv(chunk_size))
+                if chan.recv_stderr_ready():
+                    got_data = True
+                    yield from feed('stderr', chan.recv_stderr(chunk_size))
+
+                if not got_data:
+                    if chan.exit_status_ready() and not chan.recv_ready() and not chan.recv_stderr_ready():
+                        break
+                    # 等待新数据到达，短超时以便及时响应取消
+                    select.select([chan], [], [], 0.1)
+
+            yield from feed('stdout', b'', final=True)
+            yield from feed('stderr', b'', final=True)
+            yield ('exit', chan.recv_exit_status())
+        finally:
+            chan.close()
+
+    def run_command_stream(self, command, line_callback=None, max_capture=1024 * 1024,
+                           timeout=None, cancel_token=None):
+        """
+        流式运行命令，每行输出实时回调 line_callback(stream, line)。
+        标准输出/标准错误各最多保留 max_capture 字节，超出部分只回调不保存。
+        返回: (exit_status, out, err)
+        """
+        captured = {'stdout': [], 'stderr': []}
+        sizes = {'stdout': 0, 'stderr': 0}
+        truncated = {'stdout': False, 'stderr': False}
+        exit_status = -1
+
+        for stream, line in self.iter_command_output(command, timeout=timeout, cancel_token=cancel_token):
+            if stream == 'exit':
+                exit_status = line
+                continue
+            if line_callback:
+                line_callback(stream, line)
+            size = len(line) + 1
+            if sizes[stream] + size <= max_capture:
+                captured[stream].append(line)
+                sizes[stream] += size
+            else:
+                truncated[stream] = True
+
+        for stream in captured:
+            if truncated[stream]:
+                captured[stream].append(f"... (输出超过 {max_capture} 字节，已截断)")
+
+        out = '\n'.join(captured['stdout']).strip()
+        err = '\n'.join(captured['stderr']).strip()
+        if exit_status != 0:
+            self.logger.error(f"Command exited with {exit_status}: {err}")
+        return exit_status, out, err
+
+    def _throttled_progress(self, progress_callback, label, interval=0.5):
+        """生成 line_callback: 统计行数并限频回调进度，避免刷屏"""
+        state = {'count': 0, 'last': 0.0}
+
+        def on_line(stream, line):
+            if stream == 'stderr':
+                self.logger.warning(line)
+                return
+            state['count'] += 1
+            now = time.monotonic()
+            if progress_callback and now - state['last'] >= interval:
+                state['last'] = now
+                progress_callback(f"{label}: 已处理 {state['count']} 项 ({line})")
+
+        return on_line, state
+
+    def _throttled_bytes(self, progress_callback, label, interval=2.0):
+        """生成按字节数限频回调进度的函数 (流式上传用)"""
+        state = {'last': time.monotonic()}
+
+        def on_bytes(sent):
+            now = time.monotonic()
+            if progress_callback and now - state['last'] >= interval:
+                state['last'] = now
+                progress_callback(f"{label}: 已发送 {sent / 1024 / 1024:.1f} MB")
+
+        return on_bytes
+
     def list_projects(self, remote_path):
         """列出远程路径下的目录"""
         try:
@@ -60,6 +365,21 @@ class SSHManager:
             self.logger.error(f"Error listing projects: {e}")
             return False, str(e)
 
+    def read_remote_range(self, remote_path, offset, length):
+        """
+        只读取远程文件的一段 (SFTP 按偏移读取，不下载整个文件)。
+        offset 为负数时表示从末尾往前 -offset 字节。返回 (数据, 实际起始偏移, 文件大小)。
+        """
+        size = self.sftp.stat(remote_path).st_size
+        if offset < 0:
+            offset = max(0, size + offset)
+        length = max(0, min(length, size - offset))
+        if not length:
+            return b"", offset, size
+        with self.sftp.open(remote_path, "rb") as f:
+            data = b"".join(f.readv([(offset, length)]))
+        return data, offset, size
+
     def list_remote_dir_detailed(self, remote_path):
         """
         使用 SFTP 列出包含属性的目录内容。
@@ -97,7 +417,8 @@ class SSHManager:
     def list_backups(self, backup_dir, project_name):
         """列出特定项目的备份"""
         try:
-            cmd = f"ls -1 {backup_dir} | grep '^{project_name}_'"
+            # 未完成的上传 (.part) 不是可用的备份
+            cmd = f"ls -1 {backup_dir} | grep '^{project_name}_' | grep -v '\\.part$'"
             out, err = self.run_command(cmd)
             if err:
                 return []
@@ -106,9 +427,9 @@ class SSHManager:
             self.logger.error(f"Error listing backups: {e}")
             return []
 
-    def backup_project(self, remote_projects_dir, project_name, backup_dir):
-        """备份逻辑: tar -czf 打包"""
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
+    def backup_project(self, remote_projects_dir, project_name, backup_dir, progress_callback=None,
+                       cancel_token=None, dest_name=None):
+        """备份逻辑: tar -czf 打包 (流式输出进度)，dest_name 为空时按时间戳生成"""
         # 确保路径不以 / 结尾以便于 dirname/basename 处理，但在 posixpath.join 中通常没问题
         # source_full = path/to/project
         # parent = path/to
@@ -117,7 +438,7 @@ class SSHManager:
         if remote_projects_dir.endswith('/'): remote_projects_dir = remote_projects_dir[:-1]
         
         source_full = posixpath.join(remote_projects_dir, project_name)
-        dest_name = f"{project_name}_{timestamp}.tar.gz"
+        dest_name = dest_name or self.backup_name(project_name)
         dest_full = posixpath.join(backup_dir, dest_name)
 
         # 检查源是否存在
@@ -129,26 +450,184 @@ class SSHManager:
         # 确保备份目录存在
         self.run_command(f"mkdir -p {backup_dir}")
 
-        # 使用 tar -czf 目标文件 -C 父目录 项目名
-        # 这样压缩包内的顶层就是一个文件夹，解压时不会散乱
-        cmd = f"tar -czf '{dest_full}' -C '{remote_projects_dir}' '{project_name}'"
-        out, err = self.run_command(cmd)
-        
-        # tar 在某些警告下也会输出 stderr，但通常成功退出码为0。
-        # Paramiko exec_command 不直接给出退出码，需要配合 check。
-        # 这里简单依赖 err 为空或特定成功标识。
-        # 更好的做法是 cmd = "... && echo success"
+        # 使用 tar -czvf 目标文件 -C 父目录 项目名
+        # 这样压缩包内的顶层就是一个文件夹，解压时不会散乱; -v 用于流式显示进度
+        # 内容大多是图片/视频等已压缩格式时降低 gzip 级别，格式仍是 .tar.gz
+        level = self._backup_level(source_full, cancel_token)
+        if level == packaging.DEFAULT_LEVEL:
+            cmd = f"tar -czvf '{dest_full}' -C '{remote_projects_dir}' '{project_name}'"
+        else:
+            cmd = (f"tar --use-compress-program='gzip -{level}' -cvf '{dest_full}' "
+                   f"-C '{remote_projects_dir}' '{project_name}'")
+        on_line, state = self._throttled_progress(progress_callback, "正在备份")
+        status, _, err = self.run_command_stream(cmd, line_callback=on_line, cancel_token=cancel_token)
+        if progress_callback:
+            progress_callback(f"备份打包完成，共 {state['count']} 项")
         
-        # 再次检查文件是否生成
+        # tar 在某些警告下也会输出 stderr，因此以退出码和文件存在为准
         check_file = f"[ -f '{dest_full}' ] && echo 'created'"
         out_check, _ = self.run_command(check_file)
         
-        if out_check == 'created':
+        if status == 0 and out_check == 'created':
             return True, f"备份成功: {dest_name}"
         else:
             return False, f"备份失败: {err}"
 
-    def deploy_project(self, local_path, remote_projects_dir, project_name, progress_callback=None):
+    def _backup_level(self, source_full, cancel_token=None):
+        """统计远程项目内各文件的大小与扩展名，决定备份使用的 gzip 级别"""
+        file_sizes = []
+
+        def on_line(stream, line):
+            size, _, name = line.partition('\t')
+            if stream == 'stdout' and size.isdigit():
+                file_sizes.append((name, int(size)))
+
+        status, _, _ = self.run_command_stream(f"find '{source_full}' -type f -printf '%s\\t%f\\n'",
+                                               line_callback=on_line, max_capture=0, cancel_token=cancel_token)
+        if status != 0:
+            return packaging.DEFAULT_LEVEL
+        return packaging.backup_level(file_sizes)
+
+    # 批量备份的 I/O 优先级: tar/gzip 以 nice 运行，并按该设置加 ionice (远程没有 ionice 时只用 nice)
+    IO_PRIORITIES = {"idle": "ionice -c 3", "low": "ionice -c 2 -n 7", "normal": ""}
+
+    def backup_all_projects(self, remote_projects_dir, backup_dir, parallel=2, io_priority="idle",
+                            progress_callback=None, cancel_token=None):
+        """
+        一次远程任务备份 remote_projects_dir 下的所有项目 (list_projects 的结果):
+        1. 一条 find 统计所有项目的文件大小，在本地为每个项目决定 gzip 级别 (同 backup_project)
+        2. 一条命令用 xargs -P parallel 并行执行 tar，nice + ionice 降低对线上服务的 I/O 影响
+        所有备份使用同一个时间戳；位于项目目录下的备份目录本身不会被备份。
+        """
+        remote_projects_dir = remote_projects_dir.rstrip('/') or '/'
+        success, projects = self.list_projects(remote_projects_dir)
+        if not success:
+            return False, projects
+        backup_full = posixpath.normpath(backup_dir)
+        projects = [p for p in projects if posixpath.join(remote_projects_dir, p) != backup_full]
+        if not projects:
+            return False, f"{remote_projects_dir} 下没有项目"
+
+        file_sizes = {p: [] for p in projects}
+
+        def on_size(stream, line):
+            size, _, rel = line.partition('\t')
+            project, _, rest = rel.partition('/')
+            if stream == 'stdout' and size.isdigit() and project in file_sizes:
+                file_sizes[project].append((posixpath.basename(rest), int(size)))
+
+        if progress_callback:
+            progress_callback(f"正在统计 {len(projects)} 个项目的文件...")
+        self.run_command_stream(f"find '{remote_projects_dir}' -mindepth 2 -type f -printf '%s\\t%P\\n'",
+                                line_callback=on_size, max_capture=0, cancel_token=cancel_token)
+
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        args = []
+        for p in projects:
+            level = packaging.backup_level(file_sizes[p]) if file_sizes[p] else packaging.DEFAULT_LEVEL
+            args += [p, str(level), self.backup_name(p, timestamp)]
+
+        parallel = max(1, int(parallel))
+        prio = self.IO_PRIORITIES.get(io_priority, self.IO_PRIORITIES["idle"])
+        # 每个项目占 xargs 的 3 个参数: 项目名 gzip 级别 备份文件名；每个项目结束时输出一行 OK/FAIL 供进度显示
+        script = ('dest="$BKP/$3"; '
+                  'if $PRIO tar --use-compress-program="gzip -$2" -cf "$dest" -- "$1"; '
+                  'then printf "OK\\t%s\\t%s\\n" "$1" "$(stat -c %s "$dest")"; '
+                  'else rm -f "$dest"; printf "FAIL\\t%s\\n" "$1"; fi')
+        cmd = f"cd '{remote_projects_dir}' && mkdir -p '{backup_dir}' && BKP='{backup_dir}' && PRIO='nice -n 10' && "
+        if prio:
+            cmd += f"if command -v ionice >/dev/null 2>&1; then PRIO=\"$PRIO {prio}\"; fi && "
+        cmd += (f"export BKP PRIO && printf '%s\\0' {' '.join(shlex.quote(a) for a in args)} | "
+                f"xargs -0 -r -n 3 -P {parallel} sh -c {shlex.quote(script)} _")
+
+        done, failed = [], []
+
+        def on_line(stream, line):
+            if stream == 'stderr':
+                self.logger.warning(line)
+                return
+            kind, _, rest = line.partition('\t')
+            project, _, size = rest.partition('\t')
+            if kind == 'OK':
+                done.append(project)
+                message = f"{project} 完成 ({int(size or 0) / 1024 / 1024:.1f} MB)"
+            elif kind == 'FAIL':
+                failed.append(project)
+                message = f"{project} 失败"
+            else:
+                return
+            if progress_callback:
+                progress_callback(f"[{len(done) + len(failed)}/{len(projects)}] {message}")
+
+        if progress_callback:
+            progress_callback(f"开始备份 {len(projects)} 个项目 (并行 {parallel}，I/O 优先级 {io_priority})...")
+        status, _, err = self.run_command_stream(cmd, line_callback=on_line, max_capture=64 * 1024,
+                                                 cancel_token=cancel_token)
+        if failed or status != 0 or len(done) != len(projects):
+            missing = sorted(set(projects) - set(done))
+            return False, f"已备份 {len(done)}/{len(projects)} 个项目，失败: {', '.join(missing) or err}"
+        return True, f"已备份全部 {len(projects)} 个项目 (时间戳 {timestamp})"
+
+    def export_backup(self, backup_dir, backup_name, local_path, cancel_token=None, progress_callback=None):
+        """
+        把备份下载到本地: 分块续传 (断线后从已完成的分块继续)，大文件多条 SFTP 会话并发读取，sha256 校验后才生成目标文件。
+        """
+        remote_path = posixpath.join(backup_dir, backup_name)
+        try:
+            size = self.sftp.stat(remote_path).st_size
+            stripes = self.stripe_count if size >= self.stripe_threshold else 1
+            if progress_callback:
+                progress_callback(f"正在导出 {backup_name} ({size / 1024 / 1024:.1f} MB，{stripes} 路并发)...")
+            digest = transfer.download_file_resumable(self, remote_path, local_path, self.journal_dir,
+                                                      cancel_token=cancel_token, progress_callback=progress_callback,
+                                                      stripes=stripes, new_transport=self.stripe_new_transport)
+            return True, f"已导出到 {local_path} (sha256 {digest[:12]})"
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            return False, f"导出失败: {e}"
+
+    def import_backup(self, local_path, backup_dir, project_name, cancel_token=None, progress_callback=None):
+        """
+        把本地备份包上传到备份目录 (用于在另一台主机上回滚)。
+        文件名不以 "<项目>_" 开头时自动加上前缀，保证能出现在该项目的备份列表中；不会覆盖已有的同名备份。
+        先上传到隐藏的临时文件名，校验通过后才改名，未完成的导入不会出现在备份列表中。
+        """
+        name = os.path.basename(local_path)
+        if not name.startswith(f"{project_name}_"):
+            name = f"{project_name}_{name}"
+        remote_path = posixpath.join(backup_dir, name)
+        upload_path = posixpath.join(backup_dir, f".{name}.importing")
+        try:
+            out, _ = self.run_command(f"[ -e '{remote_path}' ] && echo 'exists'")
+            if out == 'exists':
+                return False, f"备份目录中已存在 {name}"
+            self.run_command(f"mkdir -p '{backup_dir}'")
+            size = os.path.getsize(local_path)
+            stripes = self.stripe_count if size >= self.stripe_threshold else 1
+            if progress_callback:
+                progress_callback(f"正在导入 {name} ({size / 1024 / 1024:.1f} MB，{stripes} 路并发)...")
+            # 小文件也走分块续传，统一做 sha256 校验
+            transfer.upload_file_resumable(self, local_path, upload_path, self.journal_dir,
+                                           cancel_token=cancel_token, progress_callback=progress_callback,
+                                           stripes=stripes, new_transport=self.stripe_new_transport)
+            out, err = self.run_command(f"[ ! -e '{remote_path}' ] && mv '{upload_path}' '{remote_path}' && echo 'moved'")
+            if out != 'moved':
+                self.run_command(f"rm -f '{upload_path}'")
+                return False, f"导入失败: 无法改名为 {name} {err}".rstrip()
+            return True, f"已导入备份 {name}"
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            return False, f"导入失败: {e}"
+
+    @staticmethod
+    def backup_name(project_name, timestamp=None):
+        timestamp = timestamp or time.strftime("%Y%m%d_%H%M%S")
+        return f"{project_name}_{timestamp}.tar.gz"
+
+    def deploy_project(self, local_path, remote_projects_dir, project_name, progress_callback=None,
+                       cancel_token=None):
         """
         部署逻辑:
         1. 上传 local_path 到 /tmp/<project_name>_new
@@ -156,62 +635,234 @@ class SSHManager:
         3. 删除现有项目内容
         4. 将 /tmp/<project_name>_new 内容移动到现有项目
         """
+        temp_remote_dir = None
         try:
-            temp_remote_dir = f"/tmp/{project_name}_new_{int(time.time())}"
-            target_project_path = posixpath.join(remote_projects_dir, project_name)
-            
             # 1. 上传
             if progress_callback: progress_callback("正在上传新版本...")
-            self.upload_dir(local_path, temp_remote_dir)
-
-            # 2. 保留配置
-            if progress_callback: progress_callback("正在保留配置...")
-            # 检查目标中是否存在 config.json
-            config_path = posixpath.join(target_project_path, "config.json")
-            check_config = f"[ -f '{config_path}' ] && echo 'yes'"
-            out, _ = self.run_command(check_config)
-            
-            if out == 'yes':
-                # 将配置从目标复制到临时目录
-                cmd = f"cp -f '{config_path}' '{posixpath.join(temp_remote_dir, 'config.json')}'"
-                self.run_command(cmd)
-            else:
-                self.logger.warning("目标项目没有 config.json，跳过保留配置步骤")
+            temp_remote_dir, _ = self.upload_staging(local_path, project_name, cancel_token=cancel_token)
 
-            # 3. & 4. 替换
-            if progress_callback: progress_callback("正在替换文件...")
-            
-            # 确保目标目录存在 (如果是新项目)
-            self.run_command(f"mkdir -p '{target_project_path}'")
-            
-            # 清理目标
-            rm_cmd = f"rm -rf '{target_project_path}'/*"  # 如果路径是根目录则很危险!!!
-            if len(target_project_path) < 5:
-                return False, "目标路径太短，拒绝执行危险操作"
-                
-            self.run_command(rm_cmd)
-            
-            # 从临时目录移动到目标
-            mv_cmd = f"cp -r '{temp_remote_dir}'/* '{target_project_path}'/"
-            out, err = self.run_command(mv_cmd)
-            if err:
-                return False, f"部署文件移动失败: {err}"
-                
-            # 清理临时目录
-            self.run_command(f"rm -rf '{temp_remote_dir}'")
-            
-            return True, "发布完成"
+            # 2. ~ 4. 保留配置并替换
+            return self.cutover(temp_remote_dir, remote_projects_dir, project_name, progress_callback)
 
+        except OperationCancelled:
+            # 替换前取消: 清理已上传的临时目录，线上版本保持不变
+            self.discard_staging(temp_remote_dir)
+            raise
         except Exception as e:
             return False, f"发布过程出错: {e}"
 
-    def upload_dir(self, local_dir, remote_dir):
-        """递归上传目录"""
+    def upload_staging(self, local_path, project_name, cancel_token=None, progress_callback=None,
+                       upload_filter=None):
+        """上传新版本到临时目录 (不影响线上版本)，返回 (临时目录路径, 上传统计)"""
+        temp_remote_dir = f"/tmp/{project_name}_new_{int(time.time())}"
+        try:
+            stats = self.upload_dir(local_path, temp_remote_dir, cancel_token=cancel_token,
+                            progress_callback=progress_callback, upload_filter=upload_filter)
+            if cancel_token: cancel_token.check()
+        except BaseException:
+            self.discard_staging(temp_remote_dir)
+            raise
+        return temp_remote_dir, stats
+
+    def discard_staging(self, temp_remote_dir):
+        """删除未切换的临时上传目录 (/tmp 下的临时目录或项目旁的硬链接暂存目录)"""
+        if not temp_remote_dir:
+            return
+        if temp_remote_dir.startswith("/tmp/") or self.STAGE_MARKER in posixpath.basename(temp_remote_dir):
+            self.run_command(f"rm -rf '{temp_remote_dir}'")
+            # 目录中大文件的 .part 已随之删除，对应的续传日志不会再用到
+            transfer.prune_journals(self.journal_dir, self.host_label, remote_prefix=temp_remote_dir.rstrip('/') + '/')
+
+    # 硬链接暂存目录名: .<项目>_stage_<时间戳>，位于项目目录旁 (同一文件系统才能硬链接)
+    STAGE_MARKER = "_stage_"
+
+    def clone_release(self, remote_projects_dir, project_name):
+        """
+        用 cp -al 把线上版本硬链接克隆为暂存目录 (只复制目录结构，不复制文件内容)。
+        项目不存在或克隆失败时返回 None，调用方应退回完整上传。
+        """
+        target = posixpath.join(remote_projects_dir, project_name)
+        stage = posixpath.join(remote_projects_dir, f".{project_name}{self.STAGE_MARKER}{int(time.time())}")
+        out, err = self.run_command(f"[ -d '{target}' ] && cp -al '{target}' '{stage}' && echo 'cloned'")
+        if out != 'cloned':
+            if err:
+                self.logger.warning(f"硬链接克隆失败，将完整上传: {err}")
+            self.discard_staging(stage)
+            return None
+        return stage
+
+    def apply_release_delta(self, stage_dir, local_dir, local_manifest, remote_manifest, keep=(),
+                            cancel_token=None, progress_callback=None, upload_filter=None):
+        """
+        把硬链接克隆的暂存目录更新为本地版本:
+        - 新增/内容变化的文件重新上传 (先删除再写入，打断硬链接，线上文件不受影响)
+        - 本地已不存在的文件与目录删除 (keep 中的文件保留，如服务器上的 config.json)
+        返回统计字典。
+        """
+        # 保留服务器版本的文件不能带着包里或旧版本的 .gz/.br 副本，否则 gzip_static/brotli_static 会返回它们
+        siblings = {rel + ext for rel in keep if rel in remote_manifest for ext in (".gz", ".br")}
+        changed = {rel for rel, entry in local_manifest.items()
+                   if remote_manifest.get(rel) != entry and not (rel in keep and rel in remote_manifest)
+                   and rel not in siblings}
+        removed = sorted(rel for rel in remote_manifest
+                         if (rel not in local_manifest or rel in siblings) and rel not in keep)
+
+        local_dirs = set()
+        for rel in local_manifest:
+            parts = rel.split("/")[:-1]
+            local_dirs.update("/".join(parts[:i]) for i in range(1, len(parts) + 1))
+        for root, dirs, _ in os.walk(local_dir):
+            rel_root = os.path.relpath(root, local_dir).replace("\\", "/")
+            local_dirs.update(d if rel_root == "." else f"{rel_root}/{d}" for d in dirs)
+
+        # 本地不存在的目录整体删除 (只删最上层)，其余被删除的文件逐个删除
+        out, _ = self.run_command(f"cd '{stage_dir}' && find . -mindepth 1 -type d -printf '%P\\n'")
+        extra_dirs = sorted(d for d in out.splitlines() if d and d not in local_dirs)
+        top_dirs = [d for d in extra_dirs if not any(d.startswith(p + "/") for p in extra_dirs)]
+        removed = [rel for rel in removed if not any(rel.startswith(d + "/") for d in top_dirs)]
+        doomed = top_dirs + removed
+        if doomed:
+            if cancel_token: cancel_token.check()
+            data = b"".join(rel.encode("utf-8") + b"\0" for rel in doomed)
+            status, err = self.run_command_input(f"cd '{stage_dir}' && xargs -0 -r rm -rf --", data)
+            if status != 0:
+                raise IOError(f"删除旧文件失败: {err}")
+
+        changed_bytes = sum(local_manifest[rel][0] for rel in changed)
+        if progress_callback:
+            progress_callback(f"增量更新: {len(changed)} 个文件变化 ({changed_bytes / 1024 / 1024:.2f} MB)，"
+                              f"删除 {len(removed)} 个文件、{len(top_dirs)} 个目录，"
+                              f"复用 {len(local_manifest) - len(changed)} 个文件")
+        sent = self.upload_dir(local_dir, stage_dir, cancel_token=cancel_token, progress_callback=progress_callback,
+                               upload_filter=upload_filter, only=changed, unlink_first=True)
+        return {"changed": len(changed), "changed_bytes": changed_bytes, "removed": len(removed),
+                "removed_dirs": len(top_dirs), "reused": len(local_manifest) - len(changed),
+                "files": sent["files"], "bytes": sent["bytes"]}
+
+    def swap_release(self, stage_dir, remote_projects_dir, project_name, progress_callback=None):
+        """用两次 rename 把暂存目录换成线上版本，旧版本随后删除"""
+        target = posixpath.join(remote_projects_dir, project_name)
+        if len(target) < 5:
+            return False, "目标路径太短，拒绝执行危险操作"
+        old = f"{stage_dir}_old"
+        if progress_callback: progress_callback("正在切换版本目录...")
+        out, err = self.run_command(f"mv '{target}' '{old}' && mv '{stage_dir}' '{target}' && echo 'swapped'")
+        if out != 'swapped':
+            # 第二次 rename 失败时把旧版本移回
+            self.run_command(f"[ -d '{target}' ] || mv '{old}' '{target}'")
+            return False, f"切换版本目录失败: {err}"
+        self.run_command(f"rm -rf '{old}'")
+        return True, "发布完成 (增量)"
+
+    def cutover(self, temp_remote_dir, remote_projects_dir, project_name, progress_callback=None):
+        """将已上传的临时目录切换为线上版本 (保留原 config.json)"""
+        target_project_path = posixpath.join(remote_projects_dir, project_name)
+
+        # 保留配置
+        if progress_callback: progress_callback("正在保留配置...")
+        # 检查目标中是否存在 config.json
+        config_path = posixpath.join(target_project_path, "config.json")
+        check_config = f"[ -f '{config_path}' ] && echo 'yes'"
+        out, _ = self.run_command(check_config)
+        
+        if out == 'yes':
+            # 将配置从目标复制到临时目录
+            cmd = f"cp -f '{config_path}' '{posixpath.join(temp_remote_dir, 'config.json')}'"
+            self.run_command(cmd)
+            # 包里的 config.json.gz/.br 会被 gzip_static/brotli_static 优先返回，保留服务器配置时删除
+            self.run_command(f"rm -f '{posixpath.join(temp_remote_dir, 'config.json')}'.gz "
+                             f"'{posixpath.join(temp_remote_dir, 'config.json')}'.br")
+        else:
+            self.logger.warning("目标项目没有 config.json，跳过保留配置步骤")
+
+        # 替换
+        if progress_callback: progress_callback("正在替换文件...")
+        
+        # 确保目标目录存在 (如果是新项目)
+        self.run_command(f"mkdir -p '{target_project_path}'")
+        
+        # 清理目标
+        rm_cmd = f"rm -rf '{target_project_path}'/*"  # 如果路径是根目录则很危险!!!
+        if len(target_project_path) < 5:
+            return False, "目标路径太短，拒绝执行危险操作"
+            
+        self.run_command(rm_cmd)
+        
+        # 从临时目录移动到目标 (使用 /. 以包含 .htaccess 等隐藏文件)
+        mv_cmd = f"cp -r '{temp_remote_dir}'/. '{target_project_path}'/"
+        out, err = self.run_command(mv_cmd)
+        if err:
+            return False, f"部署文件移动失败: {err}"
+            
+        # 清理临时目录
+        self.discard_staging(temp_remote_dir)
+        
+        return True, "发布完成"
+
+    def sync_changes(self, local_dir, remote_dir, changed, removed, keep=(), cancel_token=None,
+                     progress_callback=None):
+        """
+        监听模式的增量同步 (直接写入线上目录，不备份、不整体替换):
+        - changed 中仍存在的文件重新上传 (先删除再写入，正在读取旧文件的请求不受影响)
+        - removed 中的文件删除，删除后本地已不存在的空目录一并删除
+        keep 中的文件既不上传也不删除 (如服务器上的 config.json)。
+        返回 {"files", "bytes", "removed"}。
+        """
+        changed = {rel for rel in changed
+                   if rel not in keep and os.path.isfile(os.path.join(local_dir, rel))}
+        doomed = sorted(rel for rel in removed if rel not in keep and rel not in changed)
+        stats = {"files": 0, "bytes": 0, "removed": len(doomed)}
+        if doomed:
+            if cancel_token: cancel_token.check()
+            data = b"".join(rel.encode("utf-8") + b"\0" for rel in doomed)
+            status, err = self.run_command_input(f"cd '{remote_dir}' && xargs -0 -r rm -f --", data)
+            if status != 0:
+                raise IOError(f"删除远程文件失败: {err}")
+            gone_dirs = set()
+            for rel in doomed:
+                parent = posixpath.dirname(rel)
+                while parent and not os.path.isdir(os.path.join(local_dir, parent)):
+                    gone_dirs.add(parent)
+                    parent = posixpath.dirname(parent)
+            if gone_dirs:
+                # 先删最深的目录；目录中还有其他文件时保留
+                data = b"".join(d.encode("utf-8") + b"\0"
+                                for d in sorted(gone_dirs, key=lambda d: d.count("/"), reverse=True))
+                self.run_command_input(f"cd '{remote_dir}' && xargs -0 -r rmdir --ignore-fail-on-non-empty --", data)
+        if changed:
+            if progress_callback:
+                size = sum(os.path.getsize(os.path.join(local_dir, rel)) for rel in changed)
+                progress_callback(f"同步 {len(changed)} 个文件 ({size / 1024 / 1024:.2f} MB)，删除 {len(doomed)} 个")
+            stats.update(self.upload_dir(local_dir, remote_dir, cancel_token=cancel_token,
+                                         progress_callback=progress_callback, only=changed, unlink_first=True))
+        return stats
+
+    def upload_dir(self, local_dir, remote_dir, cancel_token=None, progress_callback=None, upload_filter=None,
+                   only=None, unlink_first=False):
+        """
+        递归上传目录 (cancel_token 在文件之间以及单个文件传输过程中检查)。
+        upload_filter (UploadFilter) 不为空时跳过被规则排除的文件并记录跳过统计。
+        only: 只上传这些相对路径 (增量更新)；unlink_first: 写入前先删除远程已有文件 (打断硬链接)。
+        大于 resumable_threshold 的文件走分块续传，断线后自动重连并从已确认的分块继续；
+        大于 stripe_threshold 的文件再拆成多个条带并发写入。
+        返回 {"files": 上传文件数, "bytes": 实际发送字节数}。
+        """
+        if self.packed_upload:
+            return self._upload_dir_packed(local_dir, remote_dir, cancel_token, progress_callback, upload_filter,
+                                           only, unlink_first)
+
+        def check_cancel(transferred, total):
+            if cancel_token:
+                cancel_token.check()
+
+        stats = {"files": 0, "bytes": 0}
         try:
             self.run_command(f"mkdir -p '{remote_dir}'")
             for root, dirs, files in os.walk(local_dir):
                 rel_path = os.path.relpath(root, local_dir)
                 remote_root = posixpath.join(remote_dir, rel_path.replace('\\', '/'))
+                if upload_filter:
+                    upload_filter.prune_dirs(root, rel_path.replace('\\', '/'), dirs)
                 
                 # 创建远程子目录
                 for d in dirs:
@@ -219,49 +870,331 @@ class SSHManager:
                 
                 # 上传文件
                 for f in files:
+                    if cancel_token: cancel_token.check()
                     local_file = os.path.join(root, f)
                     remote_file = posixpath.join(remote_root, f)
-                    self.sftp.put(local_file, remote_file)
+                    file_size = os.path.getsize(local_file)
+                    rel_file = posixpath.normpath(posixpath.join(rel_path.replace('\\', '/'), f))
+                    if upload_filter and not upload_filter.check(rel_file, file_size):
+                        continue
+                    if only is not None and rel_file not in only:
+                        continue
+                    if file_size >= self.resumable_threshold:
+                        stripes = self.stripe_count if file_size >= self.stripe_threshold else 1
+                        transfer.upload_file_resumable(self, local_file, remote_file, self.journal_dir,
+                                                       cancel_token=cancel_token,
+                                                       progress_callback=progress_callback,
+                                                       stripes=stripes,
+                                                       new_transport=self.stripe_new_transport)
+                    else:
+                        if unlink_first:
+                            try:
+                                self.sftp.remove(remote_file)
+                            except IOError:
+                                pass
+                        self.sftp.put(local_file, remote_file, callback=check_cancel)
+                    stats["files"] += 1
+                    stats["bytes"] += file_size
         except Exception as e:
             raise e
+        return stats
+
+    def _upload_dir_packed(self, local_dir, remote_dir, cancel_token=None, progress_callback=None,
+                           upload_filter=None, only=None, unlink_first=False):
+        """
+        按可压缩性分组后流式上传:
+        - 文本类文件打成 gzip tar 流，级别根据链路速度与本地压缩速度选择
+        - 图片/字体/视频等已压缩文件打成不压缩的 tar 流
+        - 大文件仍走分块续传
+        """
+        plan = packaging.classify(local_dir, large_threshold=self.resumable_threshold, upload_filter=upload_filter,
+                                  only=only)
+        sizes = plan["sizes"]
+        link_bps = self.tuning.get("throughput_mbps", 0) * 1024 * 1024 if self.tuning else None
+        level, measured = packaging.choose_level(
+            packaging.read_sample(local_dir, plan["compressed"]), link_bps)
+        if measured:
+            self.logger.info(f"gzip level candidates: {measured}")
+
+        stats = {"files": len(sizes), "bytes": sum(sizes[rel] for rel in plan["large"])}
+        groups = [("文本文件", plan["compressed"], level), ("已压缩文件", plan["stored"], None)]
+        dirs = plan["dirs"]  # 目录条目随第一条 tar 流发送，保证空目录也会被创建
+        # remote_dir 本身由第一条 tar 流 (或下面的 _make_dirs) 创建；包为空时也必须存在，后续切换才能 mv
+        dirs_pending = True
+        if unlink_first:
+            # --unlink-first 会尝试删除已存在的目录条目，增量更新时目录单独创建
+            self._make_dirs(remote_dir, dirs)
+            dirs, dirs_pending = (), False
+        for label, rels, group_level in groups:
+            if not rels:
+                continue
+            raw = sum(sizes[rel] for rel in rels)
+            mode = f"gzip -{group_level}" if group_level else "不压缩"
+            if progress_callback:
+                progress_callback(f"正在上传{label}: {len(rels)} 个, {raw / 1024 / 1024:.1f} MB ({mode})")
+            sent = packaging.stream_tar_to_remote(
+                self, local_dir, rels, remote_dir, dirs=dirs, level=group_level, cancel_token=cancel_token,
+                on_bytes=self._throttled_bytes(progress_callback, label), unlink_first=unlink_first)
+            dirs, dirs_pending = (), False
+            stats["bytes"] += sent
+            if progress_callback:
+                progress_callback(f"{label}上传完成，实际传输 {sent / 1024 / 1024:.1f} MB")
+
+        if dirs_pending:
+            self._make_dirs(remote_dir, dirs)
+
+        for rel in plan["large"]:
+            if cancel_token: cancel_token.check()
+            remote_file = posixpath.join(remote_dir, rel)
+            self.run_command(f"mkdir -p '{posixpath.dirname(remote_file)}'")
+            size = sizes[rel]
+            stripes = self.stripe_count if size >= self.stripe_threshold else 1
+            transfer.upload_file_resumable(self, os.path.join(local_dir, rel), remote_file, self.journal_dir,
+                                           cancel_token=cancel_token, progress_callback=progress_callback,
+                                           stripes=stripes, new_transport=self.stripe_new_transport)
+        return stats
+
+    def _make_dirs(self, remote_dir, dirs):
+        """一次远程调用创建 remote_dir 及其下的多个子目录"""
+        self.run_command(f"mkdir -p '{remote_dir}'")
+        if dirs:
+            data = b"".join(d.encode("utf-8") + b"\0" for d in dirs)
+            status, err = self.run_command_input(f"cd '{remote_dir}' && xargs -0 -r mkdir -p --", data)
+            if status != 0:
+                raise IOError(f"创建远程目录失败: {err}")
 
-    def rollback_project(self, backup_path_tar, target_project_path):
+    def rollback_project(self, backup_path_tar, target_project_path, progress_callback=None,
+                         cancel_token=None, verify=False):
         """
         回滚逻辑:
-        1. 清理目标
-        2. 解压备份 (tar -xzf)
+        1. 把备份解压到项目旁的临时目录 (tar -xzvf，流式输出进度)，线上版本此时不受影响
+        2. 解压成功后用两次 rename 换入 (同 swap_release)，旧版本随后删除
+        解压失败或被取消时只删除临时目录，线上版本保持不变。
         """
+        target_project_path = target_project_path.rstrip('/')
         if len(target_project_path) < 5:
             return False, "目标路径太短，拒绝执行危险操作"
 
-        # 校验备份文件是否以 .tar.gz 结尾 (简单校验)
-        # 其实不强制，只要是 tar 包即可，但符合我们生成规则
-        
-        # 1. 清理
-        cmd_clean = f"rm -rf '{target_project_path}'" # 我们删掉整个文件夹，因为 tar 解压会带文件夹头
-        # 稍微危险，需要确认 parent
         parent_dir = posixpath.dirname(target_project_path)
         project_dirname = posixpath.basename(target_project_path)
-        
-        # 这里为了安全，我们还是清空内容吧，但是 tar -C parent 可能会解压出 proj_name 目录
-        # 如果 proj_name 目录已存在，tar 通常会覆盖其中的文件。
-        # 为了干净的回滚（删除新版增加的文件），最好是 rm -rf target_project_path
-        
-        # 检查 parent 是否存在
         if not parent_dir: return False, "无法确定父目录"
-        
-        self.run_command(f"rm -rf '{target_project_path}'")
-        
-        # 2. 解压
-        # tar -xzf backup.tar.gz -C /path/to/parent
-        cmd_restore = f"tar -xzf '{backup_path_tar}' -C '{parent_dir}'"
-        out, err = self.run_command(cmd_restore)
-        
-        # 再次确认
-        check_exist = f"[ -d '{target_project_path}' ] && echo 'ok'"
-        out_check, _ = self.run_command(check_exist)
-        
-        if out_check == 'ok':
-            return True, "回滚成功"
-        else:
-             return False, f"回滚失败 (解压错误?): {err}"
+
+        # 压缩包内的顶层是项目文件夹，解压到 .<项目>_stage_restore_<时间戳>/<项目>
+        restore_dir = posixpath.join(parent_dir, f".{project_dirname}{self.STAGE_MARKER}restore_{int(time.time())}")
+        restored = posixpath.join(restore_dir, project_dirname)
+        try:
+            self.run_command(f"rm -rf '{restore_dir}' && mkdir -p '{restore_dir}'")
+            cmd_restore = f"tar -xzvf '{backup_path_tar}' -C '{restore_dir}'"
+            on_line, state = self._throttled_progress(progress_callback, "正在解压")
+            status, _, err = self.run_command_stream(cmd_restore, line_callback=on_line, cancel_token=cancel_token)
+            if progress_callback:
+                progress_callback(f"解压完成，共 {state['count']} 项")
+            if status != 0:
+                return False, f"回滚失败 (解压错误，退出码 {status}): {err}"
+
+            out_check, _ = self.run_command(f"[ -d '{restored}' ] && echo 'ok'")
+            if out_check != 'ok':
+                return False, f"回滚失败: 备份包中没有 {project_dirname} 目录"
+
+            # 切换: 旧版本先移开，换入失败时移回
+            if progress_callback: progress_callback("正在切换到备份版本...")
+            old = f"{restore_dir}_old"
+            out, err = self.run_command(f"{{ [ ! -e '{target_project_path}' ] || mv '{target_project_path}' '{old}'; }} "
+                                        f"&& mv '{restored}' '{target_project_path}' && echo 'swapped'")
+            if out != 'swapped':
+                self.run_command(f"[ -e '{target_project_path}' ] || mv '{old}' '{target_project_path}'")
+                return False, f"回滚失败 (切换目录出错): {err}"
+            self.run_command(f"rm -rf '{old}'")
+        finally:
+            try:
+                self.discard_staging(restore_dir)
+            except Exception as e:
+                self.logger.warning(f"清理临时解压目录失败: {e}")
+
+        if verify:
+            if progress_callback: progress_callback("正在校验回滚结果...")
+            problems = self.verify_restore(backup_path_tar, target_project_path, cancel_token=cancel_token)
+            if problems:
+                self.report_problems(problems, progress_callback)
+                return False, f"回滚校验失败: {len(problems)} 个文件与备份不一致"
+        return True, "回滚成功"
+
+    # --- 完整性校验 ---
+
+    def remote_manifest(self, remote_dir, parallel=4, with_hash=True, cancel_token=None):
+        """
+        一次远程调用生成目录清单: {相对路径: (size, sha256 或 None)}。
+        大小来自 find -printf，哈希由 xargs -P 并行 sha256sum 计算，不会每个文件单独执行一次命令。
+        文件名按 sha256sum 的规则转义 (反斜杠写作 \\\\，换行写作 \\n)，含特殊字符的文件名也能按行解析。
+        """
+        sizes = {}
+        hashes = {}
+
+        def on_line(stream, line):
+            if stream != 'stdout' or not line:
+                return
+            if line.startswith('S\t'):
+                _, size, rel = line.split('\t', 2)
+                sizes[self._unescape_name(rel)] = int(size)
+                return
+            if with_hash:
+                parsed = self.parse_sha256_line(line)
+                if parsed:
+                    hashes[parsed[0]] = parsed[1]
+
+        # find 的输出以 NUL 结尾，经 sed 转义反斜杠与换行后再按行输出
+        cmd = (f"cd '{remote_dir}' && find . -type f -printf 'S\\t%s\\t%P\\0' "
+               f"| sed -z 's/\\\\/\\\\\\\\/g; s/\\n/\\\\n/g' | tr '\\0' '\\n'")
+        if with_hash:
+            cmd += f" && find . -type f -print0 | xargs -0 -r -P {int(parallel)} -n 500 sha256sum"
+        status, _, err = self.run_command_stream(cmd, line_callback=on_line, max_capture=64 * 1024,
+                                                 cancel_token=cancel_token)
+        if status != 0:
+            raise RuntimeError(f"远程清单生成失败: {err}")
+        return {rel: (size, hashes.get(rel)) for rel, size in sizes.items()}
+
+    def remote_hashes(self, remote_dir, rels, parallel=4, cancel_token=None):
+        """
+        只对 remote_dir 下指定的相对路径计算 sha256，返回 {相对路径: sha256}。
+        路径列表以 NUL 分隔经 SFTP 写入临时文件，再由 xargs -P 并行 sha256sum，不存在的文件不出现在结果中。
+        """
+        hashes = {}
+        if not rels:
+            return hashes
+        list_path = f"{remote_dir.rstrip('/')}.hashlist"
+
+        def on_line(stream, line):
+            if stream != 'stdout' or not line:
+                return
+            parsed = self.parse_sha256_line(line)
+            if parsed:
+                hashes[parsed[0]] = parsed[1]
+
+        try:
+            with self.sftp.open(list_path, "wb") as f:
+                f.write(b"".join(f"./{rel}".encode("utf-8") + b"\0" for rel in rels))
+            cmd = f"cd '{remote_dir}' && xargs -0 -r -P {int(parallel)} -n 500 sha256sum < '{list_path}'"
+            status, _, err = self.run_command_stream(cmd, line_callback=on_line, max_capture=64 * 1024,
+                                                     cancel_token=cancel_token)
+        finally:
+            self.run_command(f"rm -f '{list_path}'")
+        if status != 0:
+            raise RuntimeError(f"远程哈希计算失败: {err}")
+        return hashes
+
+    @classmethod
+    def parse_sha256_line(cls, line):
+        """解析一行 sha256sum 输出 (<hash>  ./path)，返回 (相对路径, sha256)；不是哈希行时返回 None"""
+        # 文件名含反斜杠或换行时整行以 \ 开头且文件名被转义
+        escaped = line.startswith('\\')
+        if escaped:
+            line = line[1:]
+        if len(line) <= 66 or line[64:66] != '  ':
+            return None
+        rel = line[66:]
+        if rel.startswith('./'):
+            rel = rel[2:]
+        return (cls._unescape_name(rel) if escaped else rel), line[:64]
+
+    @staticmethod
+    def _unescape_name(name):
+        """还原 sha256sum 风格的文件名转义 (\\\\ -> \\，\\n -> 换行)"""
+        return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), name)
+
+    def remote_size_listing(self, remote_dir, gzip_exts=(), parallel=4, sample_limit=8 * 1024 * 1024,
+                            cancel_token=None):
+        """
+        一条远程命令列出目录下所有文件的大小，并对 gzip_exts 类型的文件并行计算 gzip -6 后的大小。
+        超过 sample_limit 的文件只压缩开头部分，按压缩率估算。
+        返回 {相对路径: (大小, gzip 体积或 None)}；目录不存在时返回空字典。
+        """
+        sizes = {}
+        gzipped = {}
+
+        def on_line(stream, line):
+            if stream != 'stdout' or not line:
+                return
+            kind, _, rest = line.partition('\t')
+            size, _, rel = rest.partition('\t')
+            if not size.strip().isdigit():
+                return
+            if kind == 'S':
+                sizes[rel] = int(size)
+            elif kind == 'G':
+                gzipped[rel[2:] if rel.startswith('./') else rel] = int(size.strip())
+
+        cmd = f"cd '{remote_dir}' 2>/dev/null || exit 0; find . -type f -printf 'S\\t%s\\t%P\\n'"
+        if gzip_exts:
+            names = " -o ".join(f"-name '*{ext}'" for ext in sorted(gzip_exts))
+            cmd += (f" && find . -type f \\( {names} \\) -print0 | xargs -0 -r -P {int(parallel)} -n 50 "
+                    f"sh -c 'for f; do printf \"G\\t%s\\t%s\\n\" "
+                    f"\"$(head -c {int(sample_limit)} \"$f\" | gzip -6 -c | wc -c)\" \"$f\"; done' _")
+        status, _, err = self.run_command_stream(cmd, line_callback=on_line, max_capture=64 * 1024,
+                                                 cancel_token=cancel_token)
+        if status != 0:
+            raise RuntimeError(f"远程文件列表获取失败: {err}")
+        listing = {}
+        for rel, size in sizes.items():
+            gz = gzipped.get(rel)
+            if gz is not None and size > sample_limit:
+                gz = int(gz * size / sample_limit)
+            listing[rel] = (size, gz)
+        return listing
+
+    def verify_manifest(self, remote_dir, local_manifest, ignore=(), parallel=4, cancel_token=None):
+        """
+        对比本地清单 {rel: (size, sha256)} 与远程目录，返回问题列表 [(rel, 原因)]，空列表表示一致。
+        远程多出的文件不视为错误。
+        """
+        remote = self.remote_manifest(remote_dir, parallel=parallel, cancel_token=cancel_token)
+        problems = []
+        for rel, (size, digest) in sorted(local_manifest.items()):
+            if rel in ignore:
+                continue
+            if rel not in remote:
+                problems.append((rel, "远程缺失"))
+                continue
+            r_size, r_digest = remote[rel]
+            if r_size != size:
+                problems.append((rel, f"大小不一致 (本地 {size} / 远程 {r_size})"))
+            elif r_digest != digest:
+                problems.append((rel, "sha256 不一致"))
+        return problems
+
+    def verify_restore(self, backup_path_tar, target_project_path, cancel_token=None):
+        """对比备份包内的文件大小与解压结果 (tar -tv 列表 + find 一次完成)，返回问题列表"""
+        project_dirname = posixpath.basename(target_project_path.rstrip('/'))
+        expected = {}
+
+        def on_line(stream, line):
+            # -rw-r--r-- user/group 1234 2024-01-01 12:00 proj/path/file
+            parts = line.split(None, 5)
+            if stream != 'stdout' or len(parts) < 6 or not line.startswith('-'):
+                return
+            name = parts[5]
+            prefix = project_dirname + '/'
+            if name.startswith('./'):
+                name = name[2:]
+            if name.startswith(prefix):
+                expected[name[len(prefix):]] = int(parts[2])
+
+        status, _, err = self.run_command_stream(f"tar -tvzf '{backup_path_tar}'", line_callback=on_line,
+                                                 max_capture=64 * 1024, cancel_token=cancel_token)
+        if status != 0:
+            return [("(备份包)", f"无法读取备份包: {err}")]
+        remote = self.remote_manifest(target_project_path, with_hash=False, cancel_token=cancel_token)
+        problems = []
+        for rel, size in sorted(expected.items()):
+            if rel not in remote:
+                problems.append((rel, "未恢复"))
+            elif remote[rel][0] != size:
+                problems.append((rel, f"大小不一致 (备份 {size} / 远程 {remote[rel][0]})"))
+        return problems
+
+    def report_problems(self, problems, progress_callback=None, limit=50):
+        """逐文件输出校验问题，超过 limit 条时折叠"""
+        log = progress_callback or self.logger.error
+        for rel, reason in problems[:limit]:
+            log(f"  ✗ {rel}: {reason}")
+        if len(problems) > limit:
+            log(f"  ... 另有 {len(problems) - limit} 个文件存在问题")
@@ -0,0 +1,41 @@
+import threading
+import time
+
+
+class OperationCancelled(Exception):
+    """操作被用户取消"""
+    pass
+
+
+class CancelToken:
+    """
+    协作式取消标记。
+    工作函数在循环中调用 check() 或 is_set()，由 UI 线程调用 cancel()。
+    """
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        # 子标记: 父标记取消时子标记也视为已取消，反之不影响父标记
+        self._parent = parent
+
+    def cancel(self):
+        self._event.set()
+
+    def is_set(self):
+        return self._event.is_set() or (self._parent is not None and self._parent.is_set())
+
+    def check(self):
+        """已取消则抛出 OperationCancelled"""
+        if self.is_set():
+            raise OperationCancelled("操作已取消")
+
+    def wait(self, timeout):
+        """可被取消打断的 sleep，返回 True 表示已取消"""
+        if self._parent is None:
+            return self._event.wait(timeout)
+        deadline = time.monotonic() + timeout
+        while not self.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._event.wait(min(remaining, 0.1))
+        return True
@@ -0,0 +1,389 @@
+import os
+import posixpath
+import shutil
+import tempfile
+import time
+import zipfile
+
+from .cancel import OperationCancelled
+from .pipeline import Stage, StagePipeline, StageFailed
+from .fingerprint import build_manifest, file_digest, manifest_digest
+from . import precompress
+from . import size_report
+from . import warmup
+
+
+class DeployFlow:
+    """
+    一次发版的阶段图:
+
+        prepare (本地解压/定位子目录) ──> upload (上传到临时目录) ──┐
+        backup  (远程 tar 备份) ───────────────────────────────────┴──> cutover (替换线上版本)
+                                                      manifest (本地清单) ──> verify (远程校验，失败自动回滚)
+
+    本地准备、远程备份与上传并发执行，只有最终切换需要等待全部完成。
+    hardlink=True 时增加 clone 阶段 (cp -al 克隆线上版本并生成远程清单)，upload 只上传与本地清单不同的文件，
+    cutover 通过 rename 交换目录；项目不存在或无法硬链接时自动退回完整上传。
+    verify=True 时额外生成本地清单 (与上传并行) 并在切换后一次性远程校验。
+    precompress 不为 None 时在 prepare 之后插入 precompress 阶段 (生成 .gz/.br)，上传与清单都等待它完成。
+    warmup 提供 base_url 时在切换 (及校验) 之后增加 warmup 阶段，并发请求新版本的资源预热缓存。
+    size_report 不为 None 时增加 report 阶段 (与上传并行)，在切换前对比新包与线上版本的体积并按阈值警告。
+    """
+    # 切换时会用服务器上原有的 config.json 覆盖，校验时忽略
+    VERIFY_IGNORE = ("config.json",)
+    # 这些文件的预压缩副本: gzip_static/brotli_static 会优先返回它们，保留服务器版本时一并删除，校验时忽略
+    KEEP_SIBLINGS = tuple(f"{rel}{ext}" for rel in VERIFY_IGNORE for ext in (".gz", ".br"))
+
+    def __init__(self, ssh_manager, local_path, sub_dir, remote_root, project, backup_root, log=None,
+                 verify=False, fingerprint_cache=None, precompress=None, upload_filter=None, hardlink=False,
+                 size_report=None, warmup=None):
+        self.ssh_manager = ssh_manager
+        self.local_path = local_path
+        self.sub_dir = sub_dir
+        self.remote_root = remote_root
+        self.project = project
+        self.backup_root = backup_root
+        self.log = log or (lambda msg: None)
+        self.verify_enabled = verify
+        self.fingerprint_cache = fingerprint_cache
+        # 预压缩参数 (传给 precompress.precompress_dir，至少包含 cache_dir)，None 表示不预压缩
+        self.precompress_options = precompress
+        # 项目的包含/排除规则 (UploadFilter)，解压与上传时应用并统计跳过量
+        self.upload_filter = upload_filter or None
+        self.hardlink = hardlink
+        # 包体积报告的阈值 (见 size_report.DEFAULT_THRESHOLDS)，None 表示不生成报告
+        self.size_report_thresholds = size_report
+        self.size_report = None
+        # 发布后缓存预热参数 {base_url, concurrency, timeout, max_urls, paths}，None 表示不预热
+        self.warmup_options = warmup
+        self.warmup_stats = None
+        # 本次是否使用了硬链接增量暂存 (决定切换方式)
+        self.incremental = False
+        # 备份文件名在 backup 阶段开始时生成 (排队等待的任务不使用入队时的时间戳)
+        self.backup_file = None
+
+        self.temp_extract_dir = None
+        # 直接发布本地目录并预压缩时的镜像目录 (不向用户的构建目录写入 .gz/.br)
+        self.mirror_dir = None
+        self.staging_dir = None
+        # 指纹缓存键前缀: ZIP 每次解压到不同临时目录，需用 ZIP 路径 + 成员路径作为稳定键
+        self.cache_key_prefix = None
+        # ZIP 成员的 CRC32 {相对路径: crc}，附加到缓存键 (可复现构建会统一成员时间戳，大小与时间都不足以区分内容)
+        self.cache_key_suffixes = None
+        self.timings = {}
+        # 供发布历史使用: 包哈希、本地清单与上传统计
+        self.package_hash = None
+        self.local_manifest = None
+        self.upload_stats = None
+
+    # --- Stages ---
+
+    def prepare(self, ctx, cancel_token):
+        """解压 ZIP 并定位子目录，返回待上传的本地目录"""
+        deploy_source_path = self.local_path
+
+        # 如果是 ZIP 文件
+        if os.path.isfile(self.local_path) and self.local_path.lower().endswith('.zip'):
+            self.log(f"正在解压 {os.path.basename(self.local_path)}...")
+            self.package_hash = file_digest(self.local_path, self.fingerprint_cache)
+            self.temp_extract_dir = tempfile.mkdtemp()
+            prefix = self.sub_dir.replace("\\", "/").strip("/") + "/" if self.sub_dir else ""
+            self.cache_key_suffixes = {}
+            with zipfile.ZipFile(self.local_path, 'r') as zip_ref:
+                for member in zip_ref.infolist():
+                    cancel_token.check()
+                    if not self._want_member(member, prefix):
+                        continue
+                    extracted = zip_ref.extract(member, self.temp_extract_dir)
+                    if not member.is_dir():
+                        self.cache_key_suffixes[member.filename[len(prefix):]] = f"{member.CRC:08x}"
+                        # 保留包内的修改时间，使指纹缓存在重复发布同一个包时可以命中
+                        mtime = time.mktime(member.date_time + (0, 0, -1))
+                        os.utime(extracted, (mtime, mtime))
+            deploy_source_path = self.temp_extract_dir
+
+        # 处理子路径 (例如 dist)
+        if self.sub_dir:
+            potential_path = os.path.join(deploy_source_path, self.sub_dir)
+            if os.path.exists(potential_path) and os.path.isdir(potential_path):
+                deploy_source_path = potential_path
+                self.log(f"定位到子目录: {self.sub_dir}")
+            else:
+                # 只有当用户显式指定了子路径，且该路径不存在时才报错
+                raise StageFailed(f"未在包中找到子目录: {self.sub_dir}")
+
+        if self.temp_extract_dir:
+            inner = os.path.relpath(deploy_source_path, self.temp_extract_dir).replace("\\", "/")
+            self.cache_key_prefix = f"zip:{os.path.abspath(self.local_path)}!{inner}/"
+        return deploy_source_path
+
+    def precompress(self, ctx, cancel_token):
+        """生成 .gz/.br，返回之后上传的本地目录 (ZIP 的临时解压目录直接写入，本地目录先硬链接镜像)"""
+        root = ctx["prepare"]
+        if not self.temp_extract_dir:
+            self.mirror_dir = tempfile.mkdtemp(prefix="deploy_precompress_")
+            count = precompress.mirror_tree(root, self.mirror_dir, upload_filter=self.upload_filter,
+                                            cancel_token=cancel_token)
+            self.log(f"已镜像 {count} 个文件到临时目录用于预压缩")
+            # 指纹缓存仍按原目录的路径为键，镜像目录每次不同也能命中
+            self.cache_key_prefix = os.path.abspath(root) + os.sep
+            root = self.mirror_dir
+        stats = precompress.precompress_dir(root, fingerprint_cache=self.fingerprint_cache,
+                                            key_prefix=self.cache_key_prefix, key_suffixes=self.cache_key_suffixes,
+                                            cancel_token=cancel_token,
+                                            progress_callback=self.log, file_filter=self.upload_filter,
+                                            exclude=self.VERIFY_IGNORE, **self.precompress_options)
+        self.log(precompress.describe(stats))
+        return root
+
+    @staticmethod
+    def _local_dir(ctx):
+        """待上传的本地目录: 预压缩后为其输出目录，否则为 prepare 的结果"""
+        return ctx.get("precompress") or ctx["prepare"]
+
+    def _want_member(self, member, prefix):
+        """ZIP 成员过滤: 只解压子目录内、且未被上传规则排除的条目"""
+        name = member.filename
+        if prefix and not name.startswith(prefix):
+            return False
+        rel = name[len(prefix):]
+        if not rel or not self.upload_filter:
+            return True
+        if member.is_dir():
+            return self.upload_filter.accepts_dir(rel.rstrip("/"))
+        return self.upload_filter.check(rel, member.file_size)
+
+    def backup(self, ctx, cancel_token):
+        self.backup_file = self.ssh_manager.backup_name(self.project)
+        ok, msg = self.ssh_manager.backup_project(self.remote_root, self.project, self.backup_root,
+                                                  progress_callback=self.log, cancel_token=cancel_token,
+                                                  dest_name=self.backup_file)
+        if not ok:
+            raise StageFailed(msg)
+        self.log(msg)
+        return msg
+
+    def clone(self, ctx, cancel_token):
+        """硬链接克隆线上版本，返回 (暂存目录, 远程清单)；无法克隆时返回 None"""
+        stage = self.ssh_manager.clone_release(self.remote_root, self.project)
+        if not stage:
+            self.log("无法硬链接克隆线上版本，将完整上传")
+            return None
+        self.staging_dir = stage
+        # 只列出大小，哈希在上传阶段按本地清单只计算大小相同的文件，不必哈希整个线上目录
+        return stage, self.ssh_manager.remote_manifest(stage, with_hash=False, cancel_token=cancel_token)
+
+    def _hash_candidates(self, stage, local_manifest, remote_sizes, cancel_token):
+        """为与本地大小相同的远程文件补上 sha256；大小不同的文件哈希为 None，必然判定为已变化"""
+        candidates = [rel for rel, (size, _) in remote_sizes.items()
+                      if rel in local_manifest and local_manifest[rel][0] == size]
+        hashes = self.ssh_manager.remote_hashes(stage, candidates, cancel_token=cancel_token)
+        self.log(f"远程清单: {len(remote_sizes)} 个文件，其中 {len(candidates)} 个大小相同需要比对哈希")
+        return {rel: (size, hashes.get(rel)) for rel, (size, _) in remote_sizes.items()}
+
+    def upload(self, ctx, cancel_token):
+        if ctx.get("clone"):
+            stage, remote_sizes = ctx["clone"]
+            remote_manifest = self._hash_candidates(stage, ctx["manifest"], remote_sizes, cancel_token)
+            self.upload_stats = self.ssh_manager.apply_release_delta(
+                stage, self._local_dir(ctx), ctx["manifest"], remote_manifest, keep=self.VERIFY_IGNORE,
+                cancel_token=cancel_token, progress_callback=self.log, upload_filter=self.upload_filter)
+            self.incremental = True
+            self._log_skipped()
+            return stage
+
+        self.staging_dir, self.upload_stats = self.ssh_manager.upload_staging(
+            self._local_dir(ctx), self.project, cancel_token=cancel_token, progress_callback=self.log,
+            upload_filter=self.upload_filter)
+        self._log_skipped()
+        return self.staging_dir
+
+    def _log_skipped(self):
+        summary = self.upload_filter.summary() if self.upload_filter else ""
+        if summary:
+            self.log(summary)
+
+    def cutover(self, ctx, cancel_token):
+        cancel_token.check()
+        if self.incremental:
+            ok, msg = self.ssh_manager.swap_release(ctx["upload"], self.remote_root, self.project,
+                                                    progress_callback=self.log)
+        else:
+            ok, msg = self.ssh_manager.cutover(ctx["upload"], self.remote_root, self.project,
+                                               progress_callback=self.log)
+        if not ok:
+            # 切换失败时暂存目录仍在 (swap_release 已把旧版本移回)，留给 cleanup() 删除
+            raise StageFailed(msg)
+        self.staging_dir = None  # 已切换为线上版本，不再作为待清理的临时目录
+        return msg
+
+    def manifest(self, ctx, cancel_token):
+        self.local_manifest = build_manifest(self._local_dir(ctx), cache=self.fingerprint_cache, cancel_token=cancel_token,
+                                             key_prefix=self.cache_key_prefix, key_suffixes=self.cache_key_suffixes,
+                                             file_filter=self.upload_filter)
+        return self.local_manifest
+
+    def report(self, ctx, cancel_token):
+        """对比新包与线上版本的体积并写入日志；失败只记录，不影响发布"""
+        target = posixpath.join(self.remote_root, self.project)
+        try:
+            local = size_report.local_listing(self._local_dir(ctx), self.upload_filter, cancel_token=cancel_token)
+            remote = self.ssh_manager.remote_size_listing(target, size_report.GZIP_EXTS,
+                                                          sample_limit=size_report.GZIP_SAMPLE_LIMIT,
+                                                          cancel_token=cancel_token)
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            self.log(f"包体积报告生成失败 (不影响发布): {e}")
+            return None
+        self.size_report = size_report.build_report(local, remote, self.size_report_thresholds)
+        for line in size_report.format_report(self.size_report):
+            self.log(line)
+        return self.size_report
+
+    def warmup(self, ctx, cancel_token):
+        """切换后按文件列表与 index.html 并发请求新资源，预热 CDN/反向代理缓存；失败只记录"""
+        options = self.warmup_options
+        local_dir = self._local_dir(ctx)
+        if self.local_manifest is not None:
+            rels = list(self.local_manifest)
+        else:
+            rels = []
+            for root, _, files in os.walk(local_dir):
+                rel_root = os.path.relpath(root, local_dir).replace("\\", "/")
+                rels.extend(name if rel_root == "." else f"{rel_root}/{name}" for name in files)
+            if self.upload_filter:
+                rels = [rel for rel in rels if self.upload_filter.accepts(rel)]
+        try:
+            urls = warmup.collect_urls(options["base_url"], rels, warmup.read_index_html(local_dir),
+                                       extra_paths=options.get("paths", ()),
+                                       max_urls=options.get("max_urls", warmup.DEFAULT_MAX_URLS))
+            self.log(f"正在预热缓存: {len(urls)} 个地址 "
+                     f"(并发 {options.get('concurrency', warmup.DEFAULT_CONCURRENCY)})...")
+            # 已切换完成，取消时只停止发起新请求并返回已完成部分的统计
+            stats = warmup.warm(urls, concurrency=options.get("concurrency", warmup.DEFAULT_CONCURRENCY),
+                                timeout=options.get("timeout", warmup.DEFAULT_TIMEOUT), cancel_token=cancel_token)
+        except Exception as e:
+            self.log(f"缓存预热失败 (不影响发布): {e}")
+            return None
+        self.log(warmup.describe(stats))
+        for url, reason in stats["errors"][:10]:
+            self.log(f"  [!] {url}: {reason}")
+        self.warmup_stats = stats
+        return stats
+
+    def verify(self, ctx, cancel_token):
+        target = posixpath.join(self.remote_root, self.project)
+        try:
+            problems = self.ssh_manager.verify_manifest(target, ctx["manifest"],
+                                                        ignore=self.VERIFY_IGNORE + self.KEEP_SIBLINGS,
+                                                        cancel_token=cancel_token)
+        except OperationCancelled:
+            # 新版本已经上线，取消只能跳过校验，不能把发布记为失败
+            self.log("校验已取消: 新版本已切换上线，未校验也未回滚")
+            return "切换已完成，校验已取消"
+        if not problems:
+            return f"校验通过 ({len(ctx['manifest'])} 个文件)"
+
+        self.log(f"完整性校验失败，{len(problems)} 个文件不一致:")
+        self.ssh_manager.report_problems(problems, self.log)
+        self.log(f"正在自动回滚到 {self.backup_file}...")
+        ok, msg = self.ssh_manager.rollback_project(posixpath.join(self.backup_root, self.backup_file), target,
+                                                    progress_callback=self.log)
+        raise StageFailed(f"完整性校验失败 ({len(problems)} 个文件)，自动回滚: {msg}")
+
+    def stages(self):
+        # 预压缩会向本地目录写入文件，上传与清单必须在它之后
+        local_ready = ["prepare"]
+        stages = [
+            Stage("prepare", self.prepare, label="准备本地文件"),
+            Stage("backup", self.backup, label="创建服务器备份"),
+        ]
+        if self.precompress_options is not None:
+            stages.append(Stage("precompress", self.precompress, deps=["prepare"], label="生成预压缩文件"))
+            local_ready = ["prepare", "precompress"]
+        upload_deps = local_ready
+        if self.hardlink:
+            # 增量上传需要本地与远程两份清单
+            stages.append(Stage("clone", self.clone, label="硬链接克隆线上版本"))
+            upload_deps = local_ready + ["clone", "manifest"]
+        if self.hardlink or self.verify_enabled:
+            stages.append(Stage("manifest", self.manifest, deps=local_ready, label="生成本地清单"))
+        cutover_deps = ["backup", "upload"]
+        if self.size_report_thresholds is not None:
+            # 线上版本的体积必须在切换前读取
+            stages.append(Stage("report", self.report, deps=local_ready, label="包体积报告"))
+            cutover_deps.append("report")
+        stages += [
+            Stage("upload", self.upload, deps=upload_deps, label="上传新版本"),
+            Stage("cutover", self.cutover, deps=cutover_deps, label="替换线上版本"),
+        ]
+        if self.verify_enabled:
+            # 切换后的阶段在取消时仍然执行 (自行处理取消)，不能让已上线的发布变成“已取消”
+            stages.append(Stage("verify", self.verify, deps=["cutover", "manifest"], label="完整性校验",
+                                skip_if_cancelled=False))
+        if self.warmup_options and self.warmup_options.get("base_url"):
+            # 校验失败会自动回滚，预热放在校验之后
+            deps = ["cutover", "verify"] if self.verify_enabled else ["cutover"]
+            stages.append(Stage("warmup", self.warmup, deps=deps, label="预热缓存", skip_if_cancelled=False))
+        return stages
+
+    # --- Run ---
+
+    def run(self, cancel_token=None):
+        """执行完整流程，返回 (success, message)"""
+        pipeline = StagePipeline(self.stages(), cancel_token=cancel_token, progress_callback=self.log)
+        try:
+            return True, self._success_message(pipeline.run())
+        except OperationCancelled:
+            if "cutover" not in pipeline.results:
+                raise
+            # 新版本已经上线: 取消只影响切换后的收尾阶段，发布仍算成功
+            self.log("切换完成后收到取消，后续阶段已跳过")
+            return True, f"{self._success_message(pipeline.results)}，后续阶段已取消"
+        except StageFailed as e:
+            return False, str(e)
+        except Exception as e:
+            return False, f"本地处理出错: {str(e)}"
+        finally:
+            self.timings = dict(pipeline.timings)
+            self.cleanup()
+
+    def _success_message(self, results):
+        msg = results["cutover"]
+        if "verify" in results:
+            msg = f"{msg}，{results['verify']}"
+        if self.upload_filter and self.upload_filter.skipped:
+            msg = f"{msg}，{self.upload_filter.summary()}"
+        if self.warmup_stats and self.warmup_stats["count"]:
+            msg = f"{msg}，预热 {self.warmup_stats['ok']}/{self.warmup_stats['count']} 个地址"
+        if self.warmup_stats and self.warmup_stats.get("cancelled"):
+            msg = f"{msg}，预热已取消 {self.warmup_stats['cancelled']} 个地址"
+        if self.size_report and self.size_report["warnings"]:
+            msg = f"{msg}，包体积报告有 {len(self.size_report['warnings'])} 条警告 (详见日志)"
+        return msg
+
+    def history_details(self):
+        """发布历史附加字段 (在 run() 结束后调用)"""
+        package_hash = self.package_hash
+        if not package_hash and self.local_manifest is not None:
+            package_hash = manifest_digest(self.local_manifest)
+        stats = self.upload_stats or {}
+        return {"phases": dict(self.timings), "package_hash": package_hash,
+                "bytes_transferred": stats.get("bytes"), "files_transferred": stats.get("files")}
+
+    def cleanup(self):
+        # 上传完成但未切换 (备份失败/取消) 时删除远程临时目录
+        if self.staging_dir:
+            try:
+                self.ssh_manager.discard_staging(self.staging_dir)
+            except Exception:
+                pass
+            self.staging_dir = None
+        # 清理本地解压文件
+        if self.temp_extract_dir and os.path.exists(self.temp_extract_dir):
+            shutil.rmtree(self.temp_extract_dir, ignore_errors=True)
+            self.temp_extract_dir = None
+        if self.mirror_dir and os.path.exists(self.mirror_dir):
+            shutil.rmtree(self.mirror_dir, ignore_errors=True)
+            self.mirror_dir = None
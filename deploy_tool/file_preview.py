@@ -0,0 +1,190 @@
+import codecs
+import posixpath
+
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton, QLabel,
+                               QComboBox, QSpinBox, QCheckBox)
+from PySide6.QtCore import Signal
+from PySide6.QtGui import QFont
+
+from .tasks import get_task_manager
+
+# 跟踪模式每次最多读取的字节数 (日志增长很快时分多次追上)
+FOLLOW_CHUNK = 1024 * 1024
+MAX_LINES = 20000
+
+
+def _format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class RemotePreviewDialog(QDialog):
+    """
+    远程文件只读预览: 只按偏移读取需要的部分 (开头/末尾 N KB)，不下载整个文件。
+    跟踪模式在后台任务中定期读取文件末尾新增的内容 (类似 tail -f)，文件被截断或轮转时从头继续。
+    """
+    # 后台跟踪任务发射 (新增数据, 是否被截断)，经队列连接在 GUI 线程处理
+    follow_data = Signal(bytes, bool)
+
+    def __init__(self, ssh_manager, remote_path, size=None, parent=None, task_manager=None, follow_interval=1.0):
+        super().__init__(parent)
+        self.ssh_manager = ssh_manager
+        self.task_manager = task_manager or get_task_manager()
+        self.remote_path = remote_path
+        self.follow_interval = follow_interval
+        self.load_task = None
+        self.follow_task = None
+        self.end_offset = 0
+        self.decoder = None
+        self.setWindowTitle(f"预览 - {posixpath.basename(remote_path)}")
+        self.resize(900, 650)
+
+        layout = QVBoxLayout(self)
+        self.path_label = QLabel(remote_path if size is None else f"{remote_path}  ({_format_size(size)})")
+        layout.addWidget(self.path_label)
+
+        controls = QHBoxLayout()
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem("开头", "head")
+        self.mode_combo.addItem("末尾", "tail")
+        # 日志或较大的文件默认看末尾
+        if remote_path.endswith(".log") or (size or 0) > 256 * 1024:
+            self.mode_combo.setCurrentIndex(1)
+        self.size_spin = QSpinBox()
+        self.size_spin.setRange(1, 10240)
+        self.size_spin.setValue(64)
+        self.size_spin.setSuffix(" KB")
+        self.load_btn = QPushButton("读取")
+        self.load_btn.clicked.connect(self.load_range)
+        self.follow_chk = QCheckBox(f"跟踪末尾 (每 {follow_interval:g} 秒)")
+        self.follow_chk.toggled.connect(self.toggle_follow)
+        self.wrap_chk = QCheckBox("自动换行")
+        self.wrap_chk.toggled.connect(
+            lambda on: self.text.setLineWrapMode(QPlainTextEdit.WidgetWidth if on else QPlainTextEdit.NoWrap))
+
+        controls.addWidget(QLabel("读取:"))
+        controls.addWidget(self.mode_combo)
+        controls.addWidget(self.size_spin)
+        controls.addWidget(self.load_btn)
+        controls.addWidget(self.follow_chk)
+        controls.addStretch()
+        controls.addWidget(self.wrap_chk)
+        layout.addLayout(controls)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.text.setMaximumBlockCount(MAX_LINES)
+        self.text.setFont(QFont("Consolas", 10))
+        layout.addWidget(self.text)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        self.follow_data.connect(self.on_follow_data)
+        self.load_range()
+
+    def load_range(self):
+        self.stop_follow()
+        if self.load_task and self.load_task.active:
+            self.load_task.cancel()
+        length = self.size_spin.value() * 1024
+        offset = -length if self.mode_combo.currentData() == "tail" else 0
+        self.status_label.setText("正在读取...")
+        self.load_btn.setEnabled(False)
+        task = self.task_manager.submit(f"预览 {self.remote_path}", self.ssh_manager.read_remote_range,
+                                        self.remote_path, offset, length)
+        task.on_finished = lambda ok, res, t=task: self.on_range_loaded(ok, res, t)
+        self.load_task = task
+
+    def on_range_loaded(self, success, result, task=None):
+        if task is not self.load_task:
+            return
+        self.load_btn.setEnabled(True)
+        if not success:
+            self.status_label.setText(f"读取失败: {result}")
+            self.follow_chk.setChecked(False)
+            return
+        data, start, size = result
+        self.path_label.setText(f"{self.remote_path}  ({_format_size(size)})")
+        # 从文件中间开始读取时第一行通常不完整，丢弃到第一个换行
+        if start > 0 and b"\n" in data:
+            cut = data.index(b"\n") + 1
+            data, start = data[cut:], start + cut
+        self.text.setPlainText(data.decode("utf-8", "replace"))
+        self.end_offset = start + len(data)
+        note = "，疑似二进制文件" if b"\0" in data[:8192] else ""
+        self.status_label.setText(f"显示 {start}-{self.end_offset} 字节，共 {size} 字节{note}")
+        if self.mode_combo.currentData() == "tail":
+            self.text.verticalScrollBar().setValue(self.text.verticalScrollBar().maximum())
+        if self.follow_chk.isChecked():
+            self.start_follow()
+
+    def toggle_follow(self, checked):
+        if not checked:
+            self.stop_follow()
+            return
+        # 先读取一次末尾，读取完成后从该位置开始跟踪
+        self.mode_combo.setCurrentIndex(self.mode_combo.findData("tail"))
+        self.load_range()
+
+    def start_follow(self):
+        self.decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        offset = self.end_offset
+        path = self.remote_path
+
+        def follow(cancel_token=None):
+            nonlocal offset
+            while not cancel_token.wait(self.follow_interval):
+                data, _, size = self.ssh_manager.read_remote_range(path, offset, FOLLOW_CHUNK)
+                if size < offset:
+                    # 文件被截断或轮转: 从新文件的开头继续
+                    offset = 0
+                    self.follow_data.emit(b"", True)
+                    continue
+                while data:
+                    offset += len(data)
+                    self.follow_data.emit(data, False)
+                    if len(data) < FOLLOW_CHUNK or cancel_token.is_set():
+                        break
+                    data, _, size = self.ssh_manager.read_remote_range(path, offset, FOLLOW_CHUNK)
+            return True, "已停止跟踪"
+
+        self.follow_task = self.task_manager.submit(f"跟踪 {path}", follow)
+        self.status_label.setText(f"正在跟踪，从 {offset} 字节开始...")
+
+    def stop_follow(self):
+        if self.follow_task and self.follow_task.active:
+            self.follow_task.cancel()
+        self.follow_task = None
+
+    def on_follow_data(self, data, truncated):
+        if self.follow_task is None:
+            return
+        if truncated:
+            self.decoder.reset()
+            self.end_offset = 0
+            text = "\n---- 文件被截断或轮转，从头继续 ----\n"
+        else:
+            self.end_offset += len(data)
+            text = self.decoder.decode(data)
+        if not text:
+            return
+        bar = self.text.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum() - 2
+        # 直接在末尾插入 (appendPlainText 会额外开始新的一行，截断半行日志)
+        cursor = self.text.textCursor()
+        cursor.movePosition(cursor.MoveOperation.End)
+        cursor.insertText(text)
+        if at_bottom:
+            bar.setValue(bar.maximum())
+        self.status_label.setText(f"正在跟踪，已读取到 {self.end_offset} 字节")
+
+    def done(self, result):
+        self.stop_follow()
+        if self.load_task and self.load_task.active:
+            self.load_task.cancel()
+        super().done(result)
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import hashlib
+import threading
+
+# 未命中缓存的文件超过以下规模时才启用进程池，避免小批量时进程启动开销反而更慢
+POOL_MIN_FILES = 64
+POOL_MIN_BYTES = 32 * 1024 * 1024
+
+
+def sha256_file(path, chunk_size=1024 * 1024):
+    """计算文件 sha256 (模块级函数，便于进程池序列化)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def default_cache_path(config_file="app_config.json"):
+    """缓存数据库放在 app_config.json 旁边"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), "fingerprints.db")
+
+
+class FingerprintCache:
+    """
+    本地内容指纹缓存: (路径, 大小, mtime) -> sha256，保存在 sqlite 中。
+    每次操作单独打开连接，可在任意线程中使用。
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def lookup_many(self, entries):
+        """
+        entries: [(key, size, mtime_ns)]
+        返回 {key: sha256}，仅包含大小与 mtime 都匹配的条目
+        """
+        found = {}
+        with self._lock, self._connect() as conn:
+            for key, size, mtime_ns in entries:
+                row = conn.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (key,)).fetchone()
+                if row and row[0] == size and row[1] == mtime_ns:
+                    found[key] = row[2]
+        return found
+
+    def store_many(self, rows):
+        """rows: [(key, size, mtime_ns, sha256)]"""
+        if not rows:
+            return
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)", rows)
+
+
+def file_digest(path, cache=None):
+    """单个文件的 sha256，优先使用指纹缓存 (以绝对路径为键)"""
+    key = os.path.abspath(path)
+    st = os.stat(path)
+    if cache:
+        found = cache.lookup_many([(key, st.st_size, st.st_mtime_ns)])
+        if key in found:
+            return found[key]
+    digest = sha256_file(path)
+    if cache:
+        cache.store_many([(key, st.st_size, st.st_mtime_ns, digest)])
+    return digest
+
+
+def manifest_digest(manifest):
+    """整个清单的 sha256 (路径 + 大小 + 内容哈希)，用作目录形式发布包的包哈希"""
+    h = hashlib.sha256()
+    for rel in sorted(manifest):
+        size, digest = manifest[rel]
+        h.update(f"{rel}\0{size}\0{digest}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def iter_files(root, file_filter=None):
+    """遍历目录，产出 (相对路径(posix), 绝对路径)"""
+    for dirpath, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(dirpath, name)
+            # 只替换系统路径分隔符 (Linux 上反斜杠是合法的文件名字符)
+            rel = os.path.relpath(full, root).replace(os.sep, "/")
+            if file_filter and not file_filter(rel):
+                continue
+            yield rel, full
+
+
+def build_manifest(root, cache=None, workers=None, cancel_token=None, key_prefix=None, file_filter=None,
+                   key_suffixes=None):
+    """
+    生成目录清单: {相对路径: (size, sha256)}。
+    已缓存且 (大小, mtime) 未变的文件直接使用缓存值；其余文件由进程池并行计算后写回缓存。
+    key_prefix: 缓存键前缀 (默认使用绝对路径)，用于临时解压目录等路径每次不同的场景。
+    key_suffixes: {相对路径: 附加到缓存键的字符串}，如 ZIP 成员的 CRC (大小与时间戳都相同但内容不同时不会命中旧值)。
+    """
+    stats = {}
+    for rel, full in iter_files(root, file_filter):
+        st = os.stat(full)
+        key = f"{key_prefix}{rel}" if key_prefix else os.path.abspath(full)
+        if key_suffixes and rel in key_suffixes:
+            key = f"{key}#{key_suffixes[rel]}"
+        stats[rel] = (full, key, st.st_size, st.st_mtime_ns)
+
+    cached = cache.lookup_many([(key, size, mtime) for _, key, size, mtime in stats.values()]) if cache else {}
+
+    manifest = {}
+    missing = []
+    for rel, (full, key, size, mtime) in stats.items():
+        if key in cached:
+            manifest[rel] = (size, cached[key])
+        else:
+            missing.append(rel)
+
+    missing_bytes = sum(stats[rel][2] for rel in missing)
+    if len(missing) >= POOL_MIN_FILES or missing_bytes >= POOL_MIN_BYTES:
+        # 进程池 (multiprocessing) 导入较慢，需要时才导入
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {rel: pool.submit(sha256_file, stats[rel][0]) for rel in missing}
+            try:
+                for rel, future in futures.items():
+                    if cancel_token: cancel_token.check()
+                    manifest[rel] = (stats[rel][2], future.result())
+            except BaseException:
+                for future in futures.values():
+                    future.cancel()
+                raise
+    else:
+        for rel in missing:
+            if cancel_token: cancel_token.check()
+            manifest[rel] = (stats[rel][2], sha256_file(stats[rel][0]))
+
+    if cache:
+        cache.store_many([(stats[rel][1], stats[rel][2], stats[rel][3], manifest[rel][1]) for rel in missing])
+    return manifest
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import sqlite3
+import inspect
+import logging
+import threading
+
+from .cancel import OperationCancelled
+
+
+def default_history_path(config_file="app_config.json"):
+    """历史数据库放在 app_config.json 旁边"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), "history.db")
+
+
+class HistoryStore:
+    """
+    发布/备份/回滚的运行历史 (sqlite)。
+    每条记录包含项目、主机、包哈希、传输量以及各阶段耗时 (JSON)，用于观察耗时趋势。
+    与 FingerprintCache 相同，每次操作单独打开连接，可在任意线程中使用。
+    """
+    COLUMNS = ("id", "started_at", "kind", "project", "host", "success", "message", "duration",
+               "package_hash", "bytes_transferred", "files_transferred", "phases")
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at REAL NOT NULL,
+                    kind TEXT NOT NULL,
+                    project TEXT NOT NULL,
+                    host TEXT,
+                    success INTEGER NOT NULL,
+                    message TEXT,
+                    duration REAL NOT NULL,
+                    package_hash TEXT,
+                    bytes_transferred INTEGER,
+                    files_transferred INTEGER,
+                    phases TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS runs_project ON runs (project, started_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def record(self, kind, project, host, success, message, duration, started_at=None, phases=None,
+               package_hash=None, bytes_transferred=None, files_transferred=None):
+        """kind: deploy / backup / rollback；phases: {阶段名: 秒}"""
+        with self._lock, self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO runs (started_at, kind, project, host, success, message, duration, package_hash, "
+                "bytes_transferred, files_transferred, phases) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (started_at or time.time(), kind, project, host, int(bool(success)), message, duration,
+                 package_hash, bytes_transferred, files_transferred, json.dumps(phases or {})))
+            return cur.lastrowid
+
+    def runs(self, project=None, kind=None, limit=500):
+        """按时间倒序返回记录列表 (字典)"""
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM runs"
+        where, params = [], []
+        if project:
+            where.append("project = ?")
+            params.append(project)
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY started_at DESC LIMIT ?"
+        params.append(int(limit))
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        result = []
+        for row in rows:
+            run = dict(zip(self.COLUMNS, row))
+            run["success"] = bool(run["success"])
+            run["phases"] = json.loads(run["phases"] or "{}")
+            result.append(run)
+        return result
+
+    def projects(self):
+        with self._lock, self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT project FROM runs ORDER BY project")]
+
+    def export_json(self, path, project=None, kind=None):
+        """导出为 JSON 数组 (时间正序)，返回导出条数"""
+        runs = list(reversed(self.runs(project=project, kind=kind, limit=1000000)))
+        for run in runs:
+            run["started_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started_at"]))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(runs, f, ensure_ascii=False, indent=2)
+        return len(runs)
+
+    def recorded(self, kind, project, host, func, details=None):
+        """
+        包装一个返回 (success, message) 的操作，运行结束后写入一条历史记录 (在工作线程中执行)。
+        details: 可选的无参函数，返回要附加的字段 (phases / package_hash / bytes_transferred / files_transferred)。
+        包装后的函数保留 cancel_token 参数，TaskManager 仍会自动注入。
+        """
+        accepts_token = "cancel_token" in inspect.signature(func).parameters
+
+        def run(*args, cancel_token=None, **kwargs):
+            if accepts_token:
+                kwargs["cancel_token"] = cancel_token
+            started = time.time()
+            start = time.monotonic()
+            success, message = False, ""
+            try:
+                result = func(*args, **kwargs)
+                success, message = result if isinstance(result, tuple) and len(result) == 2 else (True, result)
+                return result
+            except OperationCancelled as e:
+                message = f"已取消: {e}"
+                raise
+            except Exception as e:
+                message = str(e)
+                raise
+            finally:
+                extra = {}
+                if details:
+                    try:
+                        extra = details() or {}
+                    except Exception:
+                        extra = {}
+                extra.setdefault("phases", {kind: time.monotonic() - start})
+                try:
+                    self.record(kind, project, host, success, str(message), time.monotonic() - start,
+                                started_at=started, **extra)
+                except Exception as e:
+                    # 历史记录失败不能影响操作本身的结果
+                    logging.getLogger("DeployTool").warning(f"写入发布历史失败: {e}")
+
+        return run
@@ -0,0 +1,171 @@
+import time
+
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTreeWidget, QTreeWidgetItem, QPushButton,
+                               QLabel, QComboBox, QFileDialog, QMessageBox, QHeaderView, QSplitter)
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QPainter
+
+try:
+    from PySide6.QtCharts import QChart, QChartView, QLineSeries, QValueAxis
+except ImportError:  # 部分精简打包的 PySide6 不含 QtCharts，此时只显示表格
+    QChartView = None
+
+KIND_LABELS = {"deploy": "发布", "backup": "备份", "rollback": "回滚"}
+# 发布阶段在图表/表格中的显示名 (与 DeployFlow.stages() 的阶段名对应)
+PHASE_LABELS = {
+    "prepare": "解压/准备",
+    "backup": "备份",
+    "precompress": "预压缩",
+    "clone": "硬链接克隆",
+    "manifest": "本地清单",
+    "upload": "上传",
+    "report": "体积报告",
+    "cutover": "切换",
+    "verify": "校验",
+    "warmup": "预热缓存",
+    "rollback": "回滚",
+}
+
+
+def _fmt_bytes(value):
+    if value is None:
+        return "-"
+    return f"{value / 1024 / 1024:.2f} MB"
+
+
+class HistoryPanel(QDialog):
+    """发布历史: 表格 + 各阶段耗时趋势图 + JSON 导出"""
+    def __init__(self, history_store, project=None, parent=None):
+        super().__init__(parent)
+        self.store = history_store
+        self.setWindowTitle("发布历史")
+        self.resize(1000, 650)
+
+        layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        self.project_combo = QComboBox()
+        self.project_combo.addItem("全部项目", None)
+        for name in self.store.projects():
+            self.project_combo.addItem(name, name)
+        if project:
+            index = self.project_combo.findData(project)
+            if index >= 0:
+                self.project_combo.setCurrentIndex(index)
+        self.kind_combo = QComboBox()
+        self.kind_combo.addItem("全部操作", None)
+        for kind, label in KIND_LABELS.items():
+            self.kind_combo.addItem(label, kind)
+        self.project_combo.currentIndexChanged.connect(self.reload)
+        self.kind_combo.currentIndexChanged.connect(self.reload)
+
+        self.export_btn = QPushButton("导出 JSON")
+        self.export_btn.clicked.connect(self.export_json)
+        self.refresh_btn = QPushButton("刷新")
+        self.refresh_btn.clicked.connect(self.reload)
+
+        top_layout.addWidget(QLabel("项目:"))
+        top_layout.addWidget(self.project_combo)
+        top_layout.addWidget(QLabel("操作:"))
+        top_layout.addWidget(self.kind_combo)
+        top_layout.addStretch()
+        top_layout.addWidget(self.refresh_btn)
+        top_layout.addWidget(self.export_btn)
+        layout.addLayout(top_layout)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["时间", "操作", "项目", "主机", "结果", "总耗时", "文件数", "传输量", "各阶段耗时", "包哈希"])
+        self.tree.setRootIsDecorated(False)
+        self.tree.header().setSectionResizeMode(8, QHeaderView.Stretch)
+        splitter.addWidget(self.tree)
+
+        if QChartView is not None:
+            self.chart = QChart()
+            self.chart.setTitle("发布阶段耗时趋势 (秒)")
+            self.chart_view = QChartView(self.chart)
+            self.chart_view.setRenderHint(QPainter.Antialiasing)
+            splitter.addWidget(self.chart_view)
+        else:
+            self.chart = None
+            splitter.addWidget(QLabel("当前 PySide6 不含 QtCharts，无法显示趋势图"))
+        splitter.setSizes([300, 300])
+        layout.addWidget(splitter)
+
+        self.reload()
+
+    def _filters(self):
+        return {"project": self.project_combo.currentData(), "kind": self.kind_combo.currentData()}
+
+    def reload(self):
+        runs = self.store.runs(**self._filters())
+        self.tree.clear()
+        for run in runs:
+            phases = ", ".join(f"{PHASE_LABELS.get(name, name)} {seconds:.1f}s"
+                               for name, seconds in run["phases"].items())
+            QTreeWidgetItem(self.tree, [
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started_at"])),
+                KIND_LABELS.get(run["kind"], run["kind"]),
+                run["project"],
+                run["host"] or "",
+                "成功" if run["success"] else "失败",
+                f"{run['duration']:.1f}s",
+                "-" if run["files_transferred"] is None else str(run["files_transferred"]),
+                _fmt_bytes(run["bytes_transferred"]),
+                phases,
+                (run["package_hash"] or "")[:12],
+            ])
+        for col in range(8):
+            self.tree.resizeColumnToContents(col)
+        self.update_chart(runs)
+
+    def update_chart(self, runs):
+        """每个阶段一条折线，横轴为发布序号 (时间正序)，只统计成功的发布"""
+        if self.chart is None:
+            return
+        self.chart.removeAllSeries()
+        for axis in self.chart.axes():
+            self.chart.removeAxis(axis)
+
+        deploys = [r for r in reversed(runs) if r["kind"] == "deploy" and r["success"]]
+        if not deploys:
+            return
+        names = []
+        for run in deploys:
+            for name in run["phases"]:
+                if name not in names:
+                    names.append(name)
+
+        axis_x = QValueAxis()
+        axis_x.setLabelFormat("%d")
+        axis_x.setTitleText("第 N 次发布")
+        axis_x.setRange(1, max(len(deploys), 2))
+        axis_x.setTickCount(min(max(len(deploys), 2), 10))
+        axis_y = QValueAxis()
+        axis_y.setTitleText("秒")
+        self.chart.addAxis(axis_x, Qt.AlignBottom)
+        self.chart.addAxis(axis_y, Qt.AlignLeft)
+
+        peak = 0.0
+        for name in names + ["__total__"]:
+            series = QLineSeries()
+            series.setName("总耗时" if name == "__total__" else PHASE_LABELS.get(name, name))
+            for index, run in enumerate(deploys, 1):
+                value = run["duration"] if name == "__total__" else run["phases"].get(name)
+                if value is not None:
+                    series.append(index, value)
+                    peak = max(peak, value)
+            self.chart.addSeries(series)
+            series.attachAxis(axis_x)
+            series.attachAxis(axis_y)
+        axis_y.setRange(0, peak * 1.1 or 1)
+
+    def export_json(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出发布历史", "deploy_history.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            count = self.store.export_json(path, **self._filters())
+            QMessageBox.information(self, "导出完成", f"已导出 {count} 条记录到\n{path}")
+        except OSError as e:
+            QMessageBox.critical(self, "导出失败", str(e))
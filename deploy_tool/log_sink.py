@@ -0,0 +1,96 @@
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+class LogSink(QObject):
+    """
+    线程安全的日志汇聚点:
+    1. 任意线程调用 write() 只是把文本放入队列 (不触碰控件)
+    2. 通过信号唤醒 GUI 线程的定时器，按批次刷新到日志控件
+    3. 控件使用 setMaximumBlockCount 作为环形缓冲，超出的旧行自动丢弃
+    4. 可选写入滚动日志文件
+    """
+    _wake = Signal()
+
+    def __init__(self, widget, max_lines=5000, flush_interval_ms=100, max_pending=20000, parent=None):
+        super().__init__(parent)
+        self.widget = widget
+        self.widget.setMaximumBlockCount(max_lines)
+
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._max_pending = max_pending
+        self._dropped = 0
+        self._file_handler = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(flush_interval_ms)
+        self._timer.timeout.connect(self.flush)
+        # 跨线程发射时自动转为队列连接，槽函数在 GUI 线程执行
+        self._wake.connect(self._schedule_flush)
+
+    def write(self, text):
+        """可从任意线程调用"""
+        with self._lock:
+            if len(self._pending) >= self._max_pending:
+                # 队列已满时丢弃最旧的行，避免 UI 卡顿期间内存无限增长
+                self._pending.popleft()
+                self._dropped += 1
+            self._pending.append(text)
+            first = len(self._pending) == 1
+
+        if self._file_handler:
+            self._file_handler.handle(logging.makeLogRecord({
+                "msg": text, "levelno": logging.INFO, "levelname": "INFO"
+            }))
+
+        if first:
+            self._wake.emit()
+
+    def _schedule_flush(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            lines = list(self._pending)
+            self._pending.clear()
+            dropped, self._dropped = self._dropped, 0
+
+        if dropped:
+            lines.insert(0, f"... 日志过多，已丢弃 {dropped} 行 ...")
+        # 一次追加整批文本，避免逐行触发重排
+        self.widget.appendPlainText("\n".join(lines))
+
+    def enable_file(self, path, max_bytes=5 * 1024 * 1024, backup_count=3):
+        """启用滚动日志文件 (path 为空则关闭)"""
+        self.disable_file()
+        if not path:
+            return
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        self._file_handler = handler
+
+    def disable_file(self):
+        if self._file_handler:
+            self._file_handler.close()
+            self._file_handler = None
+
+
+class QLogHandler(logging.Handler):
+    """将 logging 记录转发到 LogSink，可在任意线程中触发"""
+    def __init__(self, sink):
+        super().__init__()
+        self.sink = sink
+
+    def emit(self, record):
+        try:
+            self.sink.write(self.format(record))
+        except Exception:
+            self.handleError(record)
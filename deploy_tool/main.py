@@ -1,13 +1,26 @@
 import sys
 import os
+import time
 import logging
+import posixpath
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                               QLabel, QLineEdit, QPushButton, QComboBox, QTextEdit, QFileDialog, 
-                               QGroupBox, QMessageBox, QProgressBar, QSplitter)
-from PySide6.QtCore import Qt, QThread, Signal, Slot
+                               QLabel, QLineEdit, QPushButton, QComboBox, QPlainTextEdit, QFileDialog, 
+                               QGroupBox, QMessageBox, QProgressBar, QSplitter, QCheckBox, QInputDialog)
+from PySide6.QtCore import Qt, Signal, Slot, QTimer
 from .backend import SSHManager
-from .remote_browser import RemoteFileBrowser  # [NEW] Import
 from .settings import SettingsManager  # [NEW] Import
+from .log_sink import LogSink, QLogHandler
+from .tasks import get_task_manager
+from .deploy_flow import DeployFlow
+from .fingerprint import FingerprintCache, default_cache_path
+from .history import HistoryStore, default_history_path
+from .tuning import PROFILES, describe as describe_tuning
+from . import precompress
+from . import profiling
+from .task_panel import TaskPanel
+from .upload_filter import UploadFilter
+from .watch import DirectoryWatcher
+from .scheduler import DeployScheduler, ALL_PROJECTS
 
 from PySide6.QtGui import QIcon, QAction, QPalette, QColor, QFont
 
@@ -106,7 +119,7 @@ def apply_dark_theme(app):
             width: 20px;
             border-left-width: 0px;
         }
-        QTextEdit {
+        QTextEdit, QPlainTextEdit {
             background-color: #1e1e1e;
             border: 1px solid #3e3e3e;
             border-radius: 4px;
@@ -123,30 +136,6 @@ def apply_dark_theme(app):
         /* 特殊按钮样式覆盖已经在代码中通过 setStyleSheet 设置的，需注意优先级 */
     """)
 
-# --- Threads for Async Operations ---
-
-class Worker(QThread):
-    progress = Signal(str)
-    finished = Signal(bool, object)  # Changed str to object to pass lists
-
-    def __init__(self, func, *args, **kwargs):
-        super().__init__()
-        self.func = func
-        self.args = args
-        self.kwargs = kwargs
-
-    def run(self):
-        try:
-            # We enforce passing a 'progress_callback' to the function if it accepts it
-            result = self.func(*self.args, **self.kwargs)
-            # result expect to be (success, payload/message)
-            if isinstance(result, tuple) and len(result) == 2:
-                self.finished.emit(result[0], result[1])
-            else:
-                self.finished.emit(True, result)
-        except Exception as e:
-            self.finished.emit(False, str(e))
-
 # --- Main GUI ---
 
 class MainWindow(QMainWindow):
@@ -156,13 +145,41 @@ class MainWindow(QMainWindow):
         self.resize(1000, 700)
         self.ssh_manager = SSHManager()
         self.settings_manager = SettingsManager() # [NEW]
+        # 所有后台操作共享一个有界线程池，可在任务面板中取消
+        self.task_manager = get_task_manager()
+        self.fingerprint_cache = FingerprintCache(default_cache_path(self.settings_manager.config_file))
+        # 每次发布/备份/回滚都会记入本地历史库 (含各阶段耗时)
+        self.history = HistoryStore(default_history_path(self.settings_manager.config_file))
+        config_dir = os.path.dirname(os.path.abspath(self.settings_manager.config_file))
+        # 后台任务性能分析 (设置 profile_tasks 或环境变量 DEPLOY_TOOL_PROFILE=1)
+        profiling.configure(enabled=self.settings_manager.get_option("profile_tasks", False),
+                            out_dir=self.settings_manager.get_option("profile_dir", os.path.join(config_dir, "profiles")),
+                            top=self.settings_manager.get_option("profile_top", 15))
+        self.ssh_manager.journal_dir = os.path.join(config_dir, "upload_journal")
+        self.ssh_manager.resumable_threshold = int(
+            self.settings_manager.get_option("resumable_threshold_mb", 64)) * 1024 * 1024
+        self.ssh_manager.stripe_threshold = int(
+            self.settings_manager.get_option("stripe_threshold_mb", 256)) * 1024 * 1024
+        self.ssh_manager.stripe_count = int(self.settings_manager.get_option("stripe_count", 4))
+        self.ssh_manager.stripe_new_transport = bool(self.settings_manager.get_option("stripe_new_transport", False))
+        self.ssh_manager.packed_upload = bool(self.settings_manager.get_option("packed_upload", True))
+        # 发版/备份/回滚经调度器排队: 同项目串行，同主机并发数受限
+        self.scheduler = DeployScheduler(self.task_manager,
+                                         per_host_limit=self.settings_manager.get_option("per_host_limit", 2),
+                                         parent=self)
         
         # Setup Logging to GUI
-        self.log_widget = QTextEdit()
+        self.log_widget = QPlainTextEdit()
         self.log_widget.setReadOnly(True)
         self.log_widget.setStyleSheet("background-color: #1e1e1e; color: #00ff00; font-family: Consolas;")
         
-        handler = QLogHandler(self.log_widget)
+        # 日志统一经由 LogSink 排队，GUI 线程按批刷新，工作线程可安全写日志
+        self.log_sink = LogSink(self.log_widget,
+                                max_lines=int(self.settings_manager.get_option("log_max_lines", 5000)),
+                                parent=self)
+        self.log_sink.enable_file(self.settings_manager.get_option("log_file", ""))
+        
+        handler = QLogHandler(self.log_sink)
         handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
         logging.getLogger("DeployTool").setLevel(logging.INFO)
         logging.getLogger("DeployTool").addHandler(handler)
@@ -173,12 +190,39 @@ class MainWindow(QMainWindow):
 
         self.setup_ui()
 
-        # 加载保存的配置
-        self.load_saved_settings() # [NEW]
-        
         # State
         self.connected = False
         self.current_project_list = []
+        self.watcher = None
+        self.watch_target = None    # (本地目录, 远程目录, 项目)
+        self.watch_pending = (set(), set())
+        self.watch_busy = False
+
+        # 分阶段启动: 窗口先显示，第一次绘制后再在后台加载保存的配置 (密码解密需要 cryptography) 与 SSH 库
+        self._startup_pending = True
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self._startup_pending:
+            self._startup_pending = False
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        self.connect_btn.setEnabled(False)
+        self.task_manager.submit("加载配置", self._load_startup_state, on_finished=self.on_startup_loaded)
+
+    def _load_startup_state(self):
+        config = self.settings_manager.load_config()
+        # 预先导入 paramiko，第一次连接时不再等待
+        import paramiko  # noqa: F401
+        return config
+
+    def on_startup_loaded(self, success, config):
+        self.connect_btn.setEnabled(True)
+        if not success:
+            self.append_log(f"加载配置失败: {config}")
+            return
+        self.load_saved_settings(config)
 
     def setup_ui(self):
         # 1. Connection Group
@@ -195,6 +239,13 @@ class MainWindow(QMainWindow):
         self.pwd_input.setPlaceholderText("Password")
         self.pwd_input.setEchoMode(QLineEdit.Password)
         
+        # 传输参数档案: 自动校准 (连接后探测链路并保存到该主机) 或固定档案
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem("自动校准", "auto")
+        for name, profile in PROFILES.items():
+            self.profile_combo.addItem(profile["label"], name)
+        self.profile_combo.setToolTip("SSH 传输参数: 窗口/包大小、加密算法、压缩。\n自动校准会在连接后测量 RTT 与吞吐并记住该主机的最佳参数。")
+
         self.connect_btn = QPushButton("连接")
         self.connect_btn.clicked.connect(self.toggle_connection)
         
@@ -206,6 +257,8 @@ class MainWindow(QMainWindow):
         conn_layout.addWidget(self.user_input)
         conn_layout.addWidget(QLabel("密码:"))
         conn_layout.addWidget(self.pwd_input)
+        conn_layout.addWidget(QLabel("链路:"))
+        conn_layout.addWidget(self.profile_combo)
         conn_layout.addWidget(self.connect_btn)
         conn_group.setLayout(conn_layout)
         
@@ -282,6 +335,10 @@ class MainWindow(QMainWindow):
         local_file_layout.addWidget(QLabel("内部路径:"))
         local_file_layout.addWidget(self.sub_dir_input)
         local_file_layout.addWidget(self.browse_btn)
+        # 按项目保存的上传包含/排除规则
+        self.rules_btn = QPushButton("上传规则")
+        self.rules_btn.clicked.connect(self.edit_upload_rules)
+        local_file_layout.addWidget(self.rules_btn)
         
         # [NEW] 独立备份按钮
         self.backup_only_btn = QPushButton("仅备份当前版本")
@@ -300,8 +357,12 @@ class MainWindow(QMainWindow):
         """)
         self.backup_only_btn.clicked.connect(self.start_backup_only)
         self.backup_only_btn.setEnabled(False)
+        # 维护窗口前一次性备份根目录下的所有项目 (远程并行打包，低 I/O 优先级)
+        self.backup_all_btn = QPushButton("备份全部项目")
+        self.backup_all_btn.clicked.connect(self.start_backup_all)
+        self.backup_all_btn.setEnabled(False)
 
-        self.deploy_btn = QPushButton("立即发版 (备份 -> 上传 -> 替换)")
+        self.deploy_btn = QPushButton("立即发版 (备份 + 上传 -> 替换)")
         # 使用 QSS 中定义的 ID 选择器或类选择器会更好，这里直接设样式
         self.deploy_btn.setStyleSheet("""
             QPushButton {
@@ -319,8 +380,47 @@ class MainWindow(QMainWindow):
         self.deploy_btn.clicked.connect(self.start_deploy)
         self.deploy_btn.setEnabled(False)
         
+        # 排队模式: 操作加入队列后立即返回，可连续为多个项目排队
+        self.queue_mode_chk = QCheckBox("排队模式 (不阻塞界面，可连续加入多个项目的任务)")
+
         deploy_layout.addLayout(local_file_layout)
-        deploy_layout.addWidget(self.backup_only_btn) # Add to layout
+        deploy_layout.addWidget(self.queue_mode_chk)
+        # 发布/回滚后用一次远程哈希扫描校验文件，发布校验失败时自动回滚
+        self.verify_chk = QCheckBox("发布/回滚后校验文件完整性 (sha256)")
+        self.verify_chk.setChecked(bool(self.settings_manager.get_option("verify_after_deploy", False)))
+        self.verify_chk.toggled.connect(lambda checked: self.settings_manager.set_option("verify_after_deploy", checked))
+        deploy_layout.addWidget(self.verify_chk)
+        # 为 nginx gzip_static/brotli_static 在本地生成 .gz/.br (brotli 需安装可选依赖)
+        self.precompress_chk = QCheckBox("上传前生成预压缩文件 (.gz/.br)")
+        self.precompress_chk.setChecked(bool(self.settings_manager.get_option("precompress", False)))
+        self.precompress_chk.toggled.connect(lambda checked: self.settings_manager.set_option("precompress", checked))
+        deploy_layout.addWidget(self.precompress_chk)
+        # 切换前对比新包与线上版本的体积 (阈值见 size_report_thresholds)
+        self.size_report_chk = QCheckBox("发布时生成包体积报告 (与线上版本对比)")
+        self.size_report_chk.setChecked(bool(self.settings_manager.get_option("size_report", False)))
+        self.size_report_chk.toggled.connect(lambda checked: self.settings_manager.set_option("size_report", checked))
+        deploy_layout.addWidget(self.size_report_chk)
+        # 切换后并发请求新资源，预热 CDN/反向代理缓存 (每个项目单独配置访问地址)
+        warmup_layout = QHBoxLayout()
+        self.warmup_chk = QCheckBox("发布后预热缓存")
+        self.warmup_chk.setChecked(bool(self.settings_manager.get_option("warmup", False)))
+        self.warmup_chk.toggled.connect(lambda checked: self.settings_manager.set_option("warmup", checked))
+        self.warmup_url_btn = QPushButton("预热地址...")
+        self.warmup_url_btn.clicked.connect(self.edit_warmup_target)
+        warmup_layout.addWidget(self.warmup_chk)
+        warmup_layout.addWidget(self.warmup_url_btn)
+        warmup_layout.addStretch()
+        deploy_layout.addLayout(warmup_layout)
+        # 监听模式: 本地构建目录变化后只把改动的文件直接同步到线上目录 (用于测试环境)
+        self.watch_btn = QPushButton("开始监听本地目录 (增量同步)")
+        self.watch_btn.setCheckable(True)
+        self.watch_btn.setEnabled(False)
+        self.watch_btn.toggled.connect(self.toggle_watch)
+        deploy_layout.addWidget(self.watch_btn)
+        backup_layout = QHBoxLayout()
+        backup_layout.addWidget(self.backup_only_btn, 1) # Add to layout
+        backup_layout.addWidget(self.backup_all_btn)
+        deploy_layout.addLayout(backup_layout)
         deploy_layout.addWidget(self.deploy_btn)
         deploy_group.setLayout(deploy_layout)
         
@@ -349,8 +449,20 @@ class MainWindow(QMainWindow):
         self.rollback_btn.clicked.connect(self.start_rollback)
         self.rollback_btn.setEnabled(False)
         
+        # 备份导出到本地 / 从本地导入 (在不同环境之间迁移备份)
+        transfer_layout = QHBoxLayout()
+        self.export_backup_btn = QPushButton("导出选中备份...")
+        self.export_backup_btn.clicked.connect(self.export_backup)
+        self.export_backup_btn.setEnabled(False)
+        self.import_backup_btn = QPushButton("导入本地备份...")
+        self.import_backup_btn.clicked.connect(self.import_backup)
+        self.import_backup_btn.setEnabled(False)
+        transfer_layout.addWidget(self.export_backup_btn)
+        transfer_layout.addWidget(self.import_backup_btn)
+
         rollback_layout.addWidget(self.view_backups_btn)
         rollback_layout.addWidget(self.backup_combo)
+        rollback_layout.addLayout(transfer_layout)
         rollback_layout.addWidget(self.rollback_btn)
         rollback_group.setLayout(rollback_layout)
         
@@ -363,15 +475,26 @@ class MainWindow(QMainWindow):
         ops_splitter.addWidget(right_widget)
         ops_splitter.setStretchFactor(1, 2)
 
+        self.task_panel = TaskPanel(self.task_manager)
+
         # 4. Logs
         self.layout.addWidget(conn_group)
         self.layout.addWidget(path_group)
         self.layout.addWidget(ops_splitter)
+        task_header = QHBoxLayout()
+        task_header.addWidget(QLabel("后台任务:"))
+        task_header.addStretch()
+        self.history_btn = QPushButton("发布历史")
+        self.history_btn.clicked.connect(self.show_history)
+        task_header.addWidget(self.history_btn)
+        self.layout.addLayout(task_header)
+        self.layout.addWidget(self.task_panel)
         self.layout.addWidget(QLabel("操作日志:"))
         self.layout.addWidget(self.log_widget)
 
-    def load_saved_settings(self):
-        config = self.settings_manager.load_config()
+    def load_saved_settings(self, config=None):
+        if config is None:
+            config = self.settings_manager.load_config()
         if config:
             self.ip_input.setText(config.get("ip", ""))
             self.port_input.setText(config.get("port", "22"))
@@ -380,6 +503,10 @@ class MainWindow(QMainWindow):
             self.remote_projects_path.setText(config.get("remote_proj", "/"))
             self.remote_backup_path.setText(config.get("remote_bkp", "/"))
             
+            index = self.profile_combo.findData(config.get("transport_profile", "auto"))
+            if index >= 0:
+                self.profile_combo.setCurrentIndex(index)
+
             sub_dir = config.get("default_subdir", "")
             if sub_dir:
                 self.sub_dir_input.setCurrentText(sub_dir)
@@ -399,18 +526,38 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "提示", "请填写完整的连接信息")
                 return
 
+            mode = self.profile_combo.currentData()
+            if mode == "auto":
+                # 先用上次校准的参数握手 (加密算法/压缩只能在握手前设置)，连接后重新校准
+                tuning = self.settings_manager.get_host_profile(f"{user}@{ip}:{port}")
+            else:
+                tuning = PROFILES[mode]
+
+            def connect_task():
+                ok, msg = self.ssh_manager.connect(ip, port, user, pwd, tuning=tuning)
+                if ok and mode == "auto":
+                    try:
+                        result = self.ssh_manager.calibrate_link()
+                        msg = f"{msg} (链路校准: {describe_tuning(result)})"
+                    except Exception as e:
+                        msg = f"{msg} (链路校准失败: {e})"
+                return ok, msg
+
             self.connect_btn.setEnabled(False)
-            self.connect_thread = Worker(self.ssh_manager.connect, ip, port, user, pwd)
-            self.connect_thread.finished.connect(self.on_connect_finished)
-            self.connect_thread.start()
+            self.task_manager.submit("连接服务器", connect_task, on_finished=self.on_connect_finished)
             self.append_log("正在连接服务器...")
         else:
+            if self.task_manager.active_tasks():
+                QMessageBox.warning(self, "提示", "仍有任务在运行或排队，请先等待完成或取消")
+                return
+            self.stop_watch()
             self.ssh_manager.close()
             self.connected = False
             self.connect_btn.setText("连接")
             self.refresh_projects_btn.setEnabled(False)
             self.browse_proj_btn.setEnabled(False)
             self.browse_bkp_btn.setEnabled(False)
+            self.backup_all_btn.setEnabled(False)
             self.append_log("已断开连接")
             
     def on_connect_finished(self, success, msg):
@@ -421,6 +568,7 @@ class MainWindow(QMainWindow):
             self.refresh_projects_btn.setEnabled(True)
             self.browse_proj_btn.setEnabled(True) # [NEW]
             self.browse_bkp_btn.setEnabled(True)  # [NEW]
+            self.backup_all_btn.setEnabled(True)
             self.append_log(f"连接成功: {msg}")
             
             # 保存配置
@@ -433,6 +581,10 @@ class MainWindow(QMainWindow):
                 self.remote_backup_path.text().strip(),
                 self.sub_dir_input.currentText().strip()
             )
+            self.settings_manager.set_option("transport_profile", self.profile_combo.currentData())
+            tuning = self.ssh_manager.tuning
+            if tuning and "calibrated_at" in tuning:
+                self.settings_manager.save_host_profile(self.ssh_manager.host_label, tuning)
             self.append_log("连接配置已保存。")
             
             # 自动加载项目
@@ -446,7 +598,8 @@ class MainWindow(QMainWindow):
             return
         
         initial_path = target_line_edit.text().strip()
-        browser = RemoteFileBrowser(self.ssh_manager, initial_path, self)
+        from .remote_browser import RemoteFileBrowser
+        browser = RemoteFileBrowser(self.ssh_manager, initial_path, self, task_manager=self.task_manager)
         
         # 执行逻辑: 模态对话框
         if browser.exec():
@@ -460,9 +613,8 @@ class MainWindow(QMainWindow):
         path = self.remote_projects_path.text()
         self.append_log(f"正在读取目录: {path}")
         
-        self.list_thread = Worker(self.ssh_manager.list_projects, path)
-        self.list_thread.finished.connect(self.on_list_projects_finished)
-        self.list_thread.start()
+        self.task_manager.submit("读取项目列表", self.ssh_manager.list_projects, path,
+                                 on_finished=self.on_list_projects_finished)
 
     def on_list_projects_finished(self, success, result):
         if success and isinstance(result, list):
@@ -507,10 +659,13 @@ class MainWindow(QMainWindow):
         
         # Deploy 需要项目 + 本地文件 + 连接
         self.deploy_btn.setEnabled(has_project and has_local and self.connected)
+        self.watch_btn.setEnabled(self.watch_btn.isChecked() or (has_project and has_local and self.connected))
         
         # View Backups 和 Backup Only 只需要项目 + 连接
         self.view_backups_btn.setEnabled(has_project and self.connected)
         self.backup_only_btn.setEnabled(has_project and self.connected) # [NEW]
+        self.backup_all_btn.setEnabled(self.connected)
+        self.import_backup_btn.setEnabled(has_project and self.connected)
 
     def start_deploy(self):
         project = self.project_combo.currentText()
@@ -525,78 +680,180 @@ class MainWindow(QMainWindow):
         if sub_dir in [".", "/"]: sub_dir = "" # 处理根目录标识
         
         reply = QMessageBox.question(self, "确认发版", 
-                                     f"确定要发布项目 [{project}] 吗？\n\n1. 本地源: [{local_path}]\n2. 子资源路径: [{sub_dir if sub_dir else '(根目录)'}]\n3. 自动解压(若是ZIP)并备份覆盖。",
+                                     f"确定要发布项目 [{project}] 吗？\n\n1. 本地源: [{local_path}]\n2. 子资源路径: [{sub_dir if sub_dir else '(根目录)'}]\n3. 自动解压(若是ZIP)并备份覆盖 (备份与上传并行，替换前等待两者完成)。",
                                      QMessageBox.Yes | QMessageBox.No)
         if reply != QMessageBox.Yes: return
 
+        warmup_options = None
+        if self.warmup_chk.isChecked():
+            target = self.settings_manager.get_warmup_target(project)
+            if not target.get("base_url"):
+                target = self.edit_warmup_target()
+            if target and target.get("base_url"):
+                warmup_options = dict(target,
+                                      concurrency=int(self.settings_manager.get_option("warmup_concurrency", 8)),
+                                      timeout=float(self.settings_manager.get_option("warmup_timeout", 10)),
+                                      max_urls=int(self.settings_manager.get_option("warmup_max_urls", 500)))
+            else:
+                self.append_log(f"{project} 未设置预热地址，本次不预热缓存")
+
         self.append_log(f"=== 开始发布 {project} ===")
-        self.set_ui_busy(True)
         
-        def deploy_pipeline():
-            import shutil
-            import tempfile
-            import zipfile
-            
-            # 0. 预处理: 解压与路径调整
-            self.append_log("步骤 0/3: 准备本地文件...")
-            deploy_source_path = local_path
-            temp_extract_dir = None
-            
-            try:
-                # 如果是 ZIP 文件
-                if os.path.isfile(local_path) and local_path.lower().endswith('.zip'):
-                    self.append_log(f"正在解压 {os.path.basename(local_path)}...")
-                    temp_extract_dir = tempfile.mkdtemp()
-                    with zipfile.ZipFile(local_path, 'r') as zip_ref:
-                        zip_ref.extractall(temp_extract_dir)
-                    deploy_source_path = temp_extract_dir
-                
-                # 处理子路径 (例如 dist)
-                if sub_dir:
-                    potential_path = os.path.join(deploy_source_path, sub_dir)
-                    if os.path.exists(potential_path) and os.path.isdir(potential_path):
-                        deploy_source_path = potential_path
-                        self.append_log(f"定位到子目录: {sub_dir}")
-                    else:
-                        # 只有当用户显式指定了子路径，且该路径不存在时才报错
-                        # 如果是解压后的根目录，可能结构不一样，提示用户
-                        msg = f"未在包中找到子目录: {sub_dir}"
-                        return False, msg
-
-                # 1. 备份
-                self.append_log("步骤 1/3: 创建服务器备份...")
-                ok, msg = self.ssh_manager.backup_project(remote_root, project, backup_root)
-                if not ok: return False, msg
-                self.append_log(msg)
-                
-                # 2. 部署
-                self.append_log("步骤 2/3: 上传并部署...")
-                ok, msg = self.ssh_manager.deploy_project(deploy_source_path, remote_root, project, 
-                                                          progress_callback=lambda m: print(m))
-                return ok, msg
-                
-            except Exception as e:
-                return False, f"本地处理出错: {str(e)}"
-            finally:
-                # 清理临时文件
-                if temp_extract_dir and os.path.exists(temp_extract_dir):
-                    try:
-                        shutil.rmtree(temp_extract_dir)
-                    except:
-                        pass
+        precompress_options = None
+        if self.precompress_chk.isChecked():
+            precompress_options = {
+                "cache_dir": precompress.default_cache_dir(self.settings_manager.config_file),
+                "min_size": int(self.settings_manager.get_option("precompress_min_bytes", precompress.DEFAULT_MIN_SIZE)),
+                "with_brotli": bool(self.settings_manager.get_option("precompress_brotli", True)),
+            }
+        flow = DeployFlow(self.ssh_manager, local_path, sub_dir, remote_root, project, backup_root,
+                          log=self.append_log, verify=self.verify_chk.isChecked(),
+                          fingerprint_cache=self.fingerprint_cache, precompress=precompress_options,
+                          upload_filter=UploadFilter.from_rules(self.settings_manager.get_upload_rules(project)),
+                          hardlink=bool(self.settings_manager.get_option("hardlink_staging", True)),
+                          size_report=(self.settings_manager.get_option("size_report_thresholds", {})
+                                       if self.size_report_chk.isChecked() else None),
+                          warmup=warmup_options)
+        run = self.history.recorded("deploy", project, self.ssh_manager.host_label, flow.run,
+                                    details=flow.history_details)
+        self.submit_job(project, f"发布 {project}", run, on_finished=self.on_deploy_finished)
 
-        self.deploy_thread = Worker(deploy_pipeline)
-        self.deploy_thread.finished.connect(self.on_deploy_finished)
-        self.deploy_thread.start()
+    def toggle_watch(self, checked):
+        if not checked:
+            self.stop_watch()
+            return
+        project = self.project_combo.currentText()
+        local_path = self.local_path_input.text().strip()
+        if not os.path.isdir(local_path):
+            QMessageBox.warning(self, "提示", "监听模式只支持本地文件夹 (不支持 .zip)")
+            self.watch_btn.setChecked(False)
+            return
+        sub_dir = self.sub_dir_input.currentText().strip()
+        if sub_dir not in ("", ".", "/") and os.path.isdir(os.path.join(local_path, sub_dir)):
+            local_path = os.path.join(local_path, sub_dir)
+        remote_dir = posixpath.join(self.remote_projects_path.text().strip(), project)
 
-    def on_deploy_finished(self, success, msg):
-        self.set_ui_busy(False)
+        reply = QMessageBox.question(self, "确认监听",
+                                     f"将监听 [{local_path}]，变化的文件会直接同步到 [{remote_dir}]。\n\n"
+                                     f"同步不做备份也不整体替换，仅适用于测试环境。\n"
+                                     f"开始前请确认线上版本与本地一致 (必要时先完整发布一次)。",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            self.watch_btn.setChecked(False)
+            return
+
+        upload_filter = UploadFilter.from_rules(self.settings_manager.get_upload_rules(project))
+        self.watcher = DirectoryWatcher(local_path,
+                                        interval=float(self.settings_manager.get_option("watch_interval", 1.0)),
+                                        debounce=float(self.settings_manager.get_option("watch_debounce", 1.5)),
+                                        upload_filter=upload_filter or None, parent=self)
+        self.watcher.batch_ready.connect(self.on_watch_batch)
+        self.watch_target = (local_path, remote_dir, project)
+        self.watch_pending = (set(), set())
+        self.watcher.start()
+        self.watch_btn.setText(f"停止监听 ({project})")
+        self.append_log(f"开始监听 {local_path} -> {remote_dir}")
+
+    def stop_watch(self):
+        if self.watcher is None:
+            return
+        self.watcher.stop()
+        self.watcher.deleteLater()
+        self.watcher = None
+        self.watch_btn.blockSignals(True)
+        self.watch_btn.setChecked(False)
+        self.watch_btn.blockSignals(False)
+        self.watch_btn.setText("开始监听本地目录 (增量同步)")
+        self.check_deploy_btn_state()
+        self.append_log(f"已停止监听 {self.watch_target[0]}")
+
+    def on_watch_batch(self, changed, removed):
+        # 同步进行中到达的变化先合并，当前同步结束后一起推送
+        self._merge_watch_pending(changed, removed)
+        if not self.watch_busy:
+            self.run_watch_sync()
+
+    def _merge_watch_pending(self, changed, removed):
+        pending_changed, pending_removed = self.watch_pending
+        pending_removed.difference_update(changed)
+        pending_changed.difference_update(removed)
+        pending_changed.update(changed)
+        pending_removed.update(removed)
+
+    def run_watch_sync(self):
+        changed, removed = self.watch_pending
+        if self.watcher is None or not (changed or removed):
+            return
+        self.watch_pending = (set(), set())
+        local_dir, remote_dir, project = self.watch_target
+        self.watch_busy = True
+        started = time.monotonic()
+
+        def sync(cancel_token=None):
+            stats = self.ssh_manager.sync_changes(local_dir, remote_dir, changed, removed,
+                                                  keep=DeployFlow.VERIFY_IGNORE, cancel_token=cancel_token,
+                                                  progress_callback=self.append_log)
+            return True, stats
+
+        def done(success, payload):
+            self.watch_busy = False
+            if success:
+                self.append_log(f"[监听] 已同步 {payload['files']} 个文件 ({payload['bytes'] / 1024 / 1024:.2f} MB)，"
+                                f"删除 {payload['removed']} 个，耗时 {time.monotonic() - started:.1f}s")
+            else:
+                # 失败的变化并入下一批 (不覆盖之后的新变化)，下次目录变化时重试
+                self.append_log(f"[监听] 同步失败: {payload}")
+                self._merge_watch_pending(changed - self.watch_pending[1], removed - self.watch_pending[0])
+                return
+            self.run_watch_sync()
+
+        # 与发版/回滚共用调度器，同一项目不会与正在进行的发布交叉执行
+        self.scheduler.enqueue(self.ssh_manager.host_label, project, f"监听同步 {project}", sync, on_finished=done)
+
+    def edit_warmup_target(self):
+        """设置当前项目的预热基础地址，返回保存后的配置 (取消时返回 None)"""
+        project = self.project_combo.currentText()
+        if not project:
+            QMessageBox.information(self, "提示", "请先选择项目")
+            return None
+        target = self.settings_manager.get_warmup_target(project)
+        url, ok = QInputDialog.getText(self, "预热地址", f"[{project}] 的访问地址 (如 https://example.com/app/):",
+                                       text=target.get("base_url", ""))
+        if not ok:
+            return None
+        url = url.strip()
+        if url and not url.startswith(("http://", "https://")):
+            QMessageBox.warning(self, "提示", "地址需以 http:// 或 https:// 开头")
+            return None
+        target = dict(target, base_url=url)
+        self.settings_manager.save_warmup_target(project, target)
+        self.append_log(f"已保存 {project} 的预热地址: {url or '(未设置)'}")
+        return target
+
+    def show_history(self):
+        # 对话框 (含 QtCharts) 在第一次打开时才导入
+        from .history_panel import HistoryPanel
+        HistoryPanel(self.history, project=self.project_combo.currentText() or None, parent=self).exec()
+
+    def edit_upload_rules(self):
+        project = self.project_combo.currentText()
+        if not project:
+            QMessageBox.information(self, "提示", "请先选择项目")
+            return
+        from .upload_rules_dialog import UploadRulesDialog
+        dialog = UploadRulesDialog(project, self.settings_manager.get_upload_rules(project), self)
+        if dialog.exec():
+            rules = dialog.rules()
+            self.settings_manager.save_upload_rules(project, rules)
+            self.append_log(f"已保存 {project} 的上传规则: 包含 {len(rules['include'])} 条, 排除 {len(rules['exclude'])} 条")
+
+    def on_deploy_finished(self, success, msg, interactive=True):
         if success:
             self.append_log(f"发布成功! {msg}")
-            QMessageBox.information(self, "成功", "发布流程执行完成")
+            if interactive: QMessageBox.information(self, "成功", "发布流程执行完成")
         else:
             self.append_log(f"发布失败: {msg}")
-            QMessageBox.critical(self, "错误", f"发布过程中止: {msg}")
+            if interactive: QMessageBox.critical(self, "错误", f"发布过程中止: {msg}")
 
     def start_backup_only(self):
         project = self.project_combo.currentText()
@@ -605,22 +862,40 @@ class MainWindow(QMainWindow):
         
         if not project: return
         
-        self.set_ui_busy(True)
         self.append_log(f"=== 开始备份 {project} ===")
         
         # 直接复用 ssh_manager.backup_project
-        self.backup_op_thread = Worker(self.ssh_manager.backup_project, remote_root, project, backup_root)
-        self.backup_op_thread.finished.connect(self.on_backup_only_finished)
-        self.backup_op_thread.start()
+        run = self.history.recorded("backup", project, self.ssh_manager.host_label, self.ssh_manager.backup_project)
+        self.submit_job(project, f"备份 {project}", run, remote_root, project, backup_root,
+                        progress_callback=self.append_log, on_finished=self.on_backup_only_finished)
         
-    def on_backup_only_finished(self, success, msg):
-        self.set_ui_busy(False)
+    def on_backup_only_finished(self, success, msg, interactive=True):
         if success:
             self.append_log(msg)
-            QMessageBox.information(self, "备份成功", f"备份已完成。\n{msg}")
+            if interactive: QMessageBox.information(self, "备份成功", f"备份已完成。\n{msg}")
         else:
             self.append_log(f"备份失败: {msg}")
-            QMessageBox.critical(self, "备份失败", msg)
+            if interactive: QMessageBox.critical(self, "备份失败", msg)
+
+    def start_backup_all(self):
+        remote_root = self.remote_projects_path.text()
+        backup_root = self.remote_backup_path.text()
+        parallel = int(self.settings_manager.get_option("backup_all_parallel", 2))
+        io_priority = self.settings_manager.get_option("backup_io_priority", "idle")
+        reply = QMessageBox.question(self, "确认备份",
+                                     f"将备份 {remote_root} 下的所有项目到 {backup_root}\n"
+                                     f"(并行 {parallel} 个，I/O 优先级 {io_priority})，是否继续?",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+
+        self.append_log(f"=== 开始备份全部项目 ({remote_root}) ===")
+        # 调度键用 ALL_PROJECTS: 等该主机上的任务都结束后才开始，运行期间其他项目的任务排队等待
+        run = self.history.recorded("backup", ALL_PROJECTS, self.ssh_manager.host_label,
+                                    self.ssh_manager.backup_all_projects)
+        self.submit_job(ALL_PROJECTS, "备份全部项目", run, remote_root, backup_root, parallel=parallel,
+                        io_priority=io_priority, progress_callback=self.append_log,
+                        on_finished=self.on_backup_only_finished)
 
     def load_backups(self):
         project = self.project_combo.currentText()
@@ -629,9 +904,8 @@ class MainWindow(QMainWindow):
         backup_root = self.remote_backup_path.text()
         self.append_log(f"正在查询项目 [{project}] 的备份...")
         
-        self.backup_thread = Worker(self.ssh_manager.list_backups, backup_root, project)
-        self.backup_thread.finished.connect(self.on_load_backups_finished)
-        self.backup_thread.start()
+        self.task_manager.submit(f"查询备份 {project}", self.ssh_manager.list_backups, backup_root, project,
+                                 on_finished=self.on_load_backups_finished)
 
     def on_load_backups_finished(self, success, result):
         if success and isinstance(result, list):
@@ -642,9 +916,42 @@ class MainWindow(QMainWindow):
                 self.rollback_btn.setEnabled(True)
             else:
                 self.rollback_btn.setEnabled(False)
+            self.export_backup_btn.setEnabled(bool(result))
         else:
             self.append_log("获取备份列表失败")
 
+    def export_backup(self):
+        backup_name = self.backup_combo.currentText()
+        if not backup_name:
+            return
+        local_path, _ = QFileDialog.getSaveFileName(self, "导出备份", backup_name, "备份 (*.tar.gz);;所有文件 (*)")
+        if not local_path:
+            return
+        self.append_log(f"=== 开始导出备份 {backup_name} ===")
+        # 与同一项目的备份/回滚串行，并受同主机并发数限制
+        self.submit_job(self.project_combo.currentText(), f"导出备份 {backup_name}", self.ssh_manager.export_backup,
+                        self.remote_backup_path.text(), backup_name, local_path,
+                        progress_callback=self.append_log, on_finished=self.on_backup_transfer_finished)
+
+    def import_backup(self):
+        project = self.project_combo.currentText()
+        if not project:
+            return
+        local_path, _ = QFileDialog.getOpenFileName(self, "选择要导入的备份", "", "备份 (*.tar.gz *.tgz);;所有文件 (*)")
+        if not local_path:
+            return
+        self.append_log(f"=== 开始导入备份 {os.path.basename(local_path)} 到 {project} ===")
+        self.submit_job(project, f"导入备份 {os.path.basename(local_path)}", self.ssh_manager.import_backup,
+                        local_path, self.remote_backup_path.text(), project,
+                        progress_callback=self.append_log, on_finished=self.on_backup_transfer_finished)
+
+    def on_backup_transfer_finished(self, success, msg, interactive=True):
+        self.append_log(msg)
+        if success:
+            self.load_backups()
+        elif interactive:
+            QMessageBox.critical(self, "失败", msg)
+
     def start_rollback(self):
         project = self.project_combo.currentText()
         backup = self.backup_combo.currentText()
@@ -658,49 +965,60 @@ class MainWindow(QMainWindow):
                                     QMessageBox.Yes | QMessageBox.No)
         if reply != QMessageBox.Yes: return
 
-        self.set_ui_busy(True)
         self.append_log(f"=== 开始回滚 {project} -> {backup} ===")
         
         backup_full_path = f"{backup_root}/{backup}"
         target_full_path = f"{remote_root}/{project}"
         
-        self.rollback_thread = Worker(self.ssh_manager.rollback_project, backup_full_path, target_full_path)
-        self.rollback_thread.finished.connect(self.on_rollback_finished)
-        self.rollback_thread.start()
+        run = self.history.recorded("rollback", project, self.ssh_manager.host_label,
+                                    self.ssh_manager.rollback_project)
+        self.submit_job(project, f"回滚 {project}", run, backup_full_path,
+                        target_full_path, progress_callback=self.append_log,
+                        verify=self.verify_chk.isChecked(), on_finished=self.on_rollback_finished)
         
-    def on_rollback_finished(self, success, msg):
-        self.set_ui_busy(False)
+    def on_rollback_finished(self, success, msg, interactive=True):
         if success:
             self.append_log(f"回滚成功")
-            QMessageBox.information(self, "成功", "回滚操作完成")
+            if interactive: QMessageBox.information(self, "成功", "回滚操作完成")
         else:
             self.append_log(f"回滚失败: {msg}")
-            QMessageBox.critical(self, "错误", msg)
+            if interactive: QMessageBox.critical(self, "错误", msg)
+
+    def submit_job(self, project, name, func, *args, on_finished=None, **kwargs):
+        """
+        通过调度器提交发版/备份/回滚任务。
+        非排队模式下锁定界面并在结束时弹窗；排队模式下只写日志，不阻塞后续操作。
+        """
+        interactive = not self.queue_mode_chk.isChecked()
+        if interactive:
+            self.set_ui_busy(True)
+        else:
+            self.append_log(f"已加入队列: {name} (等待中 {self.scheduler.queued_count} 个)")
+
+        def done(success, payload):
+            if interactive:
+                self.set_ui_busy(False)
+            if on_finished:
+                on_finished(success, payload, interactive=interactive)
+
+        return self.scheduler.enqueue(self.ssh_manager.host_label, project, name, func, *args,
+                                      on_finished=done, **kwargs)
 
     def set_ui_busy(self, busy):
         self.deploy_btn.setEnabled(not busy)
         self.rollback_btn.setEnabled(not busy)
         self.connect_btn.setEnabled(not busy)
         self.backup_only_btn.setEnabled(not busy) # [NEW]
+        self.backup_all_btn.setEnabled(not busy)
         # 我们不禁用所有内容，只禁用关键操作
 
     def append_log(self, text):
-        self.log_widget.append(text)
-
-class QLogHandler(logging.Handler):
-    def __init__(self, widget):
-        super().__init__()
-        self.widget = widget
-
-    def emit(self, record):
-        msg = self.format(record)
-        # 线程安全问题? 在 PySide 中，GUI 更新必须发生在主线程上。
-        # 但这里我们简化了。如果复杂，请使用 Signal。
-        # 目前，我们假设如果从线程直接追加可能会崩溃。
-        # 所以我们应该严格使用 Signal 从线程记录日志。
-        # MainWindow.append_log 可以安全地从 MainWindow 方法调用，
-        # 但如果从后端调用，则有风险。
-        # 通过信号重新路由所有日志更安全，但目前只需坚持从 Worker 返回消息。
-        pass
-
+        # 线程安全: 只入队，由 LogSink 在 GUI 线程批量刷新
+        self.log_sink.write(text)
 
+    def closeEvent(self, event):
+        self.stop_watch()
+        self.task_manager.shutdown()
+        self.log_sink.flush()
+        self.log_sink.disable_file()
+        super().closeEvent(event)
@@ -0,0 +1,218 @@
+import os
+import math
+import time
+import gzip
+import zlib
+import tarfile
+import logging
+
+# 已经压缩过的格式: 再压缩只浪费 CPU
+INCOMPRESSIBLE_EXTS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".ico",
+    ".woff", ".woff2", ".eot",
+    ".gz", ".br", ".zip", ".7z", ".rar", ".xz", ".bz2", ".zst", ".tgz",
+    ".mp4", ".webm", ".mov", ".avi", ".mkv", ".mp3", ".ogg", ".m4a", ".aac", ".flac",
+    ".pdf", ".jar", ".apk",
+}
+# 一定值得压缩的文本格式，不需要采样
+TEXT_EXTS = {
+    ".html", ".htm", ".js", ".mjs", ".cjs", ".css", ".json", ".map", ".svg", ".xml", ".txt",
+    ".md", ".csv", ".wasm", ".ttf", ".otf",
+}
+
+ENTROPY_SAMPLE = 64 * 1024
+# 采样熵 (比特/字节) 高于该值视为已压缩/随机数据
+ENTROPY_LIMIT = 7.5
+# 小文件不采样，直接按可压缩处理 (tar 头和 gzip 开销占主导)
+ENTROPY_MIN_SIZE = 4096
+
+CANDIDATE_LEVELS = (1, 3, 6, 9)
+DEFAULT_LEVEL = 6
+LEVEL_SAMPLE_BYTES = 2 * 1024 * 1024
+
+
+def sample_entropy(path, sample=ENTROPY_SAMPLE):
+    """读取文件开头与中间各一段，计算字节熵 (0~8)"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        data = f.read(sample // 2)
+        if size > sample:
+            f.seek(size // 2)
+        data += f.read(sample // 2)
+    if not data:
+        return 0.0
+    counts = [0] * 256
+    for b in data:
+        counts[b] += 1
+    total = len(data)
+    return -sum(c / total * math.log2(c / total) for c in counts if c)
+
+
+def is_compressible(path, size=None):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in INCOMPRESSIBLE_EXTS:
+        return False
+    if ext in TEXT_EXTS:
+        return True
+    if size is None:
+        size = os.path.getsize(path)
+    if size < ENTROPY_MIN_SIZE:
+        return True
+    return sample_entropy(path) < ENTROPY_LIMIT
+
+
+def classify(local_dir, large_threshold=None, upload_filter=None, only=None):
+    """
+    将目录内的文件 (经 upload_filter 过滤后；only 不为空时只取其中列出的路径) 分为三组 (相对路径 posix 形式):
+    - compressed: 文本等可压缩文件
+    - stored: 已压缩/高熵文件，原样打包
+    - large: 超过 large_threshold 的文件，交给分块续传单独上传
+    以及 dirs: 全部子目录 (用于在远程创建空目录)
+    """
+    plan = {"compressed": [], "stored": [], "large": [], "dirs": []}
+    sizes = {}
+    for root, dirs, files in os.walk(local_dir):
+        rel_root = os.path.relpath(root, local_dir).replace("\\", "/")
+        if upload_filter:
+            upload_filter.prune_dirs(root, rel_root, dirs)
+        dirs.sort()
+        for d in dirs:
+            plan["dirs"].append(d if rel_root == "." else f"{rel_root}/{d}")
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            rel = name if rel_root == "." else f"{rel_root}/{name}"
+            size = os.path.getsize(full)
+            if upload_filter and not upload_filter.check(rel, size):
+                continue
+            if only is not None and rel not in only:
+                continue
+            sizes[rel] = size
+            if large_threshold and size >= large_threshold:
+                plan["large"].append(rel)
+            elif is_compressible(full, size):
+                plan["compressed"].append(rel)
+            else:
+                plan["stored"].append(rel)
+    plan["sizes"] = sizes
+    return plan
+
+
+def read_sample(local_dir, rels, limit=LEVEL_SAMPLE_BYTES):
+    """读取若干文件的开头拼成压缩测试样本 (最多 limit 字节)"""
+    data = bytearray()
+    for rel in rels:
+        with open(os.path.join(local_dir, rel), "rb") as f:
+            data += f.read(limit - len(data))
+        if len(data) >= limit:
+            break
+    return bytes(data)
+
+
+def choose_level(sample, link_bps=None):
+    """
+    根据本地压缩速度与链路速度选择 gzip 级别。
+    流式传输时压缩与发送并行，每字节耗时取二者较大者:
+        max(1 / CPU 吞吐, 压缩率 / 链路吞吐)
+    链路越慢越值得用高级别；链路快于 CPU 时选低级别避免 CPU 成为瓶颈。
+    未知链路速度时返回默认级别 6。返回 (level, 测量结果)。
+    """
+    if not link_bps or not sample:
+        return DEFAULT_LEVEL, {}
+    measured = {}
+    for level in CANDIDATE_LEVELS:
+        start = time.perf_counter()
+        compressed = zlib.compress(sample, level)
+        elapsed = max(time.perf_counter() - start, 1e-6)
+        cpu_bps = len(sample) / elapsed
+        ratio = len(compressed) / len(sample)
+        measured[level] = {"cpu_mbps": round(cpu_bps / 1024 / 1024, 1), "ratio": round(ratio, 3),
+                           "cost": max(1 / cpu_bps, ratio / link_bps)}
+    # 耗时相差 5% 以内时取更高级别 (传输字节更少)
+    best = min(m["cost"] for m in measured.values())
+    level = max(lv for lv, m in measured.items() if m["cost"] <= best * 1.05)
+    return level, measured
+
+
+class _ChannelWriter:
+    """把 paramiko Channel 包装成 tarfile/gzip 可写的文件对象，写入时检查取消并统计字节"""
+    def __init__(self, channel, cancel_token=None, on_bytes=None):
+        self.channel = channel
+        self.cancel_token = cancel_token
+        self.on_bytes = on_bytes
+        self.sent = 0
+
+    def write(self, data):
+        if self.cancel_token: self.cancel_token.check()
+        self.channel.sendall(data)
+        self.sent += len(data)
+        if self.on_bytes:
+            self.on_bytes(self.sent)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def _tarinfo(tar, full, rel):
+    info = tar.gettarinfo(full, arcname=rel)
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    return info
+
+
+def write_tar(fileobj, local_dir, rels, dirs=(), level=None, cancel_token=None):
+    """
+    将文件写成 tar 流 (level 为 None 时不压缩，否则外层 gzip)。
+    使用流式模式，不在本地生成临时包。
+    """
+    gz = gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=level, mtime=0) if level else None
+    with tarfile.open(fileobj=gz or fileobj, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+        for rel in dirs:
+            tar.addfile(_tarinfo(tar, os.path.join(local_dir, rel), rel))
+        for rel in rels:
+            if cancel_token: cancel_token.check()
+            full = os.path.join(local_dir, rel)
+            with open(full, "rb") as f:
+                tar.addfile(_tarinfo(tar, full, rel), f)
+    if gz:
+        gz.close()
+
+
+def stream_tar_to_remote(ssh_manager, local_dir, rels, remote_dir, dirs=(), level=None, cancel_token=None,
+                         on_bytes=None, unlink_first=False):
+    """
+    通过一个 exec 通道把 tar 流直接写入远程 tar -x (不经过 SFTP 与临时文件)。
+    unlink_first=True 时先删除已存在的文件再写入 (目标是硬链接克隆时，避免改写共享的 inode)。
+    返回发送的字节数；远程解包失败时抛出 IOError。
+    """
+    flags = "-xzf" if level else "-xf"
+    if unlink_first:
+        flags = "--unlink-first " + flags
+    channel = ssh_manager.client.get_transport().open_session()
+    try:
+        channel.exec_command(f"mkdir -p '{remote_dir}' && tar {flags} - --no-same-owner -C '{remote_dir}'")
+        writer = _ChannelWriter(channel, cancel_token, on_bytes)
+        write_tar(writer, local_dir, rels, dirs=dirs, level=level, cancel_token=cancel_token)
+        channel.shutdown_write()
+        status = channel.recv_exit_status()
+        if status != 0:
+            err = channel.makefile_stderr("rb").read().decode("utf-8", "replace").strip()
+            raise IOError(f"远程解包失败 (退出码 {status}): {err}")
+        return writer.sent
+    finally:
+        channel.close()
+
+
+def backup_level(file_sizes):
+    """
+    备份压缩级别: file_sizes 为 [(文件名, 大小)]。
+    大部分内容已是压缩格式时用级别 1 (几乎压不动，只求快)，否则沿用 gzip 默认级别。
+    """
+    total = sum(size for _, size in file_sizes)
+    if not total:
+        return DEFAULT_LEVEL
+    stored = sum(size for name, size in file_sizes if os.path.splitext(name)[1].lower() in INCOMPRESSIBLE_EXTS)
+    level = 1 if stored / total >= 0.7 else DEFAULT_LEVEL
+    logging.getLogger("DeployTool").info(
+        f"Backup content: {stored * 100 // total}% already compressed -> gzip level {level}")
+    return level
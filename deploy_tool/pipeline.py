@@ -0,0 +1,101 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .cancel import CancelToken, OperationCancelled
+
+
+class StageFailed(Exception):
+    """阶段执行失败 (携带给用户看的错误信息)"""
+    pass
+
+
+class Stage:
+    """
+    流水线中的一个阶段。
+    func(ctx, cancel_token) -> 任意结果；ctx 为已完成阶段的结果字典 {阶段名: 结果}。
+    失败时抛出 StageFailed。
+    skip_if_cancelled 为 False 的阶段在已取消时仍会启动 (如切换之后的收尾阶段)，由 func 自行处理取消。
+    """
+    def __init__(self, name, func, deps=(), label=None, skip_if_cancelled=True):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.label = label or name
+        self.skip_if_cancelled = skip_if_cancelled
+
+
+class StagePipeline:
+    """
+    按依赖关系并发执行的小型阶段图:
+    - 依赖全部完成的阶段立即提交到线程池
+    - 任一阶段失败时取消其余阶段 (协作式)，等待正在运行的阶段退出后抛出异常
+    - 记录每个阶段的耗时 (timings)
+    """
+    def __init__(self, stages, max_workers=3, cancel_token=None, progress_callback=None):
+        self.stages = {s.name: s for s in stages}
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"阶段 {stage.name} 依赖未知阶段 {dep}")
+        self.max_workers = max_workers
+        # 子标记: 外部取消会传递进来，内部失败只取消本流水线
+        self.token = CancelToken(parent=cancel_token)
+        self.progress_callback = progress_callback
+        self.logger = logging.getLogger("DeployTool")
+        self.results = {}
+        self.timings = {}
+
+    def _report(self, msg):
+        if self.progress_callback:
+            self.progress_callback(msg)
+
+    def _run_stage(self, stage, ctx):
+        if stage.skip_if_cancelled:
+            self.token.check()
+        self._report(f"[{stage.label}] 开始")
+        start = time.monotonic()
+        try:
+            return stage.func(ctx, self.token)
+        finally:
+            self.timings[stage.name] = time.monotonic() - start
+
+    def run(self):
+        """执行全部阶段，返回结果字典；失败抛出 StageFailed / OperationCancelled"""
+        pending = dict(self.stages)
+        running = {}
+        error = failed_stage = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="DeployStage") as executor:
+            while pending or running:
+                if error is None:
+                    ready = [s for s in pending.values() if all(d in self.results for d in s.deps)]
+                    for stage in ready:
+                        del pending[stage.name]
+                        running[executor.submit(self._run_stage, stage, dict(self.results))] = stage
+
+                if not running:
+                    if pending and error is None:
+                        raise ValueError(f"阶段依赖存在环: {', '.join(pending)}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        self.results[stage.name] = future.result()
+                        self._report(f"[{stage.label}] 完成 ({self.timings[stage.name]:.1f}s)")
+                    except Exception as e:
+                        # 保留第一个真实失败原因，而不是由它引发的其他阶段取消
+                        if error is None or (isinstance(error, OperationCancelled)
+                                             and not isinstance(e, OperationCancelled)):
+                            error, failed_stage = e, stage
+                        if not isinstance(e, OperationCancelled):
+                            self.logger.error(f"Stage '{stage.name}' failed: {e}")
+                        self.token.cancel()
+
+        if error is not None:
+            if isinstance(error, (StageFailed, OperationCancelled)):
+                raise error
+            raise StageFailed(f"{failed_stage.label}: {error}") from error
+        return self.results
@@ -0,0 +1,167 @@
+import os
+import gzip
+import shutil
+import logging
+
+from .fingerprint import build_manifest
+from .packaging import TEXT_EXTS
+
+try:
+    import brotli  # 可选依赖: pip install brotli
+except ImportError:
+    brotli = None
+
+# nginx gzip_static / brotli_static 的默认最小值与此一致，小文件压缩收益不抵请求开销
+DEFAULT_MIN_SIZE = 1024
+# .map 只给开发者工具使用，不值得预压缩
+PRECOMPRESS_EXTS = TEXT_EXTS - {".map", ".md"}
+
+
+def default_cache_dir(config_file="app_config.json"):
+    """预压缩产物缓存目录 (按源文件 sha256 命名)，放在 app_config.json 旁边"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), "precompress_cache")
+
+
+def _cache_paths(cache_dir, sha256):
+    base = os.path.join(cache_dir, sha256[:2], sha256)
+    return base + ".gz", base + ".br"
+
+
+def compress_to_cache(src, cache_dir, sha256, with_brotli):
+    """压缩单个文件到缓存目录 (模块级函数，便于进程池序列化)，返回写入的字节数"""
+    gz_path, br_path = _cache_paths(cache_dir, sha256)
+    os.makedirs(os.path.dirname(gz_path), exist_ok=True)
+    with open(src, "rb") as f:
+        data = f.read()
+    written = 0
+    if not os.path.exists(gz_path):
+        tmp = f"{gz_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as gz:
+            gz.write(data)
+        os.replace(tmp, gz_path)
+        written += os.path.getsize(gz_path)
+    if with_brotli and not os.path.exists(br_path):
+        tmp = f"{br_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as out:
+            out.write(brotli.compress(data, quality=11))
+        os.replace(tmp, br_path)
+        written += os.path.getsize(br_path)
+    return written
+
+
+def _place(src, cached, suffix):
+    """把缓存的压缩产物复制为源文件的同名兄弟文件，修改时间与源文件一致"""
+    target = src + suffix
+    # 镜像目录中的旧副本可能是用户文件的硬链接，先删除再写入，不能原地覆盖
+    if os.path.lexists(target):
+        os.remove(target)
+    shutil.copyfile(cached, target)
+    st = os.stat(src)
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def mirror_tree(src_root, dest_root, upload_filter=None, cancel_token=None):
+    """
+    把 src_root 中会被上传的文件镜像到 dest_root (优先硬链接，跨磁盘时复制并保留修改时间)，
+    预压缩产物写入镜像，不改动用户的构建目录。被上传规则排除的文件记入跳过统计。
+    源文件已不存在的旧预压缩副本 (如只有 app.js.gz 而没有 app.js) 不镜像。返回镜像的文件数。
+    """
+    count = 0
+    for dirpath, dirs, files in os.walk(src_root):
+        rel_root = os.path.relpath(dirpath, src_root).replace(os.sep, "/")
+        if upload_filter:
+            upload_filter.prune_dirs(dirpath, rel_root, dirs)
+        target_dir = dest_root if rel_root == "." else os.path.join(dest_root, rel_root)
+        os.makedirs(target_dir, exist_ok=True)
+        names = set(files)
+        for name in files:
+            if cancel_token: cancel_token.check()
+            rel = name if rel_root == "." else f"{rel_root}/{name}"
+            src = os.path.join(dirpath, name)
+            if upload_filter and not upload_filter.check(rel, os.path.getsize(src)):
+                continue
+            base, ext = os.path.splitext(name)
+            if ext in (".gz", ".br") and os.path.splitext(base)[1].lower() in PRECOMPRESS_EXTS and base not in names:
+                continue
+            dst = os.path.join(target_dir, name)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+            count += 1
+    return count
+
+
+def precompress_dir(root, cache_dir, fingerprint_cache=None, key_prefix=None, min_size=DEFAULT_MIN_SIZE,
+                    with_brotli=True, workers=None, cancel_token=None, progress_callback=None, file_filter=None,
+                    key_suffixes=None, exclude=()):
+    """
+    为 root 下的文本资源生成 .gz (以及可用时的 .br) 兄弟文件，供 nginx gzip_static/brotli_static 使用。
+    源文件指纹来自指纹缓存；压缩结果按 sha256 缓存，内容未变的文件直接复用上次的产物，
+    只有新的/变化的文件才在进程池中压缩。已存在的 .gz/.br 会被覆盖，避免源文件更新后残留旧的压缩文件。
+    exclude 中的相对路径不预压缩 (如切换时会换成服务器上版本的 config.json)。
+    返回统计字典。
+    """
+    logger = logging.getLogger("DeployTool")
+    with_brotli = with_brotli and brotli is not None
+
+    def wanted(rel):
+        if rel in exclude or os.path.splitext(rel)[1].lower() not in PRECOMPRESS_EXTS:
+            return False
+        if file_filter and not file_filter(rel):
+            return False
+        return os.path.getsize(os.path.join(root, rel)) >= min_size
+
+    manifest = build_manifest(root, cache=fingerprint_cache, workers=workers, cancel_token=cancel_token,
+                              key_prefix=key_prefix, file_filter=wanted, key_suffixes=key_suffixes)
+
+    def is_cached(sha256):
+        gz_path, br_path = _cache_paths(cache_dir, sha256)
+        return os.path.exists(gz_path) and (not with_brotli or os.path.exists(br_path))
+
+    # 同一内容可能出现多次，只压缩一次
+    todo = {}
+    for rel, (size, sha256) in manifest.items():
+        if not is_cached(sha256):
+            todo.setdefault(sha256, os.path.join(root, rel))
+
+    if todo:
+        from concurrent.futures import ProcessPoolExecutor
+        if progress_callback:
+            progress_callback(f"预压缩: {len(todo)} 个文件需要压缩，{len(manifest) - len(todo)} 个复用缓存")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(compress_to_cache, src, cache_dir, sha256, with_brotli)
+                       for sha256, src in todo.items()]
+            try:
+                for future in futures:
+                    if cancel_token: cancel_token.check()
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    original = compressed = 0
+    for rel, (size, sha256) in manifest.items():
+        if cancel_token: cancel_token.check()
+        src = os.path.join(root, rel)
+        gz_path, br_path = _cache_paths(cache_dir, sha256)
+        _place(src, gz_path, ".gz")
+        original += size
+        compressed += os.path.getsize(gz_path)
+        if with_brotli:
+            _place(src, br_path, ".br")
+
+    stats = {"files": len(manifest), "compressed": len(todo), "reused": len(manifest) - len(todo),
+             "brotli": with_brotli, "original_bytes": original, "gzip_bytes": compressed}
+    logger.info(f"Precompress: {stats}")
+    return stats
+
+
+def describe(stats):
+    if not stats["files"]:
+        return "预压缩: 没有需要处理的文本资源"
+    ratio = stats["gzip_bytes"] * 100 // max(stats["original_bytes"], 1)
+    kinds = ".gz/.br" if stats["brotli"] else ".gz"
+    return (f"预压缩完成: {stats['files']} 个文件生成 {kinds} (新压缩 {stats['compressed']}，复用 {stats['reused']})，"
+            f"gzip 后为原大小的 {ratio}%")
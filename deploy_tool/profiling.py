@@ -0,0 +1,77 @@
+import io
+import os
+import re
+import time
+import pstats
+import logging
+import cProfile
+import itertools
+import threading
+
+# 环境变量优先于设置: DEPLOY_TOOL_PROFILE=1 开启，DEPLOY_TOOL_PROFILE_DIR 指定输出目录
+ENV_ENABLE = "DEPLOY_TOOL_PROFILE"
+ENV_DIR = "DEPLOY_TOOL_PROFILE_DIR"
+
+_config = {"enabled": False, "out_dir": "profiles", "top": 15}
+# cProfile 同一时间只能有一个实例处于启用状态，并发任务中只对先开始的那个采样
+_active = threading.Lock()
+_seq = itertools.count(1)
+
+
+def configure(enabled=False, out_dir=None, top=15):
+    """设置性能分析开关 (环境变量 DEPLOY_TOOL_PROFILE 可强制开启)"""
+    env = os.environ.get(ENV_ENABLE, "").strip().lower()
+    _config["enabled"] = bool(enabled) or env in ("1", "true", "yes", "on")
+    _config["out_dir"] = os.environ.get(ENV_DIR) or out_dir or _config["out_dir"]
+    _config["top"] = int(top)
+
+
+def is_enabled():
+    return _config["enabled"]
+
+
+def _slug(name):
+    return re.sub(r"[^\w.-]+", "_", name).strip("_")[:60] or "task"
+
+
+def summarize(profile, top=15):
+    """按累计耗时排序的前 top 个函数 (文本)"""
+    out = io.StringIO()
+    stats = pstats.Stats(profile, stream=out)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+
+def run_profiled(name, func, *args, **kwargs):
+    """
+    在 cProfile 下执行 func，结束后 (含异常) 把结果保存为 <输出目录>/<时间>_<序号>_<名称>.pstats，
+    并把累计耗时前 N 的函数写入日志。未开启或已有任务在采样时直接执行。
+    注意: cProfile 只统计调用线程，条带上传的子线程与哈希进程池不在其中。
+    """
+    if not _config["enabled"] or not _active.acquire(blocking=False):
+        return func(*args, **kwargs)
+
+    logger = logging.getLogger("DeployTool")
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+    finally:
+        _active.release()
+        elapsed = time.perf_counter() - start
+        try:
+            os.makedirs(_config["out_dir"], exist_ok=True)
+            path = os.path.join(_config["out_dir"], f"{time.strftime('%Y%m%d_%H%M%S')}_{next(_seq)}_{_slug(name)}.pstats")
+            profile.dump_stats(path)
+            logger.info(f"[性能分析] {name} 耗时 {elapsed:.2f}s，结果已保存: {path} "
+                        f"(可用 python -m pstats 或 snakeviz 查看)\n{summarize(profile, _config['top'])}")
+        except Exception as e:
+            logger.warning(f"[性能分析] 保存 {name} 的结果失败: {e}")
+
+
+# 未调用 configure() 时 (例如脚本中直接使用) 也遵循环境变量
+configure()
@@ -3,32 +3,14 @@ from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTreeWidget, Q
 from PySide6.QtCore import Qt, Signal, QDateTime
 from PySide6.QtGui import QIcon, QAction
 
-# 复用 Worker 概念，但使其可独立使用或导入
-from PySide6.QtCore import QThread
-
-class BrowserWorker(QThread):
-    finished = Signal(bool, object)
-    
-    def __init__(self, func, *args, **kwargs):
-        super().__init__()
-        self.func = func
-        self.args = args
-        self.kwargs = kwargs
-        
-    def run(self):
-        try:
-            result = self.func(*self.args, **self.kwargs)
-            if isinstance(result, tuple) and len(result) == 2:
-                self.finished.emit(result[0], result[1])
-            else:
-                self.finished.emit(True, result)
-        except Exception as e:
-            self.finished.emit(False, str(e))
+from .tasks import get_task_manager
 
 class RemoteFileBrowser(QDialog):
-    def __init__(self, ssh_manager, initial_path="/", parent=None):
+    def __init__(self, ssh_manager, initial_path="/", parent=None, task_manager=None):
         super().__init__(parent)
         self.ssh_manager = ssh_manager
+        self.task_manager = task_manager or get_task_manager()
+        self.load_task = None
         self.current_path = initial_path
         self.setWindowTitle("远程文件浏览器")
         self.resize(800, 600)
@@ -81,11 +63,16 @@ class RemoteFileBrowser(QDialog):
         self.tree.setEnabled(False)
         self.path_input.setText(path)
         
-        self.worker = BrowserWorker(self.ssh_manager.list_remote_dir_detailed, path)
-        self.worker.finished.connect(self.on_load_finished)
-        self.worker.start()
+        # 快速切换目录时取消上一次尚未完成的加载
+        if self.load_task and self.load_task.active:
+            self.load_task.cancel()
+        task = self.task_manager.submit(f"浏览 {path}", self.ssh_manager.list_remote_dir_detailed, path)
+        task.on_finished = lambda ok, res, t=task: self.on_load_finished(ok, res, t)
+        self.load_task = task
 
-    def on_load_finished(self, success, result):
+    def on_load_finished(self, success, result, task=None):
+        if task is not self.load_task:
+            return  # 已被新的加载请求取代
         self.tree.setEnabled(True)
         if success:
             self.current_path = self.path_input.text() # Confirm path update
@@ -124,6 +111,7 @@ class RemoteFileBrowser(QDialog):
                 tree_item.setText(0, f"📄 {name}")
                 tree_item.setData(0, Qt.UserRole, name)
                 tree_item.setData(0, Qt.UserRole + 1, False) # Is File
+                tree_item.setData(0, Qt.UserRole + 2, item['size'])
 
     def on_item_double_clicked(self, item, column):
         is_dir = item.data(0, Qt.UserRole + 1)
@@ -135,6 +123,13 @@ class RemoteFileBrowser(QDialog):
             import posixpath
             new_path = posixpath.join(self.current_path, name)
             self.load_directory(new_path)
+        else:
+            # 文件: 只读预览 (按偏移读取开头/末尾，支持跟踪日志)
+            import posixpath
+            from .file_preview import RemotePreviewDialog
+            path = posixpath.join(self.current_path, name)
+            RemotePreviewDialog(self.ssh_manager, path, item.data(0, Qt.UserRole + 2), self,
+                                task_manager=self.task_manager).exec()
 
     def go_up(self):
         import posixpath
@@ -0,0 +1,88 @@
+from collections import deque
+from PySide6.QtCore import QObject
+
+# 作用于主机上所有项目的任务 (如备份全部项目) 使用的项目名
+ALL_PROJECTS = "*"
+
+
+class DeployScheduler(QObject):
+    """
+    发版/备份/回滚任务队列:
+    - 不同项目可并发执行，但同一主机同时运行的任务数不超过 per_host_limit
+    - 同一 (主机, 项目) 的任务严格按加入顺序串行
+    - 项目为 ALL_PROJECTS 的任务与该主机上的所有任务互斥: 等主机空闲后才开始，
+      运行或等待期间排在它后面的同主机任务都不启动
+    - 所有任务复用调用方传入的同一条 SSH 连接 (Transport 支持多通道并发)；SFTPClient 本身不是线程安全的，
+      SSHManager.sftp 为每个工作线程提供独立的 SFTP 会话
+    调度逻辑只在 GUI 线程运行，无需加锁。
+    """
+    def __init__(self, task_manager, per_host_limit=2, parent=None):
+        super().__init__(parent)
+        self.task_manager = task_manager
+        self.per_host_limit = max(1, int(per_host_limit))
+        self.pending = deque()      # [(host, project, task)]
+        self.running = {}           # task.id -> (host, project)
+        self.task_manager.task_changed.connect(self.on_task_changed)
+
+    def enqueue(self, host, project, name, func, *args, on_finished=None, **kwargs):
+        """加入队列，返回 Task (state=waiting，开始执行后转为 queued/running)"""
+        task = self.task_manager.create(name, func, *args, **kwargs)
+        task.on_finished = lambda ok, payload, t=task: self._on_finished(t, ok, payload, on_finished)
+        self.pending.append((host, project, task))
+        self.pump()
+        return task
+
+    def _on_finished(self, task, success, payload, callback):
+        self.running.pop(task.id, None)
+        if callback:
+            callback(success, payload)
+        self.pump()
+
+    def pump(self):
+        """启动所有满足并发约束的等待任务"""
+        busy_projects = set(self.running.values())
+        host_counts = {}
+        for host, _ in self.running.values():
+            host_counts[host] = host_counts.get(host, 0) + 1
+
+        # 有 ALL_PROJECTS 任务正在运行或排队等待的主机，后面的同主机任务不能越过它
+        barrier_hosts = {host for host, project in self.running.values() if project == ALL_PROJECTS}
+        blocked_projects = set()
+        for entry in list(self.pending):
+            host, project, task = entry
+            key = (host, project)
+            if task.token.is_set():
+                # 等待中被取消: 交给线程池立即以“已取消”结束
+                self.pending.remove(entry)
+                self.running[task.id] = key
+                self.task_manager.start(task)
+                continue
+            if project == ALL_PROJECTS:
+                if host in barrier_hosts or host_counts.get(host, 0):
+                    barrier_hosts.add(host)
+                    continue
+                barrier_hosts.add(host)
+            elif host in barrier_hosts:
+                blocked_projects.add(key)
+                continue
+            # 同一项目排在前面的任务未启动时，后面的也不能越过它
+            if key in busy_projects or key in blocked_projects:
+                blocked_projects.add(key)
+                continue
+            if host_counts.get(host, 0) >= self.per_host_limit:
+                blocked_projects.add(key)
+                continue
+
+            self.pending.remove(entry)
+            self.running[task.id] = key
+            busy_projects.add(key)
+            host_counts[host] = host_counts.get(host, 0) + 1
+            self.task_manager.start(task)
+
+    def on_task_changed(self, task):
+        if task.token.is_set() and task.state == "waiting":
+            self.pump()
+
+    @property
+    def queued_count(self):
+        return len(self.pending)
@@ -1,16 +1,29 @@
 import os
 import json
 import base64
-from cryptography.fernet import Fernet
+import threading
 
 class SettingsManager:
     def __init__(self, config_file="app_config.json", key_file="secret.key"):
         self.config_file = config_file
         self.key_file = key_file
-        self.key = self._load_or_create_key()
-        self.cipher = Fernet(self.key)
+        # cryptography 导入较慢，密钥与 Fernet 实例在第一次加解密时才创建 (读写普通选项不需要)
+        self._cipher = None
+        self._cipher_lock = threading.Lock()
+
+    @property
+    def cipher(self):
+        with self._cipher_lock:
+            if self._cipher is None:
+                self._cipher = self._make_cipher()
+            return self._cipher
+
+    def _make_cipher(self):
+        from cryptography.fernet import Fernet
+        return Fernet(self._load_or_create_key())
 
     def _load_or_create_key(self):
+        from cryptography.fernet import Fernet
         if os.path.exists(self.key_file):
             with open(self.key_file, "rb") as f:
                 return f.read()
@@ -31,8 +44,23 @@ class SettingsManager:
         except Exception:
             return ""
 
+    def _read_raw(self):
+        if not os.path.exists(self.config_file):
+            return {}
+        try:
+            with open(self.config_file, "r", encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _write_raw(self, data):
+        with open(self.config_file, "w", encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+
     def save_config(self, ip, port, user, pwd, remote_proj, remote_bkp, default_subdir="dist"):
-        data = {
+        # 保留连接信息以外的其他选项 (日志、规则等)
+        data = self._read_raw()
+        data.update({
             "ip": ip,
             "port": port,
             "user": user,
@@ -40,9 +68,44 @@ class SettingsManager:
             "remote_proj": remote_proj,
             "remote_bkp": remote_bkp,
             "default_subdir": default_subdir
-        }
-        with open(self.config_file, "w", encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+        })
+        self._write_raw(data)
+
+    def get_option(self, key, default=None):
+        """读取附加选项 (不做解密)"""
+        return self._read_raw().get(key, default)
+
+    def set_option(self, key, value):
+        data = self._read_raw()
+        data[key] = value
+        self._write_raw(data)
+
+    def get_host_profile(self, host):
+        """读取某台主机保存的传输参数 (链路校准结果)"""
+        return self.get_option("host_profiles", {}).get(host)
+
+    def save_host_profile(self, host, tuning):
+        profiles = self.get_option("host_profiles", {})
+        profiles[host] = tuning
+        self.set_option("host_profiles", profiles)
+
+    def get_upload_rules(self, project):
+        """读取项目的上传规则 {"include": [...], "exclude": [...]}"""
+        return self.get_option("upload_rules", {}).get(project, {})
+
+    def save_upload_rules(self, project, rules):
+        all_rules = self.get_option("upload_rules", {})
+        all_rules[project] = rules
+        self.set_option("upload_rules", all_rules)
+
+    def get_warmup_target(self, project):
+        """读取项目的缓存预热配置 {"base_url": "...", "paths": [...]}"""
+        return self.get_option("warmup_targets", {}).get(project, {})
+
+    def save_warmup_target(self, project, target):
+        targets = self.get_option("warmup_targets", {})
+        targets[project] = target
+        self.set_option("warmup_targets", targets)
 
     def load_config(self):
         if not os.path.exists(self.config_file):
@@ -0,0 +1,190 @@
+import os
+import re
+import zlib
+import posixpath
+
+# 按 chunk 对比的资源类型
+ASSET_EXTS = {".js", ".mjs", ".cjs", ".css"}
+# 估算 gzip 传输体积的文件类型 (其余文件按原始大小计)。线上体积要在服务器上逐个 gzip，
+# 只压缩体积占大头的 JS/CSS，避免大量 html/json 等小文件拖慢切换前的报告阶段
+GZIP_EXTS = ASSET_EXTS
+
+DEFAULT_THRESHOLDS = {
+    "total_growth_pct": 5,       # gzip 总体积增长超过该百分比时警告
+    "asset_growth_pct": 10,      # 单个 chunk 的 gzip 体积增长超过该百分比...
+    "min_asset_growth_kb": 10,   # ...且超过该 KB 时警告 (避免小文件的百分比噪声)
+    "max_asset_gzip_kb": 250,    # 单个 JS/CSS 的 gzip 体积上限
+}
+
+# 文件名中的内容哈希段: 至少 8 位的 [A-Za-z0-9_-]，且含数字或词中大写字母 (不是普通的单词/驼峰名)，
+# 如 app.3f2a1b9c.js / index-BXk3f_9a.js / index-Ab-cd_EF.js；my-component.js 与 vendor-react-dom.js 不算
+HASH_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_-]{7,}")
+_HASH_SIGNAL_RE = re.compile(r"\d|(?<=[A-Za-z0-9])[A-Z]")
+# 超过该大小的文件只压缩开头部分，按压缩率估算 (本地与服务器上一致)
+GZIP_SAMPLE_LIMIT = 8 * 1024 * 1024
+
+
+def group_key(rel):
+    """去掉文件名中的内容哈希，使不同版本的同一 chunk 可以对应 (assets/index-[hash].js)"""
+    directory, name = posixpath.split(rel)
+    start = hash_start(name)
+    if start is not None:
+        name = f"{name[:start]}[hash]{posixpath.splitext(name)[1]}"
+    return posixpath.join(directory, name) if directory else name
+
+
+def hash_start(name):
+    """
+    内容哈希在文件名中的起始位置，没有时返回 None。
+    从扩展名前的最后一个 "." / "-" 分段开始，分段太短或不像哈希时向前并入 "-" 分隔的分段
+    (哈希本身可以含 "-")，但哈希前至少保留一个字符的名称。
+    """
+    stem = posixpath.splitext(name)[0]
+    for i in range(len(stem) - 1, 0, -1):
+        if stem[i] not in ".-":
+            continue
+        token = stem[i + 1:]
+        if "." in token:
+            break
+        if HASH_RE.fullmatch(token) and _HASH_SIGNAL_RE.search(token.replace("-", " ").replace("_", " ")):
+            return i + 1
+        if stem[i] == ".":
+            break
+    return None
+
+
+def gzip_size(path, level=6):
+    """本地 gzip 体积；超大文件按开头 8MB 的压缩率估算"""
+    size = os.path.getsize(path)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    with open(path, "rb") as f:
+        data = f.read(GZIP_SAMPLE_LIMIT)
+    compressed = len(compressor.compress(data)) + len(compressor.flush())
+    if size > len(data) and data:
+        return int(compressed * size / len(data))
+    return compressed
+
+
+def local_listing(local_dir, upload_filter=None, cancel_token=None):
+    """{相对路径: (大小, gzip 体积或 None)}，只统计会被上传的文件"""
+    listing = {}
+    for root, dirs, files in os.walk(local_dir):
+        rel_root = os.path.relpath(root, local_dir).replace("\\", "/")
+        if upload_filter:
+            dirs[:] = [d for d in dirs if upload_filter.accepts_dir(d if rel_root == "." else f"{rel_root}/{d}")]
+        for name in files:
+            if cancel_token: cancel_token.check()
+            rel = name if rel_root == "." else f"{rel_root}/{name}"
+            if upload_filter and not upload_filter.accepts(rel):
+                continue
+            full = os.path.join(root, name)
+            ext = os.path.splitext(name)[1].lower()
+            listing[rel] = (os.path.getsize(full), gzip_size(full) if ext in GZIP_EXTS else None)
+    return listing
+
+
+def _served(listing):
+    """去掉不会被浏览器下载的文件: source map 与预压缩的 .gz/.br 副本"""
+    result = {}
+    for rel, entry in listing.items():
+        if rel.endswith(".map"):
+            continue
+        if rel.endswith((".gz", ".br")) and rel[:-3] in listing:
+            continue
+        result[rel] = entry
+    return result
+
+
+def _transfer(entry):
+    size, gz = entry
+    return size if gz is None else gz
+
+
+def _pct(new, old):
+    return (new - old) * 100.0 / old if old else None
+
+
+def build_report(local, remote, thresholds=None, top=10):
+    """
+    对比新包 (local) 与线上版本 (remote)，两者均为 {相对路径: (大小, gzip 体积或 None)}。
+    返回 {totals, assets, added, warnings}。
+    """
+    limits = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    local, remote = _served(local), _served(remote)
+
+    totals = {
+        "local_files": len(local), "remote_files": len(remote),
+        "local_bytes": sum(e[0] for e in local.values()), "remote_bytes": sum(e[0] for e in remote.values()),
+        "local_transfer": sum(_transfer(e) for e in local.values()),
+        "remote_transfer": sum(_transfer(e) for e in remote.values()),
+    }
+
+    def grouped(listing):
+        groups = {}
+        for rel, entry in listing.items():
+            if os.path.splitext(rel)[1].lower() not in ASSET_EXTS:
+                continue
+            size, transfer = groups.get(group_key(rel), (0, 0))
+            groups[group_key(rel)] = (size + entry[0], transfer + _transfer(entry))
+        return groups
+
+    new_groups, old_groups = grouped(local), grouped(remote)
+    assets = []
+    for key in sorted(set(new_groups) | set(old_groups)):
+        new, old = new_groups.get(key), old_groups.get(key)
+        assets.append({"name": key, "local": new, "remote": old,
+                       "delta": (new[1] if new else 0) - (old[1] if old else 0)})
+    assets.sort(key=lambda a: -(a["local"] or (0, 0))[1])
+
+    remote_keys = {group_key(rel) for rel in remote}
+    added = sorted(((rel, entry) for rel, entry in local.items() if group_key(rel) not in remote_keys),
+                   key=lambda item: -item[1][0])[:top]
+
+    warnings = []
+    if remote:
+        growth = _pct(totals["local_transfer"], totals["remote_transfer"])
+        if growth is not None and growth > limits["total_growth_pct"]:
+            warnings.append(f"总传输体积增长 {growth:.1f}% (阈值 {limits['total_growth_pct']}%)")
+        for asset in assets:
+            if not asset["local"] or not asset["remote"]:
+                continue
+            growth = _pct(asset["local"][1], asset["remote"][1])
+            if (asset["delta"] > limits["min_asset_growth_kb"] * 1024
+                    and growth is not None and growth > limits["asset_growth_pct"]):
+                warnings.append(f"{asset['name']} 增长 {asset['delta'] / 1024:.1f} KB ({growth:.1f}%)")
+    for asset in assets:
+        if asset["local"] and asset["local"][1] > limits["max_asset_gzip_kb"] * 1024:
+            warnings.append(f"{asset['name']} gzip 后 {asset['local'][1] / 1024:.1f} KB，"
+                            f"超过 {limits['max_asset_gzip_kb']} KB")
+    return {"totals": totals, "assets": assets, "added": added, "warnings": warnings}
+
+
+def _kb(value):
+    return f"{value / 1024:.1f} KB"
+
+
+def format_report(report, top=10):
+    """日志用的文本行"""
+    t = report["totals"]
+    lines = ["---- 包体积报告 (新包 / 线上) ----"]
+    if not t["remote_files"]:
+        lines.append("线上版本不存在，只显示新包体积")
+    lines.append(f"文件数: {t['local_files']} / {t['remote_files']}，原始体积: {_kb(t['local_bytes'])} / "
+                 f"{_kb(t['remote_bytes'])}，估算传输体积 (gzip): {_kb(t['local_transfer'])} / "
+                 f"{_kb(t['remote_transfer'])}")
+    lines.append("最大的 JS/CSS (gzip):")
+    for asset in report["assets"][:top]:
+        new = _kb(asset["local"][1]) if asset["local"] else "已删除"
+        old = _kb(asset["remote"][1]) if asset["remote"] else "新增"
+        sign = "+" if asset["delta"] >= 0 else "-"
+        lines.append(f"  {asset['name']}: {new} / {old} ({sign}{_kb(abs(asset['delta']))})")
+    if report["added"]:
+        lines.append("新增的最大文件:")
+        for rel, (size, gz) in report["added"]:
+            lines.append(f"  {rel}: {_kb(size)}" + (f" (gzip {_kb(gz)})" if gz is not None else ""))
+    if report["warnings"]:
+        lines.append(f"警告 {len(report['warnings'])} 条:")
+        lines.extend(f"  [!] {w}" for w in report["warnings"])
+    else:
+        lines.append("未超过体积阈值")
+    return lines
@@ -0,0 +1,69 @@
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTreeWidget, QTreeWidgetItem,
+                               QPushButton, QHeaderView)
+from PySide6.QtCore import Qt
+
+STATE_LABELS = {
+    "waiting": "等待调度",
+    "queued": "排队中",
+    "running": "运行中",
+    "done": "已完成",
+    "failed": "失败",
+    "cancelled": "已取消",
+}
+
+
+class TaskPanel(QWidget):
+    """显示 TaskManager 中运行/排队/最近完成的任务，并支持取消"""
+    def __init__(self, task_manager, parent=None):
+        super().__init__(parent)
+        self.task_manager = task_manager
+        self.items = {}  # task.id -> QTreeWidgetItem
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["#", "任务", "状态"])
+        self.tree.setRootIsDecorated(False)
+        self.tree.header().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.tree.setColumnWidth(0, 40)
+        self.tree.setMaximumHeight(120)
+        layout.addWidget(self.tree)
+
+        btn_layout = QHBoxLayout()
+        self.cancel_btn = QPushButton("取消选中任务")
+        self.cancel_btn.clicked.connect(self.cancel_selected)
+        self.clear_btn = QPushButton("清除已结束")
+        self.clear_btn.clicked.connect(self.clear_finished)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.clear_btn)
+        btn_layout.addWidget(self.cancel_btn)
+        layout.addLayout(btn_layout)
+
+        self.task_manager.task_changed.connect(self.on_task_changed)
+
+    def on_task_changed(self, task):
+        item = self.items.get(task.id)
+        if item is None:
+            item = QTreeWidgetItem(self.tree)
+            item.setText(0, str(task.id))
+            item.setText(1, task.name)
+            item.setData(0, Qt.UserRole, task)
+            self.items[task.id] = item
+        label = STATE_LABELS.get(task.state, task.state)
+        if task.active and task.token.is_set():
+            label = "正在取消..."
+        item.setText(2, label)
+
+    def cancel_selected(self):
+        for item in self.tree.selectedItems():
+            task = item.data(0, Qt.UserRole)
+            if task.active:
+                self.task_manager.cancel(task)
+
+    def clear_finished(self):
+        for task_id, item in list(self.items.items()):
+            task = item.data(0, Qt.UserRole)
+            if not task.active:
+                self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(item))
+                del self.items[task_id]
@@ -0,0 +1,162 @@
+import inspect
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QObject, Signal
+
+from .cancel import CancelToken, OperationCancelled
+from . import profiling
+
+
+class Task:
+    """
+    一个提交到 TaskManager 的后台操作。
+    state: (waiting ->) queued -> running -> done / failed / cancelled
+    waiting 表示已创建但尚未交给线程池 (例如在调度器中等待)
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, name, func, args, kwargs, on_finished=None):
+        self.id = next(self._ids)
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_finished = on_finished
+        self.token = CancelToken()
+        self.future = None
+        self.state = "queued"
+        self.result = None
+
+    def cancel(self):
+        """排队中的任务直接取消；运行中的任务设置取消标记，由工作函数协作退出"""
+        self.token.cancel()
+        if self.future and self.future.cancel():
+            self.state = "cancelled"
+
+    @property
+    def active(self):
+        return self.state in ("waiting", "queued", "running")
+
+
+class TaskManager(QObject):
+    """
+    统一的后台任务执行器 (有界线程池)，替代每个操作单独创建 QThread。
+    - submit() 返回 Task，内部持有 Future 与 CancelToken
+    - 若工作函数声明了 cancel_token 参数，会自动注入
+    - on_finished(success, payload) 始终在 GUI 线程回调
+    """
+    task_changed = Signal(object)
+    _task_done = Signal(object)
+
+    def __init__(self, max_workers=4, parent=None):
+        super().__init__(parent)
+        self.logger = logging.getLogger("DeployTool")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="DeployTask")
+        self._lock = threading.Lock()
+        self.tasks = []
+        # 工作线程发射，GUI 线程接收 (队列连接)
+        self._task_done.connect(self._dispatch_done)
+
+    def submit(self, name, func, *args, on_finished=None, **kwargs):
+        task = self.create(name, func, *args, on_finished=on_finished, **kwargs)
+        return self.start(task)
+
+    def create(self, name, func, *args, on_finished=None, **kwargs):
+        """创建任务但暂不执行 (state=waiting)，稍后由 start() 交给线程池"""
+        task = Task(name, func, args, kwargs, on_finished)
+        task.state = "waiting"
+        if self._accepts_token(func) and "cancel_token" not in kwargs:
+            task.kwargs = dict(kwargs, cancel_token=task.token)
+        with self._lock:
+            self.tasks.append(task)
+            self._prune()
+        self.task_changed.emit(task)
+        return task
+
+    def start(self, task):
+        task.state = "queued"
+        task.future = self._executor.submit(self._run, task)
+        task.future.add_done_callback(lambda f, t=task: self._on_future_done(f, t))
+        self.task_changed.emit(task)
+        return task
+
+    def _accepts_token(self, func):
+        try:
+            params = inspect.signature(func).parameters
+        except (TypeError, ValueError):
+            return False
+        return "cancel_token" in params
+
+    def _on_future_done(self, future, task):
+        # 排队中被取消的任务不会进入 _run，需要在这里补发完成通知
+        if future.cancelled():
+            self._task_done.emit(task)
+
+    def _run(self, task):
+        if task.token.is_set():
+            task.state = "cancelled"
+            task.result = (False, "操作已取消")
+            self._task_done.emit(task)
+            return
+        task.state = "running"
+        self.task_changed.emit(task)
+        try:
+            # 开启性能分析时以任务名为标签保存 .pstats (未开启时直接调用)
+            result = profiling.run_profiled(task.name, task.func, *task.args, **task.kwargs)
+            # 约定返回 (success, payload/message)
+            if isinstance(result, tuple) and len(result) == 2:
+                task.result = (result[0], result[1])
+            else:
+                task.result = (True, result)
+            task.state = "done" if task.result[0] else "failed"
+        except OperationCancelled as e:
+            task.state = "cancelled"
+            task.result = (False, str(e))
+        except Exception as e:
+            self.logger.error(f"Task '{task.name}' failed: {e}")
+            task.state = "failed"
+            task.result = (False, str(e))
+        self._task_done.emit(task)
+
+    def _dispatch_done(self, task):
+        if task.result is None:
+            # 在开始运行前就被取消
+            task.state = "cancelled"
+            task.result = (False, "操作已取消")
+        self.task_changed.emit(task)
+        if task.on_finished:
+            task.on_finished(*task.result)
+
+    def _prune(self, keep_finished=20):
+        finished = [t for t in self.tasks if not t.active]
+        for t in finished[:-keep_finished]:
+            self.tasks.remove(t)
+
+    def cancel(self, task):
+        task.cancel()
+        self.task_changed.emit(task)
+
+    def active_tasks(self):
+        with self._lock:
+            return [t for t in self.tasks if t.active]
+
+    def cancel_all(self):
+        for task in self.active_tasks():
+            task.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_manager = None
+
+
+def get_task_manager():
+    """进程内共享的任务执行器 (需在 QApplication 创建后、GUI 线程中首次调用)"""
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = TaskManager()
+    return _default_manager
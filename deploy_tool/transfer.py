@@ -0,0 +1,390 @@
+import os
+import json
+import posixpath
+import time
+import hashlib
+import logging
+import threading
+
+from .cancel import CancelToken, OperationCancelled
+from .fingerprint import sha256_file
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+WRITE_BLOCK = 1024 * 1024  # 分块内部每写入 1MB 检查一次取消
+
+# 认为可以通过重连恢复的错误 (paramiko 的 SSHException 也继承自 Exception，但不是 OSError)
+RETRYABLE_ERRORS = (OSError, EOFError)
+
+
+def _is_retryable(e):
+    if isinstance(e, RETRYABLE_ERRORS):
+        return True
+    # 避免在模块导入时加载 paramiko
+    return type(e).__name__ in ("SSHException", "ChannelException", "ProxyCommandFailure")
+
+
+class ChunkJournal:
+    """
+    本地分块日志 (JSON)，记录某个本地文件上传到某个远程路径时已确认写入的分块。
+    本地文件大小/修改时间或分块大小变化时自动作废。
+    下载时 (source_stat 为远程文件的 (大小, mtime)) 记录已写入本地 .part 的分块，远程文件变化时作废。
+    """
+    def __init__(self, journal_dir, host, local_path, remote_path, chunk_size, source_stat=None):
+        os.makedirs(journal_dir, exist_ok=True)
+        if source_stat is None:
+            key = hashlib.sha1(f"{host}|{remote_path}".encode("utf-8")).hexdigest()
+            st = os.stat(local_path)
+            size, mtime = st.st_size, st.st_mtime_ns
+        else:
+            key = hashlib.sha1(f"get|{host}|{remote_path}|{os.path.abspath(local_path)}".encode("utf-8")).hexdigest()
+            size, mtime = source_stat
+        self.path = os.path.join(journal_dir, f"{key}.json")
+        self.identity = {
+            "host": host,
+            "local_path": os.path.abspath(local_path),
+            "remote_path": remote_path,
+            "size": size,
+            "mtime_ns": mtime,
+            "chunk_size": chunk_size,
+        }
+        self.done = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("identity") == self.identity:
+            self.done = set(data.get("done", []))
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"identity": self.identity, "done": sorted(self.done)}, f)
+        os.replace(tmp, self.path)
+
+    def mark(self, index):
+        with self._lock:
+            self.done.add(index)
+            self._save()
+
+    def discard(self, indices):
+        with self._lock:
+            self.done.difference_update(indices)
+            self._save()
+
+    def reset(self):
+        with self._lock:
+            self.done = set()
+            self._save()
+
+    def remove(self):
+        with self._lock:
+            self.done = set()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+# 超过该天数未更新的分块日志视为已放弃的传输
+JOURNAL_MAX_AGE = 7 * 24 * 3600
+
+
+def prune_journals(journal_dir, host=None, remote_prefix=None, max_age=JOURNAL_MAX_AGE):
+    """
+    删除不会再被续传的分块日志，返回删除数量:
+    - remote_prefix 不为空时删除该主机上远程路径以 remote_prefix 开头的日志 (目标目录已被删除，如发布的临时目录)
+    - 其余情况删除超过 max_age 秒未更新的日志
+    """
+    removed = 0
+    now = time.time()
+    try:
+        names = [n for n in os.listdir(journal_dir) if n.endswith((".json", ".json.tmp"))]
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(journal_dir, name)
+        try:
+            if remote_prefix:
+                with open(path, "r", encoding="utf-8") as f:
+                    identity = json.load(f).get("identity", {})
+                doomed = identity.get("host") == host and identity.get("remote_path", "").startswith(remote_prefix)
+            else:
+                doomed = now - os.path.getmtime(path) > max_age
+            if doomed:
+                os.remove(path)
+                removed += 1
+        except (OSError, ValueError):
+            continue
+    return removed
+
+
+def chunk_ranges(size, chunk_size):
+    """[(index, offset, length)]，空文件返回空列表"""
+    return [(i, off, min(chunk_size, size - off)) for i, off in enumerate(range(0, size, chunk_size))]
+
+
+def _write_chunk(sftp, part_path, local_path, offset, length, cancel_token=None):
+    """写入单个分块；close() 会等待所有流水线写请求确认，返回即表示服务器已确认"""
+    with open(local_path, "rb") as src, sftp.open(part_path, "r+") as dst:
+        dst.set_pipelined(True)
+        src.seek(offset)
+        dst.seek(offset)
+        remaining = length
+        while remaining > 0:
+            if cancel_token: cancel_token.check()
+            block = src.read(min(WRITE_BLOCK, remaining))
+            if not block:
+                raise IOError(f"本地文件在上传过程中被截断: {local_path}")
+            dst.write(block)
+            remaining -= len(block)
+
+
+def _prepare_part(ssh_manager, journal, part_path):
+    """确保 .part 文件存在，并剔除远程实际大小无法覆盖的“已完成”分块"""
+    sftp = ssh_manager.sftp
+    try:
+        remote_size = sftp.stat(part_path).st_size
+    except IOError:
+        remote_size = None
+
+    if remote_size is None or not journal.done:
+        # 新传输 (或远程文件已丢失): 创建空文件
+        sftp.open(part_path, "w").close()
+        journal.reset()
+        return
+
+    chunk_size = journal.identity["chunk_size"]
+    size = journal.identity["size"]
+    lost = [i for i in journal.done if min((i + 1) * chunk_size, size) > remote_size]
+    if lost:
+        journal.discard(lost)
+
+
+def remote_sha256(ssh_manager, remote_path):
+    # 从标准输入读取: 输出不带文件名，路径含反斜杠或换行时也不会出现 sha256sum 的转义前缀
+    out, err = ssh_manager.run_command(f"sha256sum < '{remote_path}'")
+    parsed = ssh_manager.parse_sha256_line(out or "")
+    if not parsed:
+        raise RuntimeError(f"无法计算远程校验和: {err}")
+    return parsed[1]
+
+
+def _read_chunk(sftp, remote_path, part_path, offset, length, cancel_token=None):
+    """用 SFTP 分段读取 (readv 会把请求流水线化) 远程文件的一个分块，写入本地 .part 的相同偏移"""
+    blocks = [(off, min(WRITE_BLOCK, offset + length - off)) for off in range(offset, offset + length, WRITE_BLOCK)]
+    with sftp.open(remote_path, "rb") as src, open(part_path, "r+b") as dst:
+        dst.seek(offset)
+        for (_, expected), data in zip(blocks, src.readv(blocks)):
+            if cancel_token: cancel_token.check()
+            if len(data) != expected:
+                raise IOError(f"远程文件在下载过程中被截断: {remote_path}")
+            dst.write(data)
+        dst.flush()
+        os.fsync(dst.fileno())
+
+
+def _transfer_chunks_parallel(ssh_manager, pending, journal, stripes, cancel_token, on_chunk, transfer_chunk,
+                              new_transport=False):
+    """
+    多条 SFTP 会话并发传输同一个文件的不同分块 (条带化)。
+    每个线程独占一个 SFTP 会话，从共享队列领取分块并调用 transfer_chunk(sftp, offset, length, stop)；
+    任一线程出错时其余线程尽快停止。
+    """
+    queue = list(reversed(pending))
+    queue_lock = threading.Lock()
+    stop = CancelToken(parent=cancel_token)
+    errors = []
+
+    def worker():
+        try:
+            sftp, close = ssh_manager.open_sftp_session(new_transport=new_transport)
+        except Exception as e:
+            errors.append(e)
+            stop.cancel()
+            return
+        try:
+            while True:
+                with queue_lock:
+                    if not queue or stop.is_set():
+                        return
+                    index, offset, length = queue.pop()
+                transfer_chunk(sftp, offset, length, stop)
+                journal.mark(index)
+                on_chunk(index, offset, length)
+        except OperationCancelled:
+            pass
+        except Exception as e:
+            errors.append(e)
+            stop.cancel()
+        finally:
+            try:
+                close()
+            except Exception:
+                pass
+
+    threads = [threading.Thread(target=worker, name=f"Stripe-{i}", daemon=True)
+               for i in range(min(stripes, len(pending)))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if errors:
+        raise errors[0]
+    if cancel_token: cancel_token.check()
+
+
+def _run_with_reconnect(ssh_manager, journal, label, attempt, cancel_token=None, max_retries=5):
+    """
+    执行 attempt()，遇到可恢复的连接错误时等待后重连再次执行 (attempt 自行跳过日志中已完成的分块)。
+    两次中断之间有进展则重新计数，长时间传输中偶发的断线不会耗尽重试次数。
+    """
+    logger = logging.getLogger("DeployTool")
+    attempts = 0
+    last_done = len(journal.done)
+    while True:
+        try:
+            if cancel_token: cancel_token.check()
+            ssh_manager.ensure_connected()
+            return attempt()
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            if len(journal.done) > last_done:
+                attempts, last_done = 0, len(journal.done)
+            if not _is_retryable(e) or attempts >= max_retries:
+                raise
+            attempts += 1
+            wait = min(2 ** attempts, 30)
+            logger.warning(f"{label} 中断 ({e})，{wait}s 后重连续传 (第 {attempts} 次)")
+            if cancel_token and cancel_token.wait(wait):
+                raise OperationCancelled("操作已取消")
+            elif not cancel_token:
+                time.sleep(wait)
+            try:
+                ssh_manager.reconnect()
+            except Exception as re:
+                logger.warning(f"重连失败: {re}")
+
+
+def upload_file_resumable(ssh_manager, local_path, remote_path, journal_dir, chunk_size=DEFAULT_CHUNK_SIZE,
+                          cancel_token=None, progress_callback=None, max_retries=5, local_sha256=None,
+                          stripes=1, new_transport=False):
+    """
+    分块、可续传的单文件上传:
+    1. 按 chunk_size 将文件写入 remote_path + '.part' 的对应偏移，每个分块确认后记入本地日志
+    2. stripes > 1 时通过多条 SFTP 会话并发写入不同分块 (new_transport=True 时每条使用独立 SSH 连接)
+    3. 连接中断时自动重连 (SSHManager.reconnect)，只重传未确认的分块
+    4. 全部完成后比较 sha256，一致才移动到最终路径
+    取消时保留日志与 .part 文件，之后以相同的本地文件与远程路径再次调用可继续 (如导入同一个备份包)。
+    发布上传到每次新建的临时目录，只能在同一次发布内断线续传；临时目录被删除时其日志也随之清理 (见 prune_journals)。
+    """
+    part_path = remote_path + ".part"
+    journal = ChunkJournal(journal_dir, ssh_manager.host_label, local_path, remote_path, chunk_size)
+    size = journal.identity["size"]
+    ranges = chunk_ranges(size, chunk_size)
+    name = os.path.basename(local_path)
+
+    def on_chunk(index, offset, length):
+        if progress_callback:
+            progress_callback(f"{name}: {len(journal.done)}/{len(ranges)} 块 "
+                              f"({len(journal.done) * 100 // max(len(ranges), 1)}%)")
+
+    def write_pending():
+        _prepare_part(ssh_manager, journal, part_path)
+        if journal.done and progress_callback:
+            progress_callback(f"{name}: 续传，已完成 {len(journal.done)}/{len(ranges)} 块")
+
+        pending = [r for r in ranges if r[0] not in journal.done]
+        if stripes > 1 and len(pending) > 1:
+            _transfer_chunks_parallel(
+                ssh_manager, pending, journal, stripes, cancel_token, on_chunk,
+                lambda sftp, offset, length, stop: _write_chunk(sftp, part_path, local_path, offset, length, stop),
+                new_transport)
+        else:
+            for index, offset, length in pending:
+                _write_chunk(ssh_manager.sftp, part_path, local_path, offset, length, cancel_token)
+                journal.mark(index)
+                on_chunk(index, offset, length)
+
+    _run_with_reconnect(ssh_manager, journal, f"上传 {name}", write_pending, cancel_token, max_retries)
+
+    # 校验后再移动到最终位置
+    if progress_callback: progress_callback(f"{name}: 正在校验 sha256...")
+    expected = local_sha256 or sha256_file(local_path)
+    actual = remote_sha256(ssh_manager, part_path)
+    if actual != expected:
+        journal.reset()
+        raise IOError(f"{name} 校验失败 (本地 {expected[:12]} / 远程 {actual[:12]})，已清除续传记录")
+
+    ssh_manager.sftp.posix_rename(part_path, remote_path)
+    journal.remove()
+    return True
+
+
+def _prepare_local_part(journal, part_path):
+    """确保本地 .part 文件存在且长度等于远程文件 (各分块按偏移写入)，文件被改动过时重新开始"""
+    size = journal.identity["size"]
+    if journal.done and os.path.exists(part_path) and os.path.getsize(part_path) == size:
+        return
+    with open(part_path, "wb") as f:
+        f.truncate(size)
+    journal.reset()
+
+
+def download_file_resumable(ssh_manager, remote_path, local_path, journal_dir, chunk_size=DEFAULT_CHUNK_SIZE,
+                            cancel_token=None, progress_callback=None, max_retries=5, stripes=1,
+                            new_transport=False):
+    """
+    分块、可续传的单文件下载 (upload_file_resumable 的反方向):
+    1. 按 chunk_size 用 SFTP 分段读取写入 local_path + '.part' 的对应偏移，每个分块落盘后记入本地日志
+    2. stripes > 1 时多条 SFTP 会话并发读取不同分块
+    3. 连接中断时自动重连，只重新读取未完成的分块；远程文件大小或修改时间变化时从头开始
+    4. 全部完成后比较 sha256，一致才移动到 local_path
+    返回 sha256。
+    """
+    part_path = local_path + ".part"
+    ssh_manager.ensure_connected()
+    st = ssh_manager.sftp.stat(remote_path)
+    journal = ChunkJournal(journal_dir, ssh_manager.host_label, local_path, remote_path, chunk_size,
+                           source_stat=(st.st_size, st.st_mtime))
+    ranges = chunk_ranges(st.st_size, chunk_size)
+    name = posixpath.basename(remote_path)
+
+    def on_chunk(index, offset, length):
+        if progress_callback:
+            progress_callback(f"{name}: {len(journal.done)}/{len(ranges)} 块 "
+                              f"({len(journal.done) * 100 // max(len(ranges), 1)}%)")
+
+    def read_pending():
+        _prepare_local_part(journal, part_path)
+        if journal.done and progress_callback:
+            progress_callback(f"{name}: 续传，已完成 {len(journal.done)}/{len(ranges)} 块")
+
+        pending = [r for r in ranges if r[0] not in journal.done]
+        if stripes > 1 and len(pending) > 1:
+            _transfer_chunks_parallel(
+                ssh_manager, pending, journal, stripes, cancel_token, on_chunk,
+                lambda sftp, offset, length, stop: _read_chunk(sftp, remote_path, part_path, offset, length, stop),
+                new_transport)
+        else:
+            for index, offset, length in pending:
+                _read_chunk(ssh_manager.sftp, remote_path, part_path, offset, length, cancel_token)
+                journal.mark(index)
+                on_chunk(index, offset, length)
+
+    _run_with_reconnect(ssh_manager, journal, f"下载 {name}", read_pending, cancel_token, max_retries)
+
+    if progress_callback: progress_callback(f"{name}: 正在校验 sha256...")
+    expected = remote_sha256(ssh_manager, remote_path)
+    actual = sha256_file(part_path)
+    if actual != expected:
+        journal.reset()
+        raise IOError(f"{name} 校验失败 (远程 {expected[:12]} / 本地 {actual[:12]})，已清除续传记录")
+
+    os.replace(part_path, local_path)
+    journal.remove()
+    return actual
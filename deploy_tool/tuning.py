@@ -0,0 +1,125 @@
+import io
+import os
+import time
+import logging
+import statistics
+
+# 命名传输参数档案。window_size / max_packet_size 作用于新建的通道 (SFTP 会话)，
+# ciphers / compress 需要在握手前设置，只对下一次连接生效。
+PROFILES = {
+    "lan": {
+        "label": "局域网",
+        "window_size": 8 * 1024 * 1024,
+        "max_packet_size": 64 * 1024,
+        # 有 AES-NI 时 GCM 最快
+        "ciphers": ["aes128-gcm@openssh.com", "aes128-ctr"],
+        "compress": False,
+    },
+    "wan": {
+        "label": "广域网",
+        "window_size": 16 * 1024 * 1024,
+        "max_packet_size": 32 * 1024,
+        "ciphers": ["aes128-ctr", "aes128-gcm@openssh.com"],
+        "compress": False,
+    },
+    "high_latency": {
+        "label": "高延迟/低带宽",
+        "window_size": 64 * 1024 * 1024,
+        "max_packet_size": 32 * 1024,
+        "ciphers": ["aes128-ctr", "aes128-gcm@openssh.com"],
+        "compress": True,
+    },
+}
+
+MIN_WINDOW = 2 * 1024 * 1024
+MAX_WINDOW = 64 * 1024 * 1024
+# 低于该吞吐 (字节/秒) 时认为链路是瓶颈，开启 SSH 压缩
+COMPRESS_BELOW_BPS = 1 * 1024 * 1024
+
+
+def make_transport_factory(tuning):
+    """返回 SSHClient.connect 的 transport_factory: 设置窗口、包大小与加密算法优先级"""
+    import paramiko
+
+    def factory(sock, **kwargs):
+        transport = paramiko.Transport(sock,
+                                       default_window_size=tuning["window_size"],
+                                       default_max_packet_size=tuning["max_packet_size"],
+                                       **kwargs)
+        options = transport.get_security_options()
+        available = list(options.ciphers)
+        preferred = [c for c in tuning.get("ciphers", []) if c in available]
+        if preferred:
+            options.ciphers = preferred + [c for c in available if c not in preferred]
+        return transport
+
+    return factory
+
+
+def _round_pow2(value):
+    n = 1
+    while n < value:
+        n <<= 1
+    return n
+
+
+def calibrate(ssh_manager, probe_bytes=2 * 1024 * 1024, rtt_samples=5):
+    """
+    连接后的链路探测:
+    - RTT: 多次 SFTP stat 往返取中位数
+    - 吞吐: 上传一段随机数据到 /tmp 并计时 (随机数据不受压缩影响)
+    根据结果选择基础档案，并按带宽时延积调整窗口大小、决定是否开启压缩。
+    返回可直接用于 SSHManager.connect(tuning=...) 的字典 (附带测量值)。
+    """
+    logger = logging.getLogger("DeployTool")
+    sftp = ssh_manager.sftp
+
+    rtts = []
+    for _ in range(rtt_samples):
+        start = time.perf_counter()
+        sftp.stat(".")
+        rtts.append(time.perf_counter() - start)
+    rtt = statistics.median(rtts)
+
+    probe_path = f"/tmp/.deploy_tool_probe_{os.getpid()}"
+    data = os.urandom(probe_bytes)
+    start = time.perf_counter()
+    try:
+        sftp.putfo(io.BytesIO(data), probe_path, file_size=probe_bytes)
+        elapsed = max(time.perf_counter() - start, 1e-6)
+    finally:
+        try:
+            sftp.remove(probe_path)
+        except IOError:
+            pass
+    throughput = probe_bytes / elapsed
+
+    if rtt < 0.005:
+        name = "lan"
+    elif rtt < 0.06:
+        name = "wan"
+    else:
+        name = "high_latency"
+    tuning = dict(PROFILES[name])
+
+    # 窗口至少覆盖 4 倍带宽时延积 (探测时的吞吐可能已被当前窗口限制，取较大值)
+    bdp = throughput * rtt
+    tuning["window_size"] = max(MIN_WINDOW, min(MAX_WINDOW, max(tuning["window_size"], _round_pow2(bdp * 4))))
+    tuning["compress"] = throughput < COMPRESS_BELOW_BPS
+    tuning["profile"] = name
+    tuning["rtt_ms"] = round(rtt * 1000, 2)
+    tuning["throughput_mbps"] = round(throughput / 1024 / 1024, 2)
+    tuning["calibrated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    logger.info(f"Link calibration: rtt={tuning['rtt_ms']}ms throughput={tuning['throughput_mbps']}MB/s "
+                f"-> {name}, window={tuning['window_size']}, compress={tuning['compress']}")
+    return tuning
+
+
+def describe(tuning):
+    base = PROFILES.get(tuning.get("profile"), {}).get("label", tuning.get("label", "自定义"))
+    parts = [base, f"窗口 {tuning['window_size'] // 1024 // 1024}MB",
+             f"包 {tuning['max_packet_size'] // 1024}KB", f"压缩 {'开' if tuning.get('compress') else '关'}"]
+    if "rtt_ms" in tuning:
+        parts.append(f"RTT {tuning['rtt_ms']}ms, {tuning['throughput_mbps']}MB/s")
+    return ", ".join(parts)
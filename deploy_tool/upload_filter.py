@@ -0,0 +1,88 @@
+import os
+import fnmatch
+import posixpath
+
+# 新项目的建议排除规则 (对话框中“恢复默认”使用)
+DEFAULT_EXCLUDES = ["*.map", ".DS_Store", "Thumbs.db", "stats.json", "report.html",
+                    "coverage/", "test-results/", ".git/"]
+
+
+def _match(rel, pattern):
+    """
+    匹配规则 (rel 为 posix 相对路径):
+    - 以 / 结尾: 目录规则，匹配路径中任意一级目录名 (或目录相对路径)
+    - 含 /: 匹配整个相对路径
+    - 其他: 匹配文件名
+    """
+    if pattern.endswith("/"):
+        pattern = pattern.rstrip("/")
+        parts = rel.split("/")[:-1]
+        if any(fnmatch.fnmatch(part, pattern) for part in parts):
+            return True
+        return any(fnmatch.fnmatch("/".join(parts[:i]), pattern) for i in range(1, len(parts) + 1))
+    if "/" in pattern:
+        return fnmatch.fnmatch(rel, pattern.lstrip("/"))
+    return fnmatch.fnmatch(posixpath.basename(rel), pattern)
+
+
+class UploadFilter:
+    """
+    按项目保存的包含/排除 glob 规则。include 非空时只上传匹配的文件，exclude 优先。
+    实例可直接作为 file_filter 回调 (rel -> bool)，并记录被跳过的文件与字节数。
+    """
+    def __init__(self, include=None, exclude=None):
+        self.include = [p.strip() for p in (include or []) if p.strip()]
+        self.exclude = [p.strip() for p in (exclude or []) if p.strip()]
+        # {相对路径: 大小}，同一文件在多处被检查时只计一次
+        self.skipped = {}
+
+    @classmethod
+    def from_rules(cls, rules):
+        rules = rules or {}
+        return cls(rules.get("include"), rules.get("exclude"))
+
+    def __bool__(self):
+        return bool(self.include or self.exclude)
+
+    def accepts(self, rel):
+        if self.include and not any(_match(rel, p) for p in self.include):
+            return False
+        return not any(_match(rel, p) for p in self.exclude)
+
+    def accepts_dir(self, rel_dir):
+        """目录是否需要进入 (只有目录规则会整体排除目录)"""
+        return not any(_match(rel_dir + "/", p) for p in self.exclude if p.endswith("/"))
+
+    def prune_dirs(self, root, rel_root, dirs):
+        """
+        供 os.walk 使用: 从 dirs 中移除被目录规则排除的子目录 (原地修改)，
+        被排除目录内的文件同样计入跳过统计。
+        """
+        kept = []
+        for d in dirs:
+            rel_dir = d if rel_root in ("", ".") else f"{rel_root}/{d}"
+            if self.accepts_dir(rel_dir):
+                kept.append(d)
+                continue
+            for dirpath, _, files in os.walk(os.path.join(root, d)):
+                for name in files:
+                    full = os.path.join(dirpath, name)
+                    rel = f"{rel_dir}/{os.path.relpath(full, os.path.join(root, d))}".replace("\\", "/")
+                    self.skipped[rel] = os.path.getsize(full)
+        dirs[:] = kept
+
+    def check(self, rel, size=0):
+        """判断是否上传；不上传时记入跳过统计"""
+        if self.accepts(rel):
+            return True
+        self.skipped[rel] = size
+        return False
+
+    def __call__(self, rel):
+        return self.accepts(rel)
+
+    def summary(self):
+        if not self.skipped:
+            return ""
+        total = sum(self.skipped.values())
+        return f"按上传规则跳过 {len(self.skipped)} 个文件 ({total / 1024 / 1024:.2f} MB)"
@@ -0,0 +1,43 @@
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton, QLabel,
+                               QDialogButtonBox)
+
+from .upload_filter import DEFAULT_EXCLUDES
+
+
+class UploadRulesDialog(QDialog):
+    """编辑单个项目的上传包含/排除规则 (每行一条 glob)"""
+    def __init__(self, project, rules=None, parent=None):
+        super().__init__(parent)
+        rules = rules or {}
+        self.setWindowTitle(f"上传规则 - {project}")
+        self.resize(480, 420)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("每行一条规则。*.map 匹配文件名；assets/*.txt 匹配相对路径；coverage/ 匹配目录。\n"
+                                "包含规则为空时上传全部文件；排除规则优先于包含规则。"))
+
+        layout.addWidget(QLabel("包含:"))
+        self.include_edit = QPlainTextEdit("\n".join(rules.get("include", [])))
+        layout.addWidget(self.include_edit)
+
+        layout.addWidget(QLabel("排除:"))
+        self.exclude_edit = QPlainTextEdit("\n".join(rules.get("exclude", [])))
+        layout.addWidget(self.exclude_edit)
+
+        bottom_layout = QHBoxLayout()
+        default_btn = QPushButton("使用建议排除规则")
+        default_btn.clicked.connect(lambda: self.exclude_edit.setPlainText("\n".join(DEFAULT_EXCLUDES)))
+        buttons = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        bottom_layout.addWidget(default_btn)
+        bottom_layout.addStretch()
+        bottom_layout.addWidget(buttons)
+        layout.addLayout(bottom_layout)
+
+    @staticmethod
+    def _lines(edit):
+        return [line.strip() for line in edit.toPlainText().splitlines() if line.strip()]
+
+    def rules(self):
+        return {"include": self._lines(self.include_edit), "exclude": self._lines(self.exclude_edit)}
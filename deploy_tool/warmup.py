@@ -0,0 +1,153 @@
+import os
+import math
+import time
+import logging
+import urllib.error
+import urllib.request
+from html.parser import HTMLParser
+from urllib.parse import urljoin, quote
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_URLS = 500
+# 浏览器不会直接请求的文件
+SKIP_EXTS = (".map", ".gz", ".br", ".md", ".txt")
+SKIP_NAMES = ("config.json",)
+HEADERS = {"User-Agent": "DeployTool-Warmup", "Accept-Encoding": "gzip, deflate, br"}
+
+
+class _AssetParser(HTMLParser):
+    """收集 index.html 中引用的脚本、样式、预加载与图片地址"""
+    def __init__(self):
+        super().__init__()
+        self.refs = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in ("script", "img", "source") and attrs.get("src"):
+            self.refs.append(attrs["src"])
+        elif tag == "link" and attrs.get("href"):
+            rel = (attrs.get("rel") or "").lower()
+            if any(k in rel for k in ("stylesheet", "preload", "modulepreload", "prefetch", "icon", "manifest")):
+                self.refs.append(attrs["href"])
+
+
+def html_refs(html):
+    parser = _AssetParser()
+    parser.feed(html)
+    return [ref for ref in parser.refs if not ref.startswith(("data:", "javascript:", "#"))]
+
+
+def collect_urls(base_url, rels, index_html=None, extra_paths=(), max_urls=DEFAULT_MAX_URLS):
+    """
+    由发布的文件列表 (相对路径) 与 index.html 中的引用生成预热地址 (extra_paths 为相对 base_url 的附加路径)。
+    index.html 引用的资源 (可能在 CDN 域名下) 排在前面，其余按文件列表补齐，最多 max_urls 个。
+    """
+    base = base_url if base_url.endswith("/") else base_url + "/"
+    urls = [base]
+    for path in extra_paths:
+        urls.append(urljoin(base, path.lstrip("/")))
+    if index_html:
+        urls.extend(urljoin(base, ref) for ref in html_refs(index_html))
+    for rel in sorted(rels):
+        name = rel.rsplit("/", 1)[-1]
+        if rel.endswith(SKIP_EXTS) or name in SKIP_NAMES:
+            continue
+        urls.append(urljoin(base, quote(rel)))
+
+    seen = set()
+    result = []
+    for url in urls:
+        if url not in seen:
+            seen.add(url)
+            result.append(url)
+    return result[:max_urls]
+
+
+def fetch(url, timeout=DEFAULT_TIMEOUT):
+    """请求并读完整个响应，返回 (状态码, 字节数, 耗时秒)"""
+    start = time.perf_counter()
+    request = urllib.request.Request(url, headers=HEADERS)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            size = 0
+            while True:
+                block = resp.read(64 * 1024)
+                if not block:
+                    break
+                size += len(block)
+            return resp.status, size, time.perf_counter() - start
+    except urllib.error.HTTPError as e:
+        return e.code, 0, time.perf_counter() - start
+
+
+def percentile(values, pct):
+    """最近秩法百分位 (values 已排序)"""
+    if not values:
+        return 0.0
+    rank = math.ceil(pct / 100.0 * len(values))
+    return values[max(0, min(len(values), rank) - 1)]
+
+
+def warm(urls, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, cancel_token=None, fetcher=fetch):
+    """
+    用有界线程池并发请求 urls，返回统计:
+    {count, ok, failed, cancelled, bytes, p50, p90, p99, max (毫秒), errors: [(url, 原因)]}
+    取消后不再发起新请求，已完成的请求照常统计 (count 只含已请求的地址，cancelled 为未请求的数量)。
+    fetcher 可替换 (测试时指向本地 HTTP 服务或桩函数)。
+    """
+    def one(url):
+        if cancel_token and cancel_token.is_set():
+            return None
+        try:
+            status, size, elapsed = fetcher(url, timeout=timeout)
+            return url, status, size, elapsed, None
+        except Exception as e:
+            return url, None, 0, 0.0, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, int(concurrency)), thread_name_prefix="Warmup") as pool:
+        results = list(pool.map(one, urls))
+    cancelled = sum(1 for r in results if r is None)
+    results = [r for r in results if r is not None]
+
+    latencies = sorted(elapsed * 1000 for _, status, _, elapsed, _ in results if status is not None)
+    errors = []
+    for url, status, _, _, error in results:
+        if error:
+            errors.append((url, error))
+        elif status >= 400:
+            errors.append((url, f"HTTP {status}"))
+    return {
+        "count": len(results),
+        "ok": len(results) - len(errors),
+        "failed": len(errors),
+        "cancelled": cancelled,
+        "bytes": sum(size for _, _, size, _, _ in results),
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p99": percentile(latencies, 99),
+        "max": latencies[-1] if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def describe(stats):
+    text = (f"预热 {stats['count']} 个地址: 成功 {stats['ok']}，失败 {stats['failed']}，"
+            f"{stats['bytes'] / 1024 / 1024:.2f} MB，延迟 p50 {stats['p50']:.0f} ms / p90 {stats['p90']:.0f} ms / "
+            f"p99 {stats['p99']:.0f} ms / 最大 {stats['max']:.0f} ms")
+    if stats.get("cancelled"):
+        text += f"，已取消 {stats['cancelled']} 个"
+    return text
+
+
+def read_index_html(local_dir):
+    path = os.path.join(local_dir, "index.html")
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError as e:
+        logging.getLogger("DeployTool").warning(f"读取 index.html 失败: {e}")
+        return None
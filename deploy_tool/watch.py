@@ -0,0 +1,96 @@
+import os
+import time
+import logging
+import threading
+
+from PySide6.QtCore import QObject, Signal
+
+
+def snapshot(root, upload_filter=None):
+    """{相对路径 (posix): (大小, mtime_ns)}，被上传规则排除的文件与目录不计入"""
+    result = {}
+    for dirpath, dirs, files in os.walk(root):
+        rel_root = os.path.relpath(dirpath, root).replace("\\", "/")
+        if upload_filter:
+            dirs[:] = [d for d in dirs if upload_filter.accepts_dir(d if rel_root == "." else f"{rel_root}/{d}")]
+        for name in files:
+            rel = name if rel_root == "." else f"{rel_root}/{name}"
+            if upload_filter and not upload_filter.accepts(rel):
+                continue
+            try:
+                st = os.stat(os.path.join(dirpath, name))
+            except OSError:
+                # 构建过程中文件可能刚被删除
+                continue
+            result[rel] = (st.st_size, st.st_mtime_ns)
+    return result
+
+
+def diff(old, new):
+    """返回 (新增或修改的路径集合, 删除的路径集合)"""
+    changed = {rel for rel, stat in new.items() if old.get(rel) != stat}
+    removed = {rel for rel in old if rel not in new}
+    return changed, removed
+
+
+class DirectoryWatcher(QObject):
+    """
+    轮询本地构建目录，把一段时间内的变化合并成一批通知。
+    - 每 interval 秒扫描一次 (只比较大小与 mtime，不读文件内容)
+    - 有变化后等到连续 debounce 秒没有新变化才发出 batch_ready，一次重新构建只触发一次同步
+    - 目录为空或不存在时视为正在重新构建 (构建工具通常先清空输出目录)，继续等待
+    batch_ready 在后台线程发射，经队列连接在 GUI 线程处理。
+    """
+    batch_ready = Signal(object, object)  # (changed: set, removed: set)
+
+    def __init__(self, root, interval=1.0, debounce=1.5, upload_filter=None, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.interval = interval
+        self.debounce = debounce
+        self.upload_filter = upload_filter
+        self.logger = logging.getLogger("DeployTool")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="DirectoryWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _loop(self):
+        previous = snapshot(self.root, self.upload_filter)
+        pending_changed, pending_removed = set(), set()
+        last_change = None
+        while not self._stop.wait(self.interval):
+            try:
+                current = snapshot(self.root, self.upload_filter)
+            except Exception as e:
+                self.logger.warning(f"扫描目录失败: {e}")
+                continue
+            changed, removed = diff(previous, current)
+            previous = current
+            if changed or removed:
+                # 同一文件先删后建记为修改，先建后删记为删除
+                pending_removed.difference_update(changed)
+                pending_changed.difference_update(removed)
+                pending_changed.update(changed)
+                pending_removed.update(removed)
+                last_change = time.monotonic()
+            elif last_change is not None:
+                if not current:
+                    last_change = time.monotonic()
+                elif time.monotonic() - last_change >= self.debounce:
+                    self.batch_ready.emit(pending_changed, pending_removed)
+                    pending_changed, pending_removed = set(), set()
+                    last_change = None
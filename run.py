@@ -1,11 +1,26 @@
-
 import sys
 from PySide6.QtWidgets import QApplication
 from deploy_tool.main import MainWindow, apply_dark_theme
 
-if __name__ == "__main__":
+
+def main(before_show=None):
+    """
+    程序入口: 创建应用与主窗口并进入事件循环，返回退出码。
+    before_show(app, window) 在窗口显示前调用 (启动基准用它挂接首次绘制的测量)。
+    """
+    if getattr(sys, "frozen", False) or "__compiled__" in globals():
+        # 打包成 exe 后进程池 (文件指纹计算) 需要 freeze_support；
+        # 源码运行时不需要，不在窗口显示前导入 multiprocessing
+        import multiprocessing
+        multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     apply_dark_theme(app)
     window = MainWindow()
+    if before_show:
+        before_show(app, window)
     window.show()
-    sys.exit(app.exec())
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deploy_tool.cancel import CancelToken, OperationCancelled  # noqa: E402
+from deploy_tool.pipeline import Stage, StagePipeline  # noqa: E402
+
+
+def test_cancel_skips_pending_stages():
+    token = CancelToken()
+
+    def first(ctx, cancel_token):
+        token.cancel()
+        return 1
+
+    pipeline = StagePipeline([Stage("a", first), Stage("b", lambda ctx, t: 2, deps=["a"])], cancel_token=token)
+    with pytest.raises(OperationCancelled):
+        pipeline.run()
+    assert pipeline.results == {"a": 1}
+
+
+def test_stage_not_skipped_when_cancelled():
+    token = CancelToken()
+    seen = []
+
+    def cutover(ctx, cancel_token):
+        token.cancel()
+        return "live"
+
+    def after(ctx, cancel_token):
+        seen.append(cancel_token.is_set())
+        return ctx["cutover"] + " checked"
+
+    pipeline = StagePipeline([Stage("cutover", cutover),
+                              Stage("after", after, deps=["cutover"], skip_if_cancelled=False)], cancel_token=token)
+    assert pipeline.run() == {"cutover": "live", "after": "live checked"}
+    assert seen == [True]
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deploy_tool import size_report  # noqa: E402
+
+
+@pytest.mark.parametrize("rel, key", [
+    ("app.3f2a1b9c.js", "app.[hash].js"),
+    ("assets/index-BXk3f_9a.js", "assets/index-[hash].js"),
+    ("assets/index-BXk3f_9a.css", "assets/index-[hash].css"),
+    ("index-aBcdEfgh.js", "index-[hash].js"),
+    # 哈希本身含 "-"
+    ("assets/index-Ab-cd_EF.js", "assets/index-[hash].js"),
+    ("my-long-component-name-Ab12cd34.js", "my-long-component-name-[hash].js"),
+    ("polyfills-legacy-Dx8kQ2aB.js", "polyfills-legacy-[hash].js"),
+])
+def test_group_key_strips_hash(rel, key):
+    assert size_report.group_key(rel) == key
+
+
+@pytest.mark.parametrize("rel", [
+    "main.js",
+    "my-component.js",
+    "vendor-react-dom.js",
+    "vendor-lodash-es.js",
+    "App-Header-Nav.js",
+    "index-A-bcdefghi.js",
+    "index-3f2a.js",
+    # 整个文件名不能都当成哈希
+    "Ab12cd34.js",
+    "-Ab12cd34.js",
+    # 哈希只在扩展名前的最后一段
+    "chunk-Ab12cd34.min.js",
+])
+def test_group_key_keeps_plain_names(rel):
+    assert size_report.group_key(rel) == rel
+
+
+def test_hyphenated_chunks_are_not_merged():
+    listing = {"vendor-react-dom.js": (100, 50), "vendor-lodash-es.js": (200, 80)}
+    report = size_report.build_report(listing, listing)
+    assert sorted(a["name"] for a in report["assets"]) == ["vendor-lodash-es.js", "vendor-react-dom.js"]
+    assert all(a["delta"] == 0 for a in report["assets"])
+
+
+def test_renamed_hash_is_compared_as_same_chunk():
+    old = {"assets/index-Ab12cd34.js": (1000, 400)}
+    new = {"assets/index-Zx-9_yQw.js": (1200, 500)}
+    report = size_report.build_report(new, old)
+    assert [a["name"] for a in report["assets"]] == ["assets/index-[hash].js"]
+    assert report["assets"][0]["delta"] == 100
+    assert report["added"] == []
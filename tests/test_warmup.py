@@ -0,0 +1,117 @@
+import functools
+import os
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deploy_tool import warmup  # noqa: E402
+from deploy_tool.cancel import CancelToken  # noqa: E402
+
+DELAY = 0.05
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        # 固定延迟，使百分位有确定的下限
+        time.sleep(DELAY)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    root = tmp_path / "app"
+    (root / "assets").mkdir(parents=True)
+    (root / "index.html").write_text(
+        '<html><head><link rel="stylesheet" href="./assets/index-Ab-cd_EF.css">'
+        '<script type="module" src="/app/assets/index-3f2a1b9c.js"></script>'
+        '<link rel="icon" href="data:,"></head><body></body></html>', encoding="utf-8")
+    (root / "assets" / "index-Ab-cd_EF.css").write_text("body{}" * 100, encoding="utf-8")
+    (root / "assets" / "index-3f2a1b9c.js").write_text("x" * 5000, encoding="utf-8")
+    (root / "assets" / "index-3f2a1b9c.js.map").write_text("{}", encoding="utf-8")
+    (root / "assets" / "sp ace.js").write_text("s", encoding="utf-8")
+    (root / "config.json").write_text("{}", encoding="utf-8")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_Handler, directory=str(tmp_path)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield root, f"http://127.0.0.1:{server.server_address[1]}/app/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _rels(root):
+    return [p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file()]
+
+
+def test_collect_urls(site):
+    root, base = site
+    urls = warmup.collect_urls(base, _rels(root), warmup.read_index_html(str(root)), extra_paths=["/missing"])
+    assert urls[0] == base
+    assert urls[1] == base + "missing"
+    # index.html 的引用排在文件列表之前，重复地址只保留一次
+    assert urls[2:4] == [base + "assets/index-Ab-cd_EF.css", base + "assets/index-3f2a1b9c.js"]
+    assert base + "assets/sp%20ace.js" in urls
+    assert base + "index.html" in urls
+    assert not any(url.endswith((".map", "config.json")) or url.startswith("data:") for url in urls)
+    assert len(urls) == len(set(urls)) == 6
+    assert warmup.collect_urls(base, _rels(root), max_urls=2) == urls[:1] + [base + "assets/index-3f2a1b9c.js"]
+
+
+def test_warm_counts_and_percentiles(site):
+    root, base = site
+    urls = warmup.collect_urls(base, _rels(root), warmup.read_index_html(str(root)), extra_paths=["/missing"])
+    stats = warmup.warm(urls, concurrency=3, timeout=5)
+
+    assert stats["count"] == 6
+    assert stats["ok"] == 5
+    assert stats["failed"] == 1
+    assert stats["cancelled"] == 0
+    assert stats["errors"] == [(base + "missing", "HTTP 404")]
+    assert stats["bytes"] >= 5000 + 600
+    assert DELAY * 1000 <= stats["p50"] <= stats["p90"] <= stats["p99"] <= stats["max"]
+    assert stats["max"] < 5000
+
+
+def test_warm_unreachable_host_is_recorded():
+    stats = warmup.warm(["http://127.0.0.1:9/"], timeout=1)
+    assert (stats["count"], stats["ok"], stats["failed"]) == (1, 0, 1)
+    assert stats["p50"] == stats["max"] == 0.0
+
+
+def test_warm_returns_partial_stats_when_cancelled(site):
+    root, base = site
+    urls = warmup.collect_urls(base, _rels(root))
+    token = CancelToken()
+    done = []
+
+    def fetcher(url, timeout):
+        result = warmup.fetch(url, timeout=timeout)
+        done.append(url)
+        if len(done) == 2:
+            token.cancel()
+        return result
+
+    stats = warmup.warm(urls, concurrency=1, timeout=5, cancel_token=token, fetcher=fetcher)
+    assert stats["count"] == stats["ok"] == 2
+    assert stats["cancelled"] == len(urls) - 2
+    assert stats["p50"] >= DELAY * 1000
+    assert "已取消" in warmup.describe(stats)
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 11))
+    assert warmup.percentile(values, 50) == 5
+    assert warmup.percentile(values, 90) == 9
+    assert warmup.percentile(values, 99) == 10
+    assert warmup.percentile([7], 99) == 7
+    assert warmup.percentile([], 50) == 0.0